@@ -0,0 +1,69 @@
+"""
+Response compression negotiated from the Accept-Encoding header.
+
+Brotli is used when the optional `brotli` package is installed and the client
+accepts it; otherwise gzip. Small bodies are sent uncompressed.
+
+This module is shared by the backend (backend/app/compression.py) and the
+transcription service (transcription_pipeline.py/compression.py), which are
+built from separate Docker contexts. Keep both copies byte-identical.
+"""
+
+import gzip
+import json
+from typing import Any, Optional
+
+from fastapi import Request
+from fastapi.responses import Response
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+MIN_COMPRESS_SIZE = 1024
+
+
+def _accepted_encodings(accept_encoding: str) -> set:
+    accepted = set()
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0"):
+            continue
+        if name:
+            accepted.add(name.strip().lower())
+    return accepted
+
+
+def choose_encoding(request: Request) -> Optional[str]:
+    """Pick 'br', 'gzip' or None for this request."""
+    accepted = _accepted_encodings(request.headers.get("accept-encoding", ""))
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return None
+
+
+def compressed_response(
+    request: Request,
+    body: bytes,
+    media_type: str,
+    status_code: int = 200,
+) -> Response:
+    """Build a response, compressing the body if the client supports it."""
+    headers = {"Vary": "Accept-Encoding"}
+    encoding = choose_encoding(request) if len(body) >= MIN_COMPRESS_SIZE else None
+    if encoding == "br":
+        body = brotli.compress(body, quality=5)
+        headers["Content-Encoding"] = "br"
+    elif encoding == "gzip":
+        body = gzip.compress(body, compresslevel=6)
+        headers["Content-Encoding"] = "gzip"
+    return Response(content=body, status_code=status_code, media_type=media_type, headers=headers)
+
+
+def compressed_json(request: Request, payload: Any, status_code: int = 200) -> Response:
+    """Serialize `payload` as JSON and compress it if the client supports it."""
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    return compressed_response(request, body, "application/json", status_code)
@@ -1,11 +1,74 @@
+from contextlib import asynccontextmanager
+
 from dotenv import load_dotenv
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException
 
 # Load environment variables from .env file
 load_dotenv()
 
 from .routers import audio
+from .services import http_clients, pipeline_service
+from .services.admission import AdmissionMiddleware
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled client per dependency for the lifetime of the app
+    clients = http_clients.start()
+    # One pipeline service (analyzer, executor, prompts) shared by all jobs
+    pipeline_service.start(http=clients.openrouter, ahttp=clients.openrouter_async)
+    yield
+    await pipeline_service.stop()
+    await http_clients.stop()
+
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
+
+# Reject uploads before the multipart body is parsed and spooled
+app.add_middleware(
+    AdmissionMiddleware, check=audio.admission.check, paths=["/audio/upload"], detail="Server ausgelastet"
+)
 
 app.include_router(audio.router)
+
+
+@app.get("/metrics/http")
+async def http_metrics():
+    """Call counts, retries, latencies and circuit state of outgoing HTTP clients."""
+    return http_clients.get().snapshot()
+
+
+def _pipeline() -> pipeline_service.PipelineService:
+    clients = http_clients.get()
+    return pipeline_service.get(http=clients.openrouter, ahttp=clients.openrouter_async)
+
+
+@app.get("/pipeline/status")
+async def pipeline_status():
+    """Configuration and load of the shared data processing pipeline."""
+    try:
+        return _pipeline().snapshot()
+    except ValueError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+
+@app.post("/pipeline/reload-prompts")
+async def reload_prompts():
+    """Re-read the system prompts from data_processing/ for subsequent jobs."""
+    try:
+        service = _pipeline()
+    except ValueError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return {"reloaded": service.reload_prompts()}
+
+
+@app.get("/metrics/llm-cache")
+async def llm_cache_metrics():
+    """Hit rate, latency saved and size of the OpenRouter response cache."""
+    try:
+        cache = _pipeline().analyzer.cache
+    except ValueError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    if cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **cache.snapshot()}
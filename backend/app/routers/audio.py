@@ -1,31 +1,103 @@
 import asyncio
+import json
 import os
 import uuid
 from pathlib import Path
-from typing import Dict
+from typing import Dict, Set
 
 import httpx
-from fastapi import APIRouter, BackgroundTasks, File, HTTPException, UploadFile
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Query, Request
+from fastapi.responses import FileResponse, StreamingResponse
 
+from ..compression import compressed_json
+from ..services import http_clients, pipeline_service
+from ..services.admission import AdmissionController, Overloaded
+from ..services.http_clients import TRANSCRIPTION_SERVICE_URL, CircuitOpenError, parse_retry_after
 from ..services.pipeline_service import PipelineService
+from ..services.transcript_index import TranscriptIndex, parse_time
+from ..services.upload_stream import UploadError, spool_upload
 
 # Transcript-Speicherort
 TRANSCRIPTS_DIR = Path(__file__).parent.parent.parent / "data" / "transcripts"
 TRANSCRIPTS_DIR.mkdir(parents=True, exist_ok=True)
 
+# Uploads werden hierhin gestreamt und nach der Übergabe an den Transcription Service gelöscht
+UPLOADS_DIR = Path(os.environ.get("BACKEND_SPOOL_DIR", TRANSCRIPTS_DIR.parent / "uploads"))
+UPLOADS_DIR.mkdir(parents=True, exist_ok=True)
+
 router = APIRouter(
     prefix="/audio",
     tags=["audio"],
-    responses={400: {"description": "Invalid audio upload"}},
+    responses={
+        400: {"description": "Invalid audio upload"},
+        429: {"description": "Server overloaded, retry after the Retry-After delay"},
+    },
 )
 
-# Transcription Service URL (containerized service)
-TRANSCRIPTION_SERVICE_URL = os.environ.get("TRANSCRIPTION_SERVICE_URL", "http://localhost:8001")
-
 JOBS: Dict[str, Dict] = {}
 JOBS_LOCK = asyncio.Lock()
 
+# Request body of /upload for the OpenAPI docs (the handler parses it itself)
+UPLOAD_REQUEST_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {"multipart/form-data": {"schema": {
+            "type": "object",
+            "properties": {"file": {"type": "string", "format": "binary"}},
+            "required": ["file"],
+        }}},
+    }
+}
+
+# Begrenzung aktiver Jobs / Audio-Bytes im Backend (429 bei Überlast)
+admission = AdmissionController.from_env(
+    "BACKEND", "MAX_ACTIVE_JOBS", max_queue_depth=8, max_inflight_bytes=2 * 1024 ** 3
+)
+
+# Wie lange ein Job höchstens auf einen ausgelasteten Transcription Service wartet
+FORWARD_MAX_WAIT = float(os.environ.get("TRANSCRIPTION_FORWARD_MAX_WAIT", "1800"))
+FORWARD_MAX_RETRY_AFTER = 300.0
+
+# Kleines Whisper-Modell für eine schnelle Vorschau vor dem finalen Transkript (leer = aus)
+TRANSCRIPTION_PREVIEW_MODEL = os.environ.get("TRANSCRIPTION_PREVIEW_MODEL", "")
+
+# Server-side job fields that are never serialized to clients
+INTERNAL_FIELDS = {"transcript_index"}
+# Large job fields left out of progress payloads (served by /report, or /progress?full=true)
+HEAVY_FIELDS = {"transcript", "result", "reports", "utterances"}
+TERMINAL_STATUSES = {"completed", "partial_success", "failed"}
+
+# Comment line sent on idle progress streams so proxies keep the connection open
+STREAM_KEEPALIVE = 15.0
+
+
+class _ProgressWatch:
+    """Pending progress delta of one stream subscriber; bursts of updates coalesce."""
+
+    def __init__(self):
+        self.pending: Dict = {}
+        self.changed = asyncio.Event()
+
+    def push(self, delta: Dict) -> None:
+        self.pending.update(delta)
+        self.changed.set()
+
+    def take(self) -> Dict:
+        delta, self.pending = self.pending, {}
+        self.changed.clear()
+        return delta
+
+
+# job_id -> open progress streams
+WATCHERS: Dict[str, Set[_ProgressWatch]] = {}
+
+
+def _progress_view(record: Dict) -> Dict:
+    """Job record without internal and heavy fields; `available` lists the heavy ones that are set."""
+    view = {k: v for k, v in record.items() if k not in INTERNAL_FIELDS and k not in HEAVY_FIELDS}
+    view["available"] = sorted(k for k in HEAVY_FIELDS if record.get(k) is not None)
+    return view
+
 
 async def _set_job(job_id: str, **fields) -> Dict:
     async with JOBS_LOCK:
@@ -37,8 +109,16 @@ async def _set_job(job_id: str, **fields) -> Dict:
             "reports": None,
             "pipeline_error": None
         })
+        watchers = WATCHERS.get(job_id)
+        before = _progress_view(record) if watchers else None
         record.update(fields)
         JOBS[job_id] = record
+        if watchers:
+            after = _progress_view(record)
+            delta = {k: v for k, v in after.items() if before.get(k) != v}
+            if delta:
+                for watch in watchers:
+                    watch.push(delta)
         return record
 
 
@@ -47,96 +127,159 @@ async def _get_job(job_id: str) -> Dict | None:
         return JOBS.get(job_id)
 
 
-async def process_audio_bytes(job_id: str, file_name: str, payload: bytes) -> None:
-    """Verarbeitet Audio via Transcription Service (HTTP), dann Analysis Pipeline."""
+def _release_spool(job_id: str, spool_path: Path) -> None:
+    """Löscht die gespoolte Audiodatei und gibt ihre Bytes in der Admission frei."""
+    spool_path.unlink(missing_ok=True)
+    admission.release_bytes(job_id)
+
+
+async def process_audio_file(job_id: str, file_name: str, spool_path: Path) -> None:
+    """Verarbeitet Audio via Transcription Service (HTTP), dann Analysis Pipeline.
+
+    Die Audiodatei wird von der Platte gestreamt und gelöscht, sobald der
+    Transcription Service sie angenommen hat.
+    """
 
     try:
         # === TRANSKRIPTION VIA HTTP (0-70%) ===
-        async with httpx.AsyncClient(timeout=httpx.Timeout(600.0, connect=30.0)) as client:
-            # 1. Job beim Transcription Service starten
-            await _set_job(
-                job_id,
-                status="processing",
-                progress=2,
-                step="upload",
-                step_name="Sende an Transcription Service...",
-                phase="transcription"
-            )
+        # Gemeinsamer Client: Keep-Alive, Retries auf 5xx, Circuit Breaker
+        client = http_clients.get().transcription
+
+        # 1. Job beim Transcription Service starten
+        await _set_job(
+            job_id,
+            status="processing",
+            progress=2,
+            step="upload",
+            step_name="Sende an Transcription Service...",
+            phase="transcription"
+        )
 
-            files = {"file": (file_name, payload, "audio/wav")}
+        form = {"preview_model": TRANSCRIPTION_PREVIEW_MODEL} if TRANSCRIPTION_PREVIEW_MODEL else None
+        waited = 0.0
+        while True:
             try:
-                response = await client.post(
-                    f"{TRANSCRIPTION_SERVICE_URL}/transcribe",
-                    files=files
+                # httpx liest die Datei beim Senden in Blöcken (kein Puffer im Speicher)
+                # retry=False: 429 wird unten mit Retry-After behandelt, die Datei neu geöffnet
+                with open(spool_path, "rb") as audio_file:
+                    response = await client.post(
+                        "/transcribe",
+                        files={"file": (file_name, audio_file, "audio/wav")},
+                        data=form,
+                        retry=False
+                    )
+            except (httpx.TransportError, CircuitOpenError) as e:
+                raise Exception(f"Transcription Service nicht erreichbar: {TRANSCRIPTION_SERVICE_URL} ({e})")
+
+            # Service ausgelastet: Retry-After respektieren statt Fehler
+            if response.status_code == 429 and waited < FORWARD_MAX_WAIT:
+                retry_after = min(
+                    parse_retry_after(response.headers.get("Retry-After")) or 30.0,
+                    FORWARD_MAX_RETRY_AFTER,
+                    FORWARD_MAX_WAIT - waited,
                 )
+                await _set_job(
+                    job_id,
+                    step="transcription_backpressure",
+                    step_name=f"Transcription Service ausgelastet, neuer Versuch in {int(retry_after)}s..."
+                )
+                await asyncio.sleep(retry_after)
+                waited += retry_after
+                continue
+
+            try:
                 response.raise_for_status()
-            except httpx.ConnectError:
-                raise Exception(f"Transcription Service nicht erreichbar: {TRANSCRIPTION_SERVICE_URL}")
             except httpx.HTTPStatusError as e:
                 raise Exception(f"Transcription Service Fehler: {e.response.text}")
+            break
+
+        transcription_job_id = response.json()["job_id"]
 
-            transcription_job_id = response.json()["job_id"]
+        # Der Transcription Service hat die Datei: Spool sofort freigeben
+        _release_spool(job_id, spool_path)
+
+        await _set_job(
+            job_id,
+            progress=5,
+            step="transcription_started",
+            step_name="Transcription gestartet..."
+        )
+
+        # 2. Status pollen bis fertig
+        preview_published = False
+        while True:
+            await asyncio.sleep(2)
+
+            try:
+                status_response = await client.get(f"/status/{transcription_job_id}")
+                status_response.raise_for_status()
+            except httpx.HTTPStatusError:
+                raise Exception("Fehler beim Abrufen des Transcription-Status")
+
+            status_data = status_response.json()
+
+            # Progress weiterleiten (0-70% für Transcription)
+            transcription_progress = status_data.get("progress", 0)
+            overall_progress = int(transcription_progress * 0.7)
+
+            step_name_map = {
+                "queued": "Warte auf freien Transcription-Worker...",
+                "load": "Audio wird geladen...",
+                "preview_transcription": "Schnelle Vorschau-Transkription läuft...",
+                "preview_ready": "Vorschau verfügbar, finale Transkription läuft...",
+                "transcription": "Whisper Transkription läuft...",
+                "redecode": "Unsichere Passagen werden neu dekodiert...",
+                "diarization": "Speaker Diarization...",
+                "alignment": "Alignment...",
+                "roles": "Erkenne Rollen...",
+                "format": "Formatiere Transkript...",
+                "done": "Transkription abgeschlossen",
+            }
+            current_step = status_data.get("step", "processing")
+            step_name = step_name_map.get(current_step, f"Verarbeite... ({current_step})")
 
             await _set_job(
                 job_id,
-                progress=5,
-                step="transcription_started",
-                step_name="Transcription gestartet..."
+                progress=overall_progress,
+                step=f"transcription_{current_step}",
+                step_name=step_name
             )
 
-            # 2. Status pollen bis fertig
-            while True:
-                await asyncio.sleep(2)
-
-                try:
-                    status_response = await client.get(
-                        f"{TRANSCRIPTION_SERVICE_URL}/status/{transcription_job_id}"
-                    )
-                    status_response.raise_for_status()
-                except httpx.HTTPStatusError:
-                    raise Exception("Fehler beim Abrufen des Transcription-Status")
-
-                status_data = status_response.json()
-
-                # Progress weiterleiten (0-70% für Transcription)
-                transcription_progress = status_data.get("progress", 0)
-                overall_progress = int(transcription_progress * 0.7)
-
-                step_name_map = {
-                    "load": "Audio wird geladen...",
-                    "transcription": "Whisper Transkription läuft...",
-                    "diarization": "Speaker Diarization...",
-                    "alignment": "Alignment...",
-                    "roles": "Erkenne Rollen...",
-                    "format": "Formatiere Transkript...",
-                    "done": "Transkription abgeschlossen",
-                }
-                current_step = status_data.get("step", "processing")
-                step_name = step_name_map.get(current_step, f"Verarbeite... ({current_step})")
-
-                await _set_job(
-                    job_id,
-                    progress=overall_progress,
-                    step=f"transcription_{current_step}",
-                    step_name=step_name
+            # Vorschau-Transkript sofort bereitstellen (zweistufiger Modus)
+            if status_data.get("quality") == "preview" and not preview_published:
+                preview_response = await client.get(
+                    f"/result/{transcription_job_id}",
+                    params={"format": "json"}
                 )
+                if preview_response.status_code == 200:
+                    preview_utterances = preview_response.json()["result"]["utterances"]
+                    await _set_job(
+                        job_id,
+                        transcript=PipelineService.format_utterances(preview_utterances),
+                        transcript_quality="preview"
+                    )
+                    preview_published = True
 
-                if status_data["status"] == "completed":
-                    break
-                elif status_data["status"] == "failed":
-                    error_msg = status_data.get("error", "Transcription fehlgeschlagen")
-                    raise Exception(error_msg)
+            if status_data["status"] == "completed":
+                break
+            elif status_data["status"] == "failed":
+                error_msg = status_data.get("error", "Transcription fehlgeschlagen")
+                raise Exception(error_msg)
+            elif status_data["status"] == "cancelled":
+                raise Exception("Transcription wurde abgebrochen")
 
-            # 3. Ergebnis holen
-            try:
-                result_response = await client.get(
-                    f"{TRANSCRIPTION_SERVICE_URL}/result/{transcription_job_id}"
-                )
-                result_response.raise_for_status()
-            except httpx.HTTPStatusError as e:
-                raise Exception(f"Fehler beim Abrufen des Transkripts: {e.response.text}")
+        # 3. Ergebnis holen (strukturiert, kein Text-Parsing nötig)
+        try:
+            result_response = await client.get(
+                f"/result/{transcription_job_id}",
+                params={"format": "json"}
+            )
+            result_response.raise_for_status()
+        except httpx.HTTPStatusError as e:
+            raise Exception(f"Fehler beim Abrufen des Transkripts: {e.response.text}")
 
-            transcript = result_response.json()["transcript"]
+        utterances = result_response.json()["result"]["utterances"]
+        transcript = PipelineService.format_utterances(utterances)
 
         # Transcript als Datei speichern
         transcript_path = TRANSCRIPTS_DIR / f"{job_id}.txt"
@@ -150,17 +293,21 @@ async def process_audio_bytes(job_id: str, file_name: str, payload: bytes) -> No
             step_name="Transkription abgeschlossen",
             phase="analysis",
             transcript=transcript,
+            transcript_quality="final",
+            utterances=utterances,
+            transcript_index=TranscriptIndex(utterances),
             transcript_path=str(transcript_path)
         )
 
         # === DATA PROCESSING PIPELINE (70-100%) ===
         try:
-            pipeline = PipelineService()
+            clients = http_clients.get()
+            pipeline = pipeline_service.get(http=clients.openrouter, ahttp=clients.openrouter_async)
 
             async def progress_update(pct: int, step: str, name: str):
                 await _set_job(job_id, progress=pct, step=step, step_name=name)
 
-            reports = await pipeline.run_pipeline(transcript, progress_update)
+            reports = await pipeline.run_pipeline(transcript, progress_update, utterances=utterances)
 
             # Check for partial failures
             has_errors = bool(reports.get("errors"))
@@ -191,36 +338,128 @@ async def process_audio_bytes(job_id: str, file_name: str, payload: bytes) -> No
 
     except Exception as exc:
         await _set_job(job_id, status="failed", error=str(exc))
+    finally:
+        spool_path.unlink(missing_ok=True)
+        admission.release(job_id)
+
+
+@router.post("/upload", openapi_extra=UPLOAD_REQUEST_BODY)
+async def upload_audio(request: Request, background_tasks: BackgroundTasks):
+    """
+    Upload an audio file (multipart field `file`). The body is streamed
+    straight into the spool directory; admission limits are checked before
+    and while it is read (AdmissionMiddleware).
+    """
+    def overloaded(exc: Overloaded) -> HTTPException:
+        return HTTPException(
+            status_code=429,
+            detail=f"Server ausgelastet: {exc.reason}",
+            headers={"Retry-After": str(exc.retry_after)},
+        )
 
-
-@router.post("/upload")
-async def upload_audio(background_tasks: BackgroundTasks, file: UploadFile = File(...)):
-    if not file.filename:
-        raise HTTPException(status_code=400, detail="Filename is required")
-    if file.content_type and not file.content_type.startswith("audio/"):
+    try:
+        upload = await spool_upload(request, UPLOADS_DIR)
+    except UploadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    spool_path, size = upload.path, upload.size
+    if upload.content_type and not upload.content_type.startswith("audio/"):
+        spool_path.unlink(missing_ok=True)
         raise HTTPException(status_code=400, detail="File must be an audio type")
-
-    payload = await file.read()
-    if not payload:
+    if not size:
+        spool_path.unlink(missing_ok=True)
         raise HTTPException(status_code=400, detail="Uploaded file is empty")
 
     job_id = str(uuid.uuid4())
-    await _set_job(job_id, status="queued", progress=0, filename=file.filename)
-    background_tasks.add_task(process_audio_bytes, job_id, file.filename, payload)
-    return {"status": "accepted", "job_id": job_id, "filename": file.filename}
+    try:
+        admission.admit(job_id, size)
+    except Overloaded as e:
+        spool_path.unlink(missing_ok=True)
+        raise overloaded(e)
+    await _set_job(job_id, status="queued", progress=0, filename=upload.filename)
+    background_tasks.add_task(process_audio_file, job_id, upload.filename, spool_path)
+    return {"status": "accepted", "job_id": job_id, "filename": upload.filename}
 
 
 @router.get("/progress/{job_id}")
-async def get_audio_progress(job_id: str):
+async def get_audio_progress(
+    job_id: str,
+    full: bool = Query(False, description="Include transcript and reports (e.g. the preview transcript)"),
+):
     job = await _get_job(job_id)
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
-    return job
+    if full:
+        return {k: v for k, v in job.items() if k not in INTERNAL_FIELDS}
+    return _progress_view(job)
+
+
+@router.get("/progress/{job_id}/stream")
+async def stream_audio_progress(job_id: str):
+    """
+    Server-sent events for a job: one `progress` event with the current
+    state, then only the fields that changed, until the job is finished.
+    Heavy fields are never sent; `available` tells when to fetch them.
+    """
+    watch = _ProgressWatch()
+    async with JOBS_LOCK:
+        job = JOBS.get(job_id)
+        if not job:
+            raise HTTPException(status_code=404, detail="Job not found")
+        snapshot = _progress_view(job)
+        WATCHERS.setdefault(job_id, set()).add(watch)
+
+    def event(data: Dict) -> str:
+        return f"event: progress\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+    async def events():
+        try:
+            yield event(snapshot)
+            status = snapshot.get("status")
+            while status not in TERMINAL_STATUSES:
+                try:
+                    await asyncio.wait_for(watch.changed.wait(), STREAM_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                delta = watch.take()
+                status = delta.get("status", status)
+                yield event(delta)
+        finally:
+            watchers = WATCHERS.get(job_id)
+            if watchers is not None:
+                watchers.discard(watch)
+                if not watchers:
+                    WATCHERS.pop(job_id, None)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @router.get("/report/{job_id}")
-async def get_report(job_id: str):
-    """Get the generated reports for a completed job."""
+async def get_report(
+    request: Request,
+    job_id: str,
+    from_: str | None = Query(None, alias="from", description="Start time (HH:MM:SS, MM:SS or seconds)"),
+    to: str | None = Query(None, description="End time, exclusive"),
+    offset: int = Query(0, ge=0, description="Skip this many transcript lines within the range"),
+    limit: int | None = Query(None, ge=1, description="Return at most this many transcript lines"),
+):
+    """
+    Get the generated reports for a completed job.
+
+    `from`/`to` (e.g. ?from=00:30:00&to=00:45:00) and `offset`/`limit`
+    restrict the transcript to an excerpt. Responses are gzip/brotli
+    compressed when the client accepts it.
+    """
+    try:
+        start = parse_time(from_) if from_ else None
+        end = parse_time(to) if to else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
     job = await _get_job(job_id)
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
@@ -231,7 +470,7 @@ async def get_report(job_id: str):
             detail=f"Job not ready. Current status: {job['status']}"
         )
 
-    return {
+    body = {
         "job_id": job_id,
         "status": job["status"],
         "transcript": job.get("result"),
@@ -240,6 +479,22 @@ async def get_report(job_id: str):
         "pipeline_error": job.get("pipeline_error")
     }
 
+    index = job.get("transcript_index")
+    if start is not None or end is not None or offset or limit is not None:
+        if index is None:
+            if not job.get("utterances"):
+                raise HTTPException(
+                    status_code=400,
+                    detail="Transcript excerpts (from/to/offset/limit) are not available for this job"
+                )
+            index = TranscriptIndex(job["utterances"])
+            await _set_job(job_id, transcript_index=index)
+        excerpt = index.slice(start, end, offset, limit)
+        body["transcript"] = PipelineService.format_utterances(excerpt["utterances"])
+        body["page"] = excerpt["page"]
+
+    return compressed_json(request, body)
+
 
 @router.get("/transcript/{job_id}")
 async def download_transcript(job_id: str):
@@ -0,0 +1,105 @@
+"""
+Shared HTTP clients for the backend, created once per app in the lifespan.
+
+- transcription: async client for the transcription service (keep-alive
+  pool, retries on 5xx/connection errors, circuit breaker)
+- openrouter: sync session for WargameAnalyzer's blocking methods
+- openrouter_async: async client the pipeline awaits (holds no threads);
+  shares its circuit breaker with `openrouter`
+
+Both come from data_processing/http_resilience.py, so OpenRouter calls from
+the CLI pipeline and from the backend share the same retry and breaker
+behaviour. `snapshot()` exposes per-client call statistics.
+
+Configuration (environment):
+    HTTP_MAX_ATTEMPTS           Attempts per call incl. retries (default: 4)
+    HTTP_BREAKER_THRESHOLD      Consecutive failures that open a circuit (default: 5)
+    HTTP_BREAKER_RESET          Seconds a circuit stays open (default: 30)
+    OPENROUTER_POOL_SIZE        Pooled OpenRouter connections per client (default: 10)
+"""
+
+import os
+import sys
+from pathlib import Path
+from typing import Dict, Optional
+
+# Add repository root to path (data_processing lives next to backend/)
+sys.path.insert(0, str(Path(__file__).parent.parent.parent.parent))
+
+from data_processing.http_resilience import (  # noqa: F401 (CircuitOpenError, parse_retry_after re-exported)
+    CircuitBreaker,
+    CircuitOpenError,
+    ResilientAsyncClient,
+    ResilientSession,
+    RetryPolicy,
+    parse_retry_after,
+)
+
+TRANSCRIPTION_SERVICE_URL = os.environ.get("TRANSCRIPTION_SERVICE_URL", "http://localhost:8001")
+
+
+class HttpClients:
+    """The backend's outgoing HTTP clients, one per dependency."""
+
+    def __init__(self):
+        attempts = int(os.environ.get("HTTP_MAX_ATTEMPTS", "4"))
+        threshold = int(os.environ.get("HTTP_BREAKER_THRESHOLD", "5"))
+        reset = float(os.environ.get("HTTP_BREAKER_RESET", "30"))
+
+        self.transcription = ResilientAsyncClient(
+            "transcription",
+            base_url=TRANSCRIPTION_SERVICE_URL,
+            policy=RetryPolicy(max_attempts=attempts),
+            breaker=CircuitBreaker("transcription", threshold, reset),
+        )
+        # One breaker: OpenRouter is down for both clients or for neither
+        openrouter_breaker = CircuitBreaker("openrouter", threshold, reset)
+        pool_size = int(os.environ.get("OPENROUTER_POOL_SIZE", "10"))
+        self.openrouter = ResilientSession(
+            "openrouter",
+            policy=RetryPolicy(max_attempts=attempts),
+            breaker=openrouter_breaker,
+            pool_size=pool_size,
+        )
+        self.openrouter_async = ResilientAsyncClient(
+            "openrouter",
+            policy=RetryPolicy(max_attempts=attempts),
+            breaker=openrouter_breaker,
+            max_connections=pool_size,
+        )
+
+    async def aclose(self) -> None:
+        await self.transcription.aclose()
+        await self.openrouter_async.aclose()
+        self.openrouter.close()
+
+    def snapshot(self) -> Dict:
+        return {
+            "transcription": self.transcription.snapshot(),
+            "openrouter": self.openrouter.snapshot(),
+            "openrouter_async": self.openrouter_async.snapshot(),
+        }
+
+
+_clients: Optional[HttpClients] = None
+
+
+def start() -> HttpClients:
+    """Create the shared clients (called from the app lifespan)."""
+    global _clients
+    if _clients is None:
+        _clients = HttpClients()
+    return _clients
+
+
+async def stop() -> None:
+    """Close pooled connections (called when the app shuts down)."""
+    global _clients
+    if _clients is not None:
+        await _clients.aclose()
+        _clients = None
+
+
+def get() -> HttpClients:
+    """The shared clients; created on first use outside a lifespan (e.g. scripts)."""
+    return _clients or start()
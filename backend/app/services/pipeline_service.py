@@ -1,81 +1,193 @@
+"""
+Data processing pipeline (round splitting and reports) for the backend.
+
+One PipelineService is created per app in the FastAPI lifespan (`start()`/
+`stop()`) and shared by all jobs: one analyzer and system prompts read once
+(`reload_prompts()` re-reads them). OpenRouter calls are awaited on the
+shared async client, so they hold no threads; an app-wide limit caps how
+many run at once. Per-job overhead therefore stays constant however many
+games are processed.
+
+Configuration (environment):
+    PIPELINE_MAX_CALLS          Concurrent OpenRouter requests, across all jobs (default: 8)
+    PIPELINE_MAX_JOBS           Jobs analysed at the same time (default: 2)
+    PIPELINE_ROUND_CONCURRENCY  Round reports of one job generated in parallel (default: 4)
+"""
+
 import os
-import re
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
-from typing import Dict, Any, Callable, Optional
+import logging
+import threading
+import time
+from functools import partial
+from typing import Dict, Any, Callable, List, Optional, Tuple
 from pathlib import Path
 import sys
 
 # Add data_processing to path
 sys.path.insert(0, str(Path(__file__).parent.parent.parent.parent))
 
+from data_processing.http_resilience import ResilientAsyncClient, ResilientSession
+from data_processing.transcript_parser import format_mmss, parse_line
 from data_processing.wargame_analyzer import WargameAnalyzer
 
 
+PROMPTS_DIR = Path(__file__).parent.parent.parent.parent / "data_processing"
+
+# Minimum seconds between two streaming progress updates of one job step
+STREAM_PROGRESS_INTERVAL = 0.5
+
+
+def _throttled(progress_callback: Optional[Callable[[int, str, str], Any]]):
+    """Progress callback that drops updates arriving faster than STREAM_PROGRESS_INTERVAL."""
+    last = 0.0
+
+    async def emit(pct: int, step: str, name: str) -> None:
+        nonlocal last
+        now = time.monotonic()
+        if progress_callback and now - last >= STREAM_PROGRESS_INTERVAL:
+            last = now
+            await progress_callback(pct, step, name)
+
+    return emit
+
+
 class PipelineService:
     """Service for running data processing pipeline."""
 
     def __init__(
         self,
         api_key: str = None,
-        model: str = "anthropic/claude-3.5-sonnet"
+        model: str = "anthropic/claude-3.5-sonnet",
+        http: ResilientSession = None,
+        ahttp: ResilientAsyncClient = None,
+        max_calls: int = 8,
+        max_jobs: int = 2,
+        round_concurrency: int = 4
     ):
         self.api_key = api_key or os.environ.get("OPENROUTER_API_KEY")
         if not self.api_key:
             raise ValueError("OPENROUTER_API_KEY not configured")
 
         self.model = model
-        self.analyzer = WargameAnalyzer(api_key=self.api_key)
-        self._executor = ThreadPoolExecutor(max_workers=2)
+        # Shared by all jobs; bounds concurrent OpenRouter calls app-wide.
+        # The analyzer takes a slot per HTTP request, so calls that fan out
+        # (boundary windows, map-reduce) stay within the cap too
+        self.max_calls = max_calls
+        self._call_slots = asyncio.Semaphore(max_calls)
+        self.analyzer = WargameAnalyzer(
+            api_key=self.api_key, http=http, ahttp=ahttp, request_slots=self._call_slots
+        )
+        self.max_jobs = max_jobs
+        self._job_slots = asyncio.Semaphore(max_jobs)
+        # Rounds of one job generated in parallel (_call_slots caps all jobs)
+        self.round_concurrency = max(1, round_concurrency)
+        self._active_jobs = 0
+        self._waiting_jobs = 0
+
+        self._prompts_lock = threading.Lock()
+        self.reload_prompts()
+
+    @classmethod
+    def from_env(
+        cls,
+        http: ResilientSession = None,
+        ahttp: ResilientAsyncClient = None
+    ) -> "PipelineService":
+        return cls(
+            http=http,
+            ahttp=ahttp,
+            max_calls=int(os.environ.get("PIPELINE_MAX_CALLS", "8")),
+            max_jobs=int(os.environ.get("PIPELINE_MAX_JOBS", "2")),
+            round_concurrency=int(os.environ.get("PIPELINE_ROUND_CONCURRENCY", "4")),
+        )
+
+    def reload_prompts(self) -> Dict[str, int]:
+        """(Re-)read the system prompts; running jobs keep the ones they started with."""
+        split_prompt = (PROMPTS_DIR / "systemprompt_split_rounds.txt").read_text(encoding="utf-8")
+        boundary_prompt = (PROMPTS_DIR / "systemprompt_round_boundary.txt").read_text(encoding="utf-8")
+        report_prompt = (PROMPTS_DIR / "systemprompt_json.txt").read_text(encoding="utf-8")
+        with self._prompts_lock:
+            self.round_splitter_prompt = split_prompt
+            self.round_boundary_prompt = boundary_prompt
+            self.game_report_prompt = report_prompt
+        return {
+            "systemprompt_split_rounds.txt": len(split_prompt),
+            "systemprompt_round_boundary.txt": len(boundary_prompt),
+            "systemprompt_json.txt": len(report_prompt),
+        }
 
-        # Load system prompts
-        prompts_dir = Path(__file__).parent.parent.parent.parent / "data_processing"
-        self.round_splitter_prompt = (prompts_dir / "systemprompt_split_rounds.txt").read_text(encoding="utf-8")
-        self.game_report_prompt = (prompts_dir / "systemprompt_json.txt").read_text(encoding="utf-8")
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "model": self.model,
+            "max_calls": self.max_calls,
+            "max_jobs": self.max_jobs,
+            "round_concurrency": self.round_concurrency,
+            "active_jobs": self._active_jobs,
+            "waiting_jobs": self._waiting_jobs,
+            # Tokens of sent requests, incl. prompt prefixes served from the provider cache
+            "usage": self.analyzer.usage.snapshot(),
+            # Estimated vs. actual prompt tokens and max_tokens per stage
+            "token_budget": self.analyzer.budget.snapshot(),
+        }
+
+    async def close(self) -> None:
+        self.analyzer.close()
+        await self.analyzer.aclose()
+
+    @staticmethod
+    def format_utterances(utterances: List[Dict[str, Any]]) -> str:
+        """
+        Render structured utterances from the transcription service
+        (format=json) directly in data_processing format, without a text
+        round-trip.
+
+        Output: MM:SS–MM:SS Speaker 0 (Moderator): "text"
+        (minutes keep counting past 60, e.g. 75:02)
+        """
+        lines = []
+        for u in utterances:
+            end = u.get("end")
+            if end is None or end <= u["start"]:
+                end = u["start"]
+            speaker = f"Speaker {u['speaker_id']}"
+            role = u.get("role")
+            if role and role != "Unknown":
+                speaker = f"{speaker} ({role})"
+            text = u["text"].replace('"', '\\"')
+            lines.append(f"{format_mmss(u['start'])}–{format_mmss(end)} {speaker}: \"{text}\"")
+        return "\n".join(lines)
 
     def _convert_transcript_format(self, transcript: str) -> str:
         """
         Convert from audio pipeline format to data_processing format.
 
-        Input:  HH:MM:SS Speaker 0 (Moderator): "text"
-        Output: MM:SS-MM:SS Speaker 0 (Moderator): "text"
+        Input:  HH:MM:SS[–HH:MM:SS] Speaker 0 (Moderator): "text"
+        Output: MM:SS–MM:SS Speaker 0 (Moderator): "text"
+
+        Each line is parsed once (data_processing/transcript_parser.py);
+        lines without an end time end where the next line starts.
         """
         lines = transcript.split('\n')
+        records = [parse_line(line, i) for i, line in enumerate(lines)]
         converted = []
 
-        for i, line in enumerate(lines):
-            # Match HH:MM:SS pattern at start of line
-            match = re.match(r'(\d{2}):(\d{2}):(\d{2})\s+(.+)', line)
-            if match:
-                hours, mins, secs, rest = match.groups()
-
-                # Calculate total minutes for start
-                total_mins = int(hours) * 60 + int(mins)
-
-                # Calculate end time from next line or estimate
-                end_mins = total_mins
-                end_secs = secs
-
-                if i + 1 < len(lines):
-                    next_match = re.match(r'(\d{2}):(\d{2}):(\d{2})', lines[i + 1])
-                    if next_match:
-                        next_hours = int(next_match.group(1))
-                        next_mins_raw = int(next_match.group(2))
-                        next_secs = next_match.group(3)
-                        end_mins = next_hours * 60 + next_mins_raw
-                        end_secs = next_secs
-
-                # Format: MM:SS-MM:SS rest
-                converted.append(f"{total_mins:02d}:{secs}–{end_mins:02d}:{end_secs} {rest}")
-            else:
+        for i, (line, record) in enumerate(zip(lines, records)):
+            if record is None:
                 converted.append(line)
-
+                continue
+            end = record.end
+            if end is None:
+                following = records[i + 1] if i + 1 < len(records) else None
+                end = following.start if following is not None else record.start
+            converted.append(record.render(end=end))
         return '\n'.join(converted)
 
     async def run_pipeline(
         self,
         transcript: str,
-        progress_callback: Callable[[int, str, str], Any] = None
+        progress_callback: Callable[[int, str, str], Any] = None,
+        utterances: Optional[List[Dict[str, Any]]] = None
     ) -> Dict[str, Any]:
         """
         Run full pipeline on transcript.
@@ -83,10 +195,39 @@ class PipelineService:
         Args:
             transcript: Formatted transcript text from audio pipeline
             progress_callback: Async callback(progress_pct, step, step_name)
+            utterances: Structured utterances (format=json); if given, the
+                transcript text is rendered from them instead of re-parsed
 
         Returns:
             Dict with rounds_overview, rounds, combined report
         """
+        if self._job_slots.locked() and progress_callback:
+            await progress_callback(70, "waiting", "Warte auf freien Analyse-Platz...")
+
+        self._waiting_jobs += 1
+        try:
+            await self._job_slots.acquire()
+        finally:
+            self._waiting_jobs -= 1
+        self._active_jobs += 1
+        try:
+            return await self._run_pipeline(transcript, progress_callback, utterances)
+        finally:
+            self._active_jobs -= 1
+            self._job_slots.release()
+
+    async def _run_pipeline(
+        self,
+        transcript: str,
+        progress_callback: Optional[Callable[[int, str, str], Any]],
+        utterances: Optional[List[Dict[str, Any]]]
+    ) -> Dict[str, Any]:
+        # Prompts as of job start, even if reloaded meanwhile
+        with self._prompts_lock:
+            round_splitter_prompt = self.round_splitter_prompt
+            round_boundary_prompt = self.round_boundary_prompt
+            game_report_prompt = self.game_report_prompt
+
         result = {
             "rounds_overview": None,
             "rounds": [],
@@ -95,21 +236,30 @@ class PipelineService:
         }
 
         # Convert transcript format
-        converted_transcript = self._convert_transcript_format(transcript)
+        if utterances is not None:
+            converted_transcript = self.format_utterances(utterances)
+        else:
+            converted_transcript = self._convert_transcript_format(transcript)
 
         # Step 1: Split rounds (70-80%)
         if progress_callback:
             await progress_callback(70, "splitting", "Erkenne Runden-Grenzen...")
 
+        split_progress = _throttled(progress_callback)
+
+        async def on_split_progress(info: dict) -> None:
+            await split_progress(70, "splitting", f"Erkenne Runden-Grenzen... ({info['tokens']} Tokens)")
+
         try:
-            loop = asyncio.get_event_loop()
-            rounds_json = await loop.run_in_executor(
-                self._executor,
-                lambda: self.analyzer.split_rounds_from_text(
-                    converted_transcript,
-                    self.round_splitter_prompt,
-                    self.model
-                )
+            # Boundaries are found locally; the LLM only sees short windows
+            # around ambiguous ones (or the whole transcript if no game
+            # structure is recognisable at all)
+            rounds_json = await self.analyzer.adetect_rounds_from_text(
+                converted_transcript,
+                round_boundary_prompt,
+                self.model,
+                fallback_prompt=round_splitter_prompt,
+                on_progress=on_split_progress
             )
             result["rounds_overview"] = rounds_json
         except Exception as e:
@@ -131,33 +281,11 @@ class PipelineService:
             result["errors"].append(f"Round text extraction failed: {str(e)}")
             round_texts = [converted_transcript]  # Fallback: entire transcript
 
-        # Step 3: Generate reports (80-98%)
-        num_rounds = len(round_texts)
-        for i, round_text in enumerate(round_texts, start=1):
-            progress_pct = 80 + int((i / num_rounds) * 18)
-
-            if progress_callback:
-                await progress_callback(
-                    progress_pct,
-                    f"report_round_{i}",
-                    f"Analysiere Runde {i} von {num_rounds}..."
-                )
-
-            try:
-                loop = asyncio.get_event_loop()
-                report = await loop.run_in_executor(
-                    self._executor,
-                    lambda rt=round_text, rn=i: self.analyzer.generate_report_for_round_from_text(
-                        rn,
-                        rt,
-                        self.game_report_prompt,
-                        self.model
-                    )
-                )
-                result["rounds"].append(report)
-            except Exception as e:
-                result["errors"].append(f"Round {i} report failed: {str(e)}")
-                result["rounds"].append(None)
+        # Step 3: Generate reports concurrently (80-98%)
+        result["rounds"], round_errors = await self._generate_round_reports(
+            round_texts, game_report_prompt, progress_callback
+        )
+        result["errors"].extend(round_errors)
 
         # Step 4: Combine reports (98-100%)
         if progress_callback:
@@ -167,6 +295,76 @@ class PipelineService:
 
         return result
 
+    async def _generate_round_reports(
+        self,
+        round_texts: List[str],
+        game_report_prompt: str,
+        progress_callback: Optional[Callable[[int, str, str], Any]]
+    ) -> Tuple[List[Optional[dict]], List[str]]:
+        """
+        Generate one report per round, up to `round_concurrency` at a time.
+
+        Reports are returned in round order (None for failed rounds); a
+        failing round does not affect the others. Progress is reported as
+        rounds finish, in whatever order that happens, and in between from
+        the streamed responses (tokens received, JSON sections completed).
+        """
+        num_rounds = len(round_texts)
+        reports: List[Optional[dict]] = [None] * num_rounds
+        errors: Dict[int, str] = {}
+        limit = asyncio.Semaphore(self.round_concurrency)
+        streamed: Dict[int, dict] = {}
+        finished = 0
+        stream_progress = _throttled(progress_callback)
+
+        def status() -> Tuple[int, str]:
+            pct = 80 + int((finished / num_rounds) * 18)
+            name = f"{finished} von {num_rounds} Runden analysiert"
+            if streamed:
+                tokens = sum(info["tokens"] for info in streamed.values())
+                sections = sum(info["sections"] for info in streamed.values())
+                name += f" ({tokens} Tokens, {sections} Abschnitte empfangen)"
+            return pct, name
+
+        async def on_round_progress(round_number: int, info: dict) -> None:
+            streamed[round_number] = info
+            pct, name = status()
+            await stream_progress(pct, "reports", name)
+
+        async def generate(round_number: int, round_text: str) -> None:
+            async with limit:
+                try:
+                    reports[round_number - 1] = await self.analyzer.agenerate_report_for_round_from_text(
+                        round_number,
+                        round_text,
+                        game_report_prompt,
+                        self.model,
+                        on_progress=partial(on_round_progress, round_number)
+                    )
+                except Exception as e:
+                    errors[round_number] = f"Round {round_number} report failed: {str(e)}"
+
+        if progress_callback:
+            await progress_callback(80, "reports", f"Analysiere {num_rounds} Runden...")
+
+        tasks = [
+            asyncio.ensure_future(generate(i, round_text))
+            for i, round_text in enumerate(round_texts, start=1)
+        ]
+        try:
+            for task in asyncio.as_completed(tasks):
+                await task
+                finished += 1
+                if progress_callback:
+                    pct, name = status()
+                    await progress_callback(pct, "reports", name)
+        finally:
+            # E.g. the job was cancelled: don't leave rounds running unobserved
+            for task in tasks:
+                task.cancel()
+
+        return reports, [errors[n] for n in sorted(errors)]
+
     def _combine_reports(
         self,
         rounds_overview: dict,
@@ -198,3 +396,40 @@ class PipelineService:
             combined["rounds_overview"] = rounds_overview
 
         return combined
+
+
+_service: Optional[PipelineService] = None
+
+
+def start(
+    http: ResilientSession = None,
+    ahttp: ResilientAsyncClient = None
+) -> Optional[PipelineService]:
+    """Create the shared service (called from the app lifespan)."""
+    global _service
+    if _service is None:
+        try:
+            _service = PipelineService.from_env(http=http, ahttp=ahttp)
+        except ValueError as e:
+            # Transcription still works; jobs report the pipeline error
+            logging.warning("Data processing pipeline disabled: %s", e)
+    return _service
+
+
+async def stop() -> None:
+    """Release the shared service (called when the app shuts down)."""
+    global _service
+    if _service is not None:
+        await _service.close()
+        _service = None
+
+
+def get(
+    http: ResilientSession = None,
+    ahttp: ResilientAsyncClient = None
+) -> PipelineService:
+    """The shared service; raises ValueError if OPENROUTER_API_KEY is missing."""
+    global _service
+    if _service is None:
+        _service = PipelineService.from_env(http=http, ahttp=ahttp)
+    return _service
@@ -0,0 +1,56 @@
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional
+
+
+def parse_time(value: str) -> float:
+    """Parse 'HH:MM:SS', 'MM:SS' or plain seconds into seconds."""
+    parts = value.strip().split(":")
+    if len(parts) > 3:
+        raise ValueError(f"Invalid time '{value}'")
+    try:
+        seconds = 0.0
+        for part in parts:
+            seconds = seconds * 60 + float(part)
+    except ValueError:
+        raise ValueError(f"Invalid time '{value}', expected HH:MM:SS, MM:SS or seconds")
+    if seconds < 0:
+        raise ValueError(f"Invalid time '{value}'")
+    return seconds
+
+
+class TranscriptIndex:
+    """Sorted index over utterance start times for time/line-range slicing."""
+
+    def __init__(self, utterances: List[Dict[str, Any]]):
+        self.utterances = utterances
+        self.starts = [u["start"] for u in utterances]
+
+    def slice(
+        self,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+        offset: int = 0,
+        limit: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """
+        Utterances starting in [start, end), then `limit` of them from
+        `offset`. Boundaries are found by bisection.
+        """
+        lo = bisect_left(self.starts, start) if start is not None else 0
+        hi = bisect_left(self.starts, end) if end is not None else len(self.starts)
+        hi = max(lo, hi)
+        first = min(lo + offset, hi)
+        last = hi if limit is None else min(first + limit, hi)
+        return {
+            "utterances": self.utterances[first:last],
+            "page": {
+                "from": start,
+                "to": end,
+                "offset": offset,
+                "limit": limit,
+                "returned": last - first,
+                "matching": hi - lo,
+                "total": len(self.starts),
+                "first_line": first,
+            },
+        }
@@ -0,0 +1,107 @@
+"""
+Stream a multipart upload straight to disk.
+
+FastAPI's UploadFile makes Starlette parse the whole multipart body into a
+temporary file before the handler runs; copying that into our own spool file
+wrote every upload twice. Here the request body is fed chunk by chunk into a
+streaming multipart parser and the file part is written once, directly to the
+target directory. Admission limits are enforced while the body streams in by
+AdmissionMiddleware (see admission.py).
+"""
+
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional
+
+from fastapi import Request
+from python_multipart.multipart import MultipartParser, parse_options_header
+
+
+class UploadError(ValueError):
+    """The request body is not a usable multipart upload."""
+
+
+@dataclass
+class SpooledUpload:
+    path: Path
+    filename: str
+    content_type: Optional[str]
+    size: int
+
+
+async def spool_upload(request: Request, directory: Path, field: str = "file") -> SpooledUpload:
+    """
+    Write the multipart part named `field` of the request body to a new file
+    in `directory`; other parts are ignored. Raises UploadError if the body
+    is not multipart or has no such file part. The caller owns the file.
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise UploadError("Expected a multipart/form-data upload")
+
+    headers: Dict[bytes, bytes] = {}
+    header_field = bytearray()
+    header_value = bytearray()
+    state = {"file": None, "upload": None}
+
+    def on_header_field(data: bytes, start: int, end: int) -> None:
+        header_field.extend(data[start:end])
+
+    def on_header_value(data: bytes, start: int, end: int) -> None:
+        header_value.extend(data[start:end])
+
+    def on_header_end() -> None:
+        headers[bytes(header_field).lower()] = bytes(header_value)
+        header_field.clear()
+        header_value.clear()
+
+    def on_headers_finished() -> None:
+        _, disposition = parse_options_header(headers.get(b"content-disposition", b""))
+        filename = disposition.get(b"filename")
+        if disposition.get(b"name") == field.encode() and filename and state["upload"] is None:
+            name = filename.decode("utf-8", "replace")
+            spool = tempfile.NamedTemporaryFile(dir=directory, suffix=Path(name).suffix or ".wav", delete=False)
+            state["file"] = spool
+            state["upload"] = SpooledUpload(
+                path=Path(spool.name),
+                filename=name,
+                content_type=headers.get(b"content-type", b"").decode("latin-1") or None,
+                size=0,
+            )
+        headers.clear()
+
+    def on_part_data(data: bytes, start: int, end: int) -> None:
+        if state["file"] is not None:
+            state["file"].write(data[start:end])
+            state["upload"].size += end - start
+
+    def on_part_end() -> None:
+        if state["file"] is not None:
+            state["file"].close()
+            state["file"] = None
+
+    parser = MultipartParser(boundary, {
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+    })
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+        parser.finalize()
+    except BaseException:
+        if state["file"] is not None:
+            state["file"].close()
+        if state["upload"] is not None:
+            state["upload"].path.unlink(missing_ok=True)
+        raise
+
+    upload = state["upload"]
+    if upload is None:
+        raise UploadError("Filename is required")
+    return upload
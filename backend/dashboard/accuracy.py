@@ -1,10 +1,15 @@
 import openai
 import re
 import json
+import sys
+from pathlib import Path
 from docx import Document
 from collections import defaultdict
 from openai import OpenAI
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from data_processing.llm_cache import LLMCache
+
 
 # ====== Konfiguration ======
 client = OpenAI(
@@ -12,6 +17,24 @@ client = OpenAI(
     base_url="https://openrouter.ai/api/v1"
 )
 
+# Wiederholte Auswertungen derselben Dateien beantwortet der Cache
+llm_cache = LLMCache.from_env()
+
+
+def chat(model, messages, temperature=0):
+    """Chat-Completion über OpenRouter; liefert den Antworttext (gecacht)."""
+    def send():
+        response = client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature
+        )
+        return response.model_dump()
+
+    payload = {"model": model, "messages": messages, "temperature": temperature}
+    result = llm_cache.call(payload, send) if llm_cache else send()
+    return result["choices"][0]["message"]["content"]
+
 # ====== Dateien einlesen ======
 def read_text_file(filepath):
     with open(filepath, 'r', encoding='utf-8') as f:
@@ -109,12 +132,7 @@ GIB DEIN ERGEBNIS AUSSCHLIESSLICH ALS FOLGENDES JSON AUS:
 TRANSKRIPT:
 {text}
 """
-    response = client.chat.completions.create(
-        model="openai/gpt-4o",
-        messages=[{"role":"user","content":prompt}],
-        temperature=0
-    )
-    answer = response.choices[0].message.content
+    answer = chat("openai/gpt-4o", [{"role":"user","content":prompt}])
 
     # JSON extrahieren
     match = re.search(r'\{.*\}', answer, re.DOTALL)
@@ -260,12 +278,7 @@ KRITISCH:
 - Aspekte in only_in_text1 oder only_in_text2 reduzieren die Similarity NICHT!
 """
 
-    response = client.chat.completions.create(
-        model="openai/gpt-4o",
-        messages=[{"role":"user","content":prompt}],
-        temperature=0
-    )
-    answer = response.choices[0].message.content
+    answer = chat("openai/gpt-4o", [{"role":"user","content":prompt}])
     try:
         match = re.search(r'\{.*\}', answer, re.DOTALL)
         if match:
@@ -1,60 +1,61 @@
-import re
 from collections import defaultdict
 from datetime import datetime
 import json
 import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from data_processing.transcript_parser import read_transcript
 
 
 base_dir = os.path.dirname(os.path.abspath(__file__))
 filepath = os.path.join(base_dir, "transcript_v2.txt")
 
 
-def parse_timestamp(timestamp_str):
-    """Konvertiert Timestamp-String (HH:MM:SS oder MM:SS) zu Sekunden."""
-    parts = timestamp_str.split(':')
-    if len(parts) == 3:  # HH:MM:SS
-        return int(parts[0]) * 3600 + int(parts[1]) * 60 + int(parts[2])
-    elif len(parts) == 2:  # MM:SS
-        return int(parts[0]) * 60 + int(parts[1])
-    return 0
+def speaker_times_from_result(result):
+    """
+    Redezeiten aus dem strukturierten Ergebnis des Transcription Service
+    (GET /result/{job_id}?format=json) - sekundengenau, ohne Text-Parsing.
+    """
+    speaker_times = defaultdict(float)
+    result = result.get("result", result)
+    for u in result["utterances"]:
+        if u.get("end") is None:
+            continue
+        speaker = f"Speaker {u['speaker_id']}"
+        if u.get("role") and u["role"] != "Unknown":
+            speaker += f" ({u['role']})"
+        duration = u["end"] - u["start"]
+        if duration > 0:
+            speaker_times[speaker] += duration
+    return speaker_times
+
 
 def analyze_speakers(filepath):
     """
-    Analysiert die Transkript-Datei und berechnet Redeanteile.
+    Analysiert die Transkript-Datei (.txt oder strukturiertes .json) und
+    berechnet Redeanteile.
     """
+    if filepath.endswith(".json"):
+        with open(filepath, 'r', encoding='utf-8') as f:
+            speaker_times = speaker_times_from_result(json.load(f))
+        return _report_speaker_times(speaker_times)
+
     speaker_times = defaultdict(int)  # Speaker -> Gesamtzeit in Sekunden
     
-    # Pattern für Zeilen wie: "00:00–00:16 Speaker 0 (Moderator): ..." oder "00:00–00:16 Clara: ..."
-    # Format: TIMESTAMP–TIMESTAMP SPEAKER_NAME: TEXT
-    pattern = r'(\d{1,2}:\d{2})(?::(\d{2}))?–(\d{1,2}:\d{2})(?::(\d{2}))?\s+([^:]+):'
-    
-    with open(filepath, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
-    # Finde alle Zeitstempel und Speaker
-    matches = re.finditer(pattern, content, re.MULTILINE)
-    
-    for match in matches:
-        # Extrahiere Start und End Timestamps
-        start_str = match.group(1)
-        if match.group(2):  # Hat Sekunden
-            start_str += f":{match.group(2)}"
-        
-        end_str = match.group(3)
-        if match.group(4):  # Hat Sekunden
-            end_str += f":{match.group(4)}"
-        
-        # Speaker Name (z.B. "Speaker 0 (Moderator)" oder "Speaker 1")
-        speaker = match.group(5).strip()
-        
-        # Berechne Redezeit
-        start_sec = parse_timestamp(start_str)
-        end_sec = parse_timestamp(end_str)
-        duration = end_sec - start_sec
-        
-        if duration > 0:
-            speaker_times[speaker] += duration
+    # Zeilen wie "00:00–00:16 Speaker 0 (Moderator): ..." oder "00:00–00:16 Clara: ..."
+    # zeilenweise zerlegen (data_processing/transcript_parser.py), ohne die Datei ganz zu laden
+    for record in read_transcript(filepath):
+        # Zeilen ohne End-Zeitstempel haben keine Redezeit
+        if record.duration > 0:
+            speaker_times[record.speaker] += record.duration
     
+    return _report_speaker_times(speaker_times)
+
+
+def _report_speaker_times(speaker_times):
+    """Gibt Redeanteile aus und liefert das JSON-Ergebnis zurück."""
     # Berechne Gesamtzeit
     total_time = sum(speaker_times.values())
     
@@ -65,12 +66,12 @@ def analyze_speakers(filepath):
     # Sortiere Speaker nach Redezeit (absteigend)
     sorted_speakers = sorted(speaker_times.items(), key=lambda x: x[1], reverse=True)
     
-    print(f"\nGesamte Aufnahmezeit: {total_time // 60} Min {total_time % 60} Sek\n")
+    print(f"\nGesamte Aufnahmezeit: {int(total_time) // 60} Min {int(total_time) % 60} Sek\n")
     
     for speaker, time_sec in sorted_speakers:
         percentage = (time_sec / total_time) * 100
-        minutes = time_sec // 60
-        seconds = time_sec % 60
+        minutes = int(time_sec) // 60
+        seconds = int(time_sec) % 60
         
         
         print(f"{speaker:10} {percentage:5.1f}% ({minutes}:{seconds:02d})")
@@ -80,10 +81,10 @@ def analyze_speakers(filepath):
     # JSON-Output für weitere Verarbeitung
     print("\nJSON-Format:")
     result = {
-        "total_seconds": total_time,
+        "total_seconds": round(total_time, 2),
         "speakers": {
             speaker: {
-                "seconds": time_sec,
+                "seconds": round(time_sec, 2),
                 "percentage": round((time_sec / total_time) * 100, 2)
             }
             for speaker, time_sec in sorted_speakers
@@ -91,6 +92,7 @@ def analyze_speakers(filepath):
     }
     
     print(json.dumps(result, indent=2, ensure_ascii=False))
+    return result
 
 if __name__ == "__main__":
     analyze_speakers(filepath)
\ No newline at end of file
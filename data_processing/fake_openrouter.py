@@ -0,0 +1,280 @@
+"""
+Lokaler Stand-in für die OpenRouter Chat-Completions-API.
+
+Zum Testen der Request-Form und des Prompt-Cachings ohne API-Key und
+Kosten:
+
+    python fake_openrouter.py --port 8089
+    OPENROUTER_BASE_URL=http://localhost:8089/api/v1 python pipeline.py
+
+Der Server
+- prüft die Request-Form (model, messages, Content-Parts, cache_control)
+  und antwortet bei Fehlern mit HTTP 400 wie OpenRouter;
+- simuliert Provider-Prefix-Caching: alles bis einschließlich des letzten
+  Content-Parts mit cache_control ist das Präfix; wird dasselbe Präfix
+  (gleiches Modell) innerhalb von --cache-ttl Sekunden erneut gesendet,
+  meldet `usage.prompt_tokens_details.cached_tokens` dessen Tokens,
+  sonst `cache_write_tokens`;
+- verzögert die Antwort proportional zu den ungecachten Prompt-Tokens
+  (--ms-per-1k-tokens), sodass Time-to-first-Token messbar sinkt;
+- streamt bei `stream: true` Server-Sent Events wie OpenRouter (Chunks
+  à --chunk-chars Zeichen, Usage im letzten Chunk, "data: [DONE]");
+- liefert unter GET /stats Zähler und die Form des letzten Requests.
+
+Tokens werden mit demselben Tokenizer gezählt wie im Token-Budget des
+Analyzers (LLM_TOKENIZER, siehe token_budget.py).
+"""
+
+import argparse
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from .token_budget import get_tokenizer
+except ImportError:  # als Skript aus data_processing/ gestartet
+    from token_budget import get_tokenizer
+
+DEFAULT_REPLY = '{"stand_in": true}'
+
+estimate_tokens = get_tokenizer()
+
+
+class RequestShapeError(ValueError):
+    """Request entspricht nicht der Form, die OpenRouter akzeptiert."""
+
+
+def _parts(message: dict) -> List[dict]:
+    """Content einer Nachricht als Liste von Text-Parts (prüft die Form)."""
+    content = message.get("content")
+    if isinstance(content, str):
+        return [{"type": "text", "text": content}]
+    if not isinstance(content, list) or not content:
+        raise RequestShapeError("message content must be a string or a non-empty list of parts")
+    for part in content:
+        if not isinstance(part, dict) or part.get("type") != "text" or not isinstance(part.get("text"), str):
+            raise RequestShapeError("content parts must be {'type': 'text', 'text': str}")
+        cache_control = part.get("cache_control")
+        if cache_control is not None and cache_control != {"type": "ephemeral"}:
+            raise RequestShapeError("cache_control must be {'type': 'ephemeral'}")
+    return content
+
+
+def cacheable_prefix(messages: List[dict]) -> Tuple[str, int]:
+    """(Präfix-Text, Anzahl Breakpoints) bis zum letzten Part mit cache_control."""
+    texts, prefix, breakpoints = [], "", 0
+    for message in messages:
+        if message.get("role") not in ("system", "user", "assistant"):
+            raise RequestShapeError(f"unknown role: {message.get('role')!r}")
+        texts.append(f"<{message['role']}>")
+        for part in _parts(message):
+            texts.append(part["text"])
+            if part.get("cache_control"):
+                breakpoints += 1
+                prefix = "".join(texts)
+    if breakpoints > 4:
+        raise RequestShapeError("at most 4 cache_control breakpoints are allowed")
+    return prefix, breakpoints
+
+
+class FakeOpenRouter:
+    """Zustand des Stand-ins: Präfix-Cache und Statistik."""
+
+    def __init__(
+        self,
+        reply: str = DEFAULT_REPLY,
+        cache_ttl: float = 300.0,
+        ms_per_1k_tokens: float = 20.0,
+        chunk_chars: int = 16,
+        chunk_delay: float = 0.0,
+    ):
+        self.reply = reply
+        self.cache_ttl = cache_ttl
+        self.ms_per_1k_tokens = ms_per_1k_tokens
+        self.chunk_chars = chunk_chars
+        self.chunk_delay = chunk_delay
+        self._lock = threading.Lock()
+        self._prefixes: Dict[str, float] = {}
+        self.stats = {
+            "requests": 0, "rejected": 0, "cache_hits": 0, "cache_writes": 0,
+            "aborted_streams": 0, "last_request": None,
+        }
+
+    def complete(self, body: dict) -> dict:
+        if not isinstance(body.get("model"), str) or not body["model"]:
+            raise RequestShapeError("model is required")
+        messages = body.get("messages")
+        if not isinstance(messages, list) or not messages:
+            raise RequestShapeError("messages must be a non-empty list")
+
+        max_tokens = body.get("max_tokens")
+        if max_tokens is not None and (not isinstance(max_tokens, int) or max_tokens < 1):
+            raise RequestShapeError("max_tokens must be a positive integer")
+
+        prefix, breakpoints = cacheable_prefix(messages)
+        prompt_tokens = sum(
+            estimate_tokens(part["text"]) for message in messages for part in _parts(message)
+        )
+        cached_tokens = cache_write_tokens = 0
+        if prefix:
+            key = hashlib.sha256(f"{body['model']}\0{prefix}".encode("utf-8")).hexdigest()
+            now = time.time()
+            with self._lock:
+                hit = self._prefixes.get(key, 0) > now
+                self._prefixes[key] = now + self.cache_ttl
+                self.stats["cache_hits" if hit else "cache_writes"] += 1
+            if hit:
+                cached_tokens = estimate_tokens(prefix)
+            else:
+                cache_write_tokens = estimate_tokens(prefix)
+
+        time.sleep((prompt_tokens - cached_tokens) / 1000 * self.ms_per_1k_tokens / 1000)
+
+        with self._lock:
+            self.stats["requests"] += 1
+            self.stats["last_request"] = {
+                "model": body["model"],
+                "roles": [m["role"] for m in messages],
+                "system_is_parts": isinstance(messages[0].get("content"), list),
+                "cache_breakpoints": breakpoints,
+                "max_tokens": body.get("max_tokens"),
+                "temperature": body.get("temperature"),
+                "usage_include": (body.get("usage") or {}).get("include", False),
+                "stream": bool(body.get("stream")),
+            }
+        completion_tokens = estimate_tokens(self.reply)
+        return {
+            "id": f"gen-stand-in-{self.stats['requests']}",
+            "model": body["model"],
+            "object": "chat.completion",
+            "choices": [{
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": self.reply},
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+                "prompt_tokens_details": {
+                    "cached_tokens": cached_tokens,
+                    "cache_write_tokens": cache_write_tokens,
+                },
+            },
+        }
+
+
+def make_handler(state: FakeOpenRouter):
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status: int, body: dict) -> None:
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path.rstrip("/").endswith("/stats"):
+                with state._lock:
+                    self._send(200, dict(state.stats))
+            else:
+                self._send(404, {"error": {"message": "not found"}})
+
+        def _send_stream(self, completion: dict) -> None:
+            """Antwort als Server-Sent Events, Chunk für Chunk."""
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.end_headers()
+
+            def event(data) -> None:
+                self.wfile.write(f"data: {json.dumps(data)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+
+            self.wfile.write(b": OPENROUTER PROCESSING\n\n")
+            meta = {"id": completion["id"], "model": completion["model"], "object": "chat.completion.chunk"}
+            text = completion["choices"][0]["message"]["content"]
+            try:
+                for start in range(0, len(text), state.chunk_chars):
+                    delta = {"role": "assistant", "content": text[start:start + state.chunk_chars]}
+                    event({**meta, "choices": [{"index": 0, "delta": delta, "finish_reason": None}]})
+                    if state.chunk_delay:
+                        time.sleep(state.chunk_delay)
+                event({**meta, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                       "usage": completion["usage"]})
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                # Client hat den Stream abgebrochen
+                with state._lock:
+                    state.stats["aborted_streams"] += 1
+
+        def do_POST(self):
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self._send(404, {"error": {"message": "not found"}})
+                return
+            if not self.headers.get("Authorization", "").startswith("Bearer "):
+                self._send(401, {"error": {"message": "missing bearer token"}})
+                return
+            try:
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length) or b"null")
+                if not isinstance(body, dict):
+                    raise RequestShapeError("body must be a JSON object")
+                completion = state.complete(body)
+                if body.get("stream"):
+                    self._send_stream(completion)
+                else:
+                    self._send(200, completion)
+            except (RequestShapeError, ValueError) as e:
+                with state._lock:
+                    state.stats["rejected"] += 1
+                self._send(400, {"error": {"message": str(e), "code": 400}})
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def serve(host: str = "127.0.0.1", port: int = 8089, state: Optional[FakeOpenRouter] = None) -> ThreadingHTTPServer:
+    """Startet den Stand-in in einem Hintergrund-Thread (z.B. für Tests)."""
+    server = ThreadingHTTPServer((host, port), make_handler(state or FakeOpenRouter()))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Lokaler Stand-in für die OpenRouter-API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--reply-file", help="Datei mit dem Antworttext (Standard: minimales JSON)")
+    parser.add_argument("--cache-ttl", type=float, default=300.0, help="Lebensdauer gecachter Präfixe in s")
+    parser.add_argument("--ms-per-1k-tokens", type=float, default=20.0,
+                        help="Simulierte Latenz pro 1000 ungecachter Prompt-Tokens")
+    parser.add_argument("--chunk-chars", type=int, default=16, help="Zeichen pro Stream-Chunk")
+    parser.add_argument("--chunk-delay-ms", type=float, default=0.0, help="Pause zwischen Stream-Chunks")
+    args = parser.parse_args()
+
+    reply = DEFAULT_REPLY
+    if args.reply_file:
+        with open(args.reply_file, "r", encoding="utf-8") as f:
+            reply = f.read()
+
+    state = FakeOpenRouter(
+        reply, args.cache_ttl, args.ms_per_1k_tokens, args.chunk_chars, args.chunk_delay_ms / 1000
+    )
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(state))
+    print(f"Stand-in läuft: http://{args.host}:{args.port}/api/v1 (Statistik: /api/v1/stats)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -16,6 +16,14 @@ from reportlab.lib.units import cm
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak
 from reportlab.lib.enums import TA_LEFT, TA_CENTER
 
+try:
+    from .transcript_parser import parse_line
+except ImportError:  # als Skript aus data_processing/ gestartet
+    from transcript_parser import parse_line
+
+# Anzeigenamen der Sprecher im Transkript (Speaker-ID -> Name)
+SPEAKER_NAMES = {0: "Moderator", 1: "Team Rot", 2: "Team Blau"}
+
 
 class OnePagerGenerator:
     """Generiert OnePager aus Game Reports."""
@@ -278,25 +286,28 @@ class OnePagerGenerator:
             transcript_path: Pfad zur Transkript-Datei
             
         Returns:
-            Verarbeiteter Transkript-Text mit umbenannten Speakern
+            Liste von (Start-Zeitstempel oder None, Zeile mit umbenannten Speakern)
         """
         transcript_file = Path(transcript_path)
         if not transcript_file.exists():
             print(f"Warnung: Transkript-Datei nicht gefunden: {transcript_path}")
             return None
         
+        transcript = []
         with open(transcript_file, "r", encoding="utf-8") as f:
-            transcript_text = f.read()
-        
-        # Ersetze Speaker-Namen
-        transcript_text = transcript_text.replace("Speaker 1:", "Team Rot:")
-        transcript_text = transcript_text.replace("Speaker 1 ", "Team Rot ")
-        transcript_text = transcript_text.replace("Speaker 2:", "Team Blau:")
-        transcript_text = transcript_text.replace("Speaker 2 ", "Team Blau ")
-        transcript_text = transcript_text.replace("Speaker 0 (Moderator):", "Moderator:")
-        transcript_text = transcript_text.replace("Speaker 0:", "Moderator:")
-        
-        return transcript_text
+            for number, line in enumerate(f):
+                line = line.rstrip("\n")
+                record = parse_line(line, number)
+                if record is None:
+                    transcript.append((None, line))
+                    continue
+                # Ersetze Speaker-Namen (Rolle bleibt bei den Teams erhalten)
+                name = SPEAKER_NAMES.get(record.speaker_id)
+                if name and record.role and record.speaker_id != 0:
+                    name = f"{name} ({record.role})"
+                transcript.append((record.start_text, record.render(speaker=name)))
+        
+        return transcript
     
     def generate_combined_json(self, output_path: str):
         """
@@ -352,10 +363,10 @@ class OnePagerGenerator:
         print("Generiere OnePager PDF...\n")
         
         # Lade Transkript falls vorhanden
-        transcript_text = None
+        transcript = None
         if transcript_path:
-            transcript_text = self.load_transcript(transcript_path)
-            if transcript_text:
+            transcript = self.load_transcript(transcript_path)
+            if transcript:
                 print(f"  ✓ Transkript geladen: {transcript_path}\n")
         
         # Extrahiere Daten
@@ -553,7 +564,7 @@ class OnePagerGenerator:
             
             # Funktion zum Erstellen verlinkter Dimension-Texte
             def create_dimension_text(label, rating, points, timestamp):
-                if timestamp and transcript_text:
+                if timestamp and transcript:
                     # Erstelle Anker-Name aus Timestamp
                     anchor = f"ts_{timestamp.replace(':', '_')}"
                     return f'• {label}: <link href="#{anchor}" color="blue">{rating} ({points})</link>'
@@ -601,7 +612,7 @@ class OnePagerGenerator:
                 story.append(Spacer(1, 0.5*cm))
         
         # Transkript-Sektion hinzufügen
-        if transcript_text:
+        if transcript:
             story.append(PageBreak())
             story.append(Paragraph("VOLLSTÄNDIGES TRANSKRIPT", title_style))
             story.append(Spacer(1, 0.5*cm))
@@ -617,24 +628,14 @@ class OnePagerGenerator:
                 leading=12
             )
             
-            # Verarbeite Transkript Zeile für Zeile und füge Anker hinzu
-            lines = transcript_text.split('\n')
-            for line in lines:
-                if line.strip():
-                    # Prüfe ob Zeile mit Timestamp beginnt (Format: HH:MM–HH:MM)
-                    if '–' in line[:10]:
-                        # Extrahiere ersten Timestamp
-                        try:
-                            timestamp_part = line.split()[0]  # z.B. "00:00–00:16"
-                            start_time = timestamp_part.split('–')[0]  # z.B. "00:00"
-                            anchor = f"ts_{start_time.replace(':', '_')}"
-                            # Füge unsichtbaren Anker hinzu
-                            line_with_anchor = f'<a name="{anchor}"/>{line}'
-                            story.append(Paragraph(line_with_anchor, transcript_style))
-                        except:
-                            story.append(Paragraph(line, transcript_style))
-                    else:
-                        story.append(Paragraph(line, transcript_style))
+            # Füge Zeilen mit Timestamp einen unsichtbaren Anker hinzu
+            for start_time, line in transcript:
+                if not line.strip():
+                    continue
+                if start_time is not None:
+                    anchor = f"ts_{start_time.replace(':', '_')}"
+                    line = f'<a name="{anchor}"/>{line}'
+                story.append(Paragraph(line, transcript_style))
         
         # Build PDF
         doc.build(story)
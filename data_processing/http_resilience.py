@@ -0,0 +1,382 @@
+"""
+HTTP-Clients mit Connection-Pooling, Retry/Backoff und Circuit Breaker.
+
+Gemeinsame Schicht für alle ausgehenden HTTP-Aufrufe (OpenRouter,
+Transcription Service):
+
+- Keep-Alive-Pooling: ein Client pro Abhängigkeit, Verbindungen und
+  TLS-Sessions werden wiederverwendet.
+- Retry mit exponentiellem Backoff und vollem Jitter auf 408/425/429/5xx
+  und Verbindungsfehler; ein Retry-After-Header hat Vorrang.
+- Circuit Breaker: nach `failure_threshold` aufeinanderfolgenden Ausfällen
+  (5xx, Verbindungsfehler, Timeouts) schlagen Aufrufe `reset_timeout`
+  Sekunden lang sofort mit CircuitOpenError fehl; danach wird ein
+  Probe-Aufruf durchgelassen. 429 zählt nicht als Ausfall.
+- Instrumentierung: jeder Aufruf wird geloggt und in CallStats gezählt
+  (Aufrufe, Fehler, Retries, Statuscodes, Latenz); `snapshot()` liefert
+  die Werte.
+
+`ResilientSession` basiert auf requests (synchron, z.B. WargameAnalyzer),
+`ResilientAsyncClient` auf httpx (asynchron, z.B. Backend-Router).
+"""
+
+import asyncio
+import logging
+import random
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+
+
+def _is_outage(status: int) -> bool:
+    """Statuscodes, die auf eine ausgefallene Abhängigkeit hindeuten."""
+    return status >= 500
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Retry-After in Sekunden: als Zahl ("30") oder HTTP-Datum
+    ("Wed, 21 Oct 2026 07:28:00 GMT"); None, wenn fehlend oder unlesbar.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+class CircuitOpenError(Exception):
+    """Der Circuit Breaker ist offen: Aufruf wird ohne Netzwerkzugriff abgelehnt."""
+
+    def __init__(self, name: str, retry_in: float):
+        super().__init__(f"{name} ist nicht verfügbar (Circuit offen, neuer Versuch in {retry_in:.0f}s)")
+        self.name = name
+        self.retry_in = retry_in
+
+
+@dataclass
+class RetryPolicy:
+    """Exponentieller Backoff mit vollem Jitter."""
+
+    max_attempts: int = 4
+    base_delay: float = 0.5
+    max_delay: float = 30.0
+    # Obergrenze für vom Server verlangte Wartezeiten (Retry-After)
+    max_retry_after: float = 60.0
+
+    def delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """Wartezeit vor Versuch `attempt + 1` (attempt zählt ab 0)."""
+        seconds = parse_retry_after(retry_after)
+        if seconds is not None:
+            return min(seconds, self.max_retry_after)
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+class CircuitBreaker:
+    """Closed → open nach N Ausfällen → half-open nach Timeout → closed bei Erfolg."""
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probe_in_flight = False
+        # Sync-Clients werden aus mehreren Worker-Threads benutzt
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state_locked()
+
+    def _state_locked(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def before_call(self) -> None:
+        """Raise CircuitOpenError, wenn der Aufruf nicht durchgelassen wird."""
+        with self._lock:
+            state = self._state_locked()
+            if state == "closed":
+                return
+            if state == "half_open" and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return
+            retry_in = max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+            raise CircuitOpenError(self.name, retry_in)
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._probe_in_flight or self._failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    logger.warning("%s: Circuit geöffnet nach %d Ausfällen", self.name, self._failures)
+                self._opened_at = time.monotonic()
+            self._probe_in_flight = False
+
+    def abandon_probe(self) -> None:
+        """Probe-Aufruf ohne Ergebnis beendet (z.B. abgebrochen): nächster darf proben."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {"state": self._state_locked(), "consecutive_failures": self._failures}
+
+
+class CallStats:
+    """Zähler und Latenzen pro Client."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.failures = 0
+        self.retries = 0
+        self.rejected = 0
+        self.statuses: Dict[str, int] = {}
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self.last_error: Optional[str] = None
+
+    def record(self, status: Optional[int], elapsed: float, retries: int, error: Optional[str] = None) -> None:
+        with self._lock:
+            self.calls += 1
+            self.retries += retries
+            key = str(status) if status is not None else "error"
+            self.statuses[key] = self.statuses.get(key, 0) + 1
+            self.latency_total += elapsed
+            self.latency_max = max(self.latency_max, elapsed)
+            if error is not None or (status is not None and status >= 400):
+                self.failures += 1
+                self.last_error = error or f"HTTP {status}"
+
+    def record_rejected(self) -> None:
+        with self._lock:
+            self.rejected += 1
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "failures": self.failures,
+                "retries": self.retries,
+                "rejected_by_circuit": self.rejected,
+                "statuses": dict(self.statuses),
+                "latency_avg_s": round(self.latency_total / self.calls, 3) if self.calls else None,
+                "latency_max_s": round(self.latency_max, 3),
+                "last_error": self.last_error,
+            }
+
+
+class _Resilient:
+    """Gemeinsame Retry-/Breaker-/Statistik-Logik der beiden Clients."""
+
+    def __init__(
+        self,
+        name: str,
+        policy: Optional[RetryPolicy] = None,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        self.name = name
+        self.policy = policy or RetryPolicy()
+        self.breaker = breaker or CircuitBreaker(name)
+        self.stats = CallStats()
+
+    def _admit(self) -> None:
+        try:
+            self.breaker.before_call()
+        except CircuitOpenError:
+            self.stats.record_rejected()
+            raise
+
+    def _after_response(self, status: int) -> None:
+        if _is_outage(status):
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+
+    def _log_retry(self, method: str, url: str, reason: str, attempt: int, delay: float) -> None:
+        logger.warning(
+            "%s %s %s: %s, Versuch %d/%d, warte %.1fs",
+            self.name, method, url, reason, attempt + 1, self.policy.max_attempts, delay,
+        )
+
+    def _log_call(self, method: str, url: str, status: Optional[int], elapsed: float, retries: int) -> None:
+        logger.info("%s %s %s -> %s in %.2fs (%d Retries)", self.name, method, url, status, elapsed, retries)
+
+    def snapshot(self) -> Dict:
+        return {"name": self.name, "circuit": self.breaker.snapshot(), **self.stats.snapshot()}
+
+
+class ResilientSession(_Resilient):
+    """Synchroner Client (requests.Session) mit Pooling, Retry und Circuit Breaker."""
+
+    def __init__(
+        self,
+        name: str,
+        policy: Optional[RetryPolicy] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        pool_size: int = 10,
+        timeout: float = 300.0,
+    ):
+        super().__init__(name, policy, breaker)
+        self.timeout = timeout
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+
+    def request(self, method: str, url: str, retry: bool = True, **kwargs) -> requests.Response:
+        """
+        Führt einen Request mit Retries aus. Gibt die letzte Response zurück
+        (auch mit Fehlerstatus); Verbindungsfehler werden nach dem letzten
+        Versuch weitergereicht.
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        attempts = self.policy.max_attempts if retry else 1
+        started = time.monotonic()
+        for attempt in range(attempts):
+            self._admit()
+            try:
+                response = self._session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self.breaker.record_failure()
+                if attempt + 1 >= attempts:
+                    self.stats.record(None, time.monotonic() - started, attempt, error=str(e))
+                    raise
+                delay = self.policy.delay(attempt)
+                self._log_retry(method, url, type(e).__name__, attempt, delay)
+                time.sleep(delay)
+                continue
+            except BaseException:
+                self.breaker.abandon_probe()
+                raise
+
+            self._after_response(response.status_code)
+            if response.status_code in RETRYABLE_STATUSES and attempt + 1 < attempts:
+                delay = self.policy.delay(attempt, response.headers.get("Retry-After"))
+                self._log_retry(method, url, f"HTTP {response.status_code}", attempt, delay)
+                response.close()
+                time.sleep(delay)
+                continue
+
+            elapsed = time.monotonic() - started
+            self.stats.record(response.status_code, elapsed, attempt)
+            self._log_call(method, url, response.status_code, elapsed, attempt)
+            return response
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def close(self) -> None:
+        self._session.close()
+
+
+class ResilientAsyncClient(_Resilient):
+    """Asynchroner Client (httpx.AsyncClient) mit Pooling, Retry und Circuit Breaker."""
+
+    def __init__(
+        self,
+        name: str,
+        base_url: str = "",
+        policy: Optional[RetryPolicy] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        max_connections: int = 20,
+        timeout: float = 600.0,
+        connect_timeout: float = 30.0,
+    ):
+        import httpx
+
+        super().__init__(name, policy, breaker)
+        self._httpx = httpx
+        self._client = httpx.AsyncClient(
+            base_url=base_url,
+            timeout=httpx.Timeout(timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        )
+
+    async def request(self, method: str, url: str, retry: bool = True, stream: bool = False, **kwargs):
+        """
+        Wie ResilientSession.request. Mit retry=False (z.B. für Uploads aus
+        einem Dateiobjekt, das nicht erneut gelesen werden kann) wird genau
+        einmal gesendet; Breaker und Statistik gelten trotzdem.
+
+        Mit stream=True ist der Body beim Zurückgeben noch nicht gelesen
+        (aiter_lines/aread); der Aufrufer muss die Response mit aclose()
+        schließen. Latenz und Retries beziehen sich dann auf die Header.
+        """
+        attempts = self.policy.max_attempts if retry else 1
+        started = time.monotonic()
+        for attempt in range(attempts):
+            self._admit()
+            try:
+                if stream:
+                    request = self._client.build_request(method, url, **kwargs)
+                    response = await self._client.send(request, stream=True)
+                else:
+                    response = await self._client.request(method, url, **kwargs)
+            except self._httpx.TransportError as e:
+                self.breaker.record_failure()
+                if attempt + 1 >= attempts:
+                    self.stats.record(None, time.monotonic() - started, attempt, error=str(e) or type(e).__name__)
+                    raise
+                delay = self.policy.delay(attempt)
+                self._log_retry(method, url, type(e).__name__, attempt, delay)
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                self.breaker.abandon_probe()
+                raise
+
+            self._after_response(response.status_code)
+            if response.status_code in RETRYABLE_STATUSES and attempt + 1 < attempts:
+                delay = self.policy.delay(attempt, response.headers.get("Retry-After"))
+                self._log_retry(method, url, f"HTTP {response.status_code}", attempt, delay)
+                await response.aclose()
+                await asyncio.sleep(delay)
+                continue
+
+            elapsed = time.monotonic() - started
+            self.stats.record(response.status_code, elapsed, attempt)
+            self._log_call(method, url, response.status_code, elapsed, attempt)
+            return response
+
+    async def post(self, url: str, **kwargs):
+        return await self.request("POST", url, **kwargs)
+
+    async def get(self, url: str, **kwargs):
+        return await self.request("GET", url, **kwargs)
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
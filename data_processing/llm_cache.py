@@ -0,0 +1,276 @@
+"""
+Persistenter, inhaltsadressierter Cache für LLM-Antworten.
+
+Schlüssel ist der SHA-256 über (model, messages, temperature, max_tokens)
+des Requests; identische Anfragen (erneuter Pipeline-Lauf, Neustart des
+Backends, wiederholte Auswertungen) werden von der Platte beantwortet statt
+erneut an OpenRouter geschickt.
+
+- Persistenz: eine SQLite-Datei (WAL), von mehreren Prozessen nutzbar.
+- Größenlimit: überschreiten die Einträge `max_bytes`, werden die am
+  längsten nicht genutzten verdrängt (LRU).
+- Single-Flight: gleichzeitige identische Requests (Threads oder Tasks)
+  warten auf den ersten statt selbst zu senden.
+- Metriken: Treffer, Fehlschläge, zusammengelegte Aufrufe, Trefferquote
+  und eingesparte Latenz (`snapshot()`).
+
+Fehlgeschlagene Aufrufe werden nicht gecacht. Ist die Cache-Datei nicht
+nutzbar, wird ohne Cache weitergearbeitet.
+
+Konfiguration (Umgebung):
+    LLM_CACHE            "0" schaltet den Cache ab (Standard: an)
+    LLM_CACHE_PATH       SQLite-Datei (Standard: data_processing/.llm_cache/responses.db)
+    LLM_CACHE_MAX_MB     Größenlimit in MB (Standard: 256)
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Iterator, Optional, Tuple
+
+# Entscheidet, ob eine Antwort gespeichert wird (z.B. keine abgebrochenen Streams)
+Cacheable = Optional[Callable[[dict], bool]]
+
+logger = logging.getLogger(__name__)
+
+KEY_FIELDS = ("model", "messages", "temperature", "max_tokens")
+DEFAULT_PATH = Path(__file__).parent / ".llm_cache" / "responses.db"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key         TEXT PRIMARY KEY,
+    response    TEXT NOT NULL,
+    size        INTEGER NOT NULL,
+    latency     REAL NOT NULL,
+    created_at  REAL NOT NULL,
+    last_used   REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used);
+"""
+
+
+def cache_key(payload: dict) -> str:
+    """SHA-256 über die Felder des Requests, die die Antwort bestimmen."""
+    material = {field: payload.get(field) for field in KEY_FIELDS}
+    blob = json.dumps(material, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """LRU-begrenzter Antwort-Cache auf der Platte mit Single-Flight."""
+
+    def __init__(self, path: str = str(DEFAULT_PATH), max_bytes: int = 256 * 1024 ** 2):
+        self.path = str(path)
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, Future] = {}
+        self._hits = 0
+        self._misses = 0
+        self._coalesced = 0
+        self._evictions = 0
+        self._errors = 0
+        self._latency_saved = 0.0
+
+    @classmethod
+    def from_env(cls) -> Optional["LLMCache"]:
+        """Cache nach LLM_CACHE_*; None, wenn abgeschaltet oder nicht nutzbar."""
+        if os.environ.get("LLM_CACHE", "1") == "0":
+            return None
+        try:
+            return cls(
+                os.environ.get("LLM_CACHE_PATH") or str(DEFAULT_PATH),
+                max_bytes=int(float(os.environ.get("LLM_CACHE_MAX_MB", "256")) * 1024 ** 2),
+            )
+        except (OSError, sqlite3.Error) as e:
+            logger.warning("LLM-Cache nicht verfügbar: %s", e)
+            return None
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    # ------------------------------------------------------------------
+    # Speicher
+    # ------------------------------------------------------------------
+    def get(self, key: str) -> Optional[Tuple[dict, float]]:
+        """(Antwort, ursprüngliche Latenz) oder None; markiert den Eintrag als benutzt."""
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT response, latency FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    return None
+                conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+            return json.loads(row[0]), row[1]
+        except (sqlite3.Error, ValueError) as e:
+            self._record_error("Lesen", e)
+            return None
+
+    def put(self, key: str, response: dict, latency: float) -> None:
+        """Speichert eine Antwort und verdrängt bei Bedarf alte Einträge."""
+        blob = json.dumps(response, ensure_ascii=False)
+        size = len(blob.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO responses (key, response, size, latency, created_at, last_used)"
+                        " VALUES (?, ?, ?, ?, ?, ?)",
+                        (key, blob, size, latency, now, now),
+                    )
+                    evicted = self._evict(conn)
+                    conn.execute("COMMIT")
+                except BaseException:
+                    conn.execute("ROLLBACK")
+                    raise
+        except sqlite3.Error as e:
+            self._record_error("Schreiben", e)
+            return
+        if evicted:
+            with self._lock:
+                self._evictions += evicted
+
+    def _evict(self, conn: sqlite3.Connection) -> int:
+        """Löscht die am längsten unbenutzten Einträge, bis das Limit passt."""
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return 0
+        victims = []
+        for key, size in conn.execute("SELECT key, size FROM responses ORDER BY last_used"):
+            if total <= self.max_bytes:
+                break
+            victims.append((key,))
+            total -= size
+        conn.executemany("DELETE FROM responses WHERE key = ?", victims)
+        return len(victims)
+
+    def _record_error(self, action: str, error: Exception) -> None:
+        with self._lock:
+            self._errors += 1
+        logger.warning("LLM-Cache %s fehlgeschlagen (%s): %s", action, self.path, error)
+
+    # ------------------------------------------------------------------
+    # Aufrufe
+    # ------------------------------------------------------------------
+    def _lookup(self, key: str) -> Optional[dict]:
+        cached = self.get(key)
+        if cached is None:
+            return None
+        response, latency = cached
+        with self._lock:
+            self._hits += 1
+            self._latency_saved += latency
+        return response
+
+    def _claim(self, key: str) -> Tuple[Future, bool]:
+        """Future für `key`; True, wenn dieser Aufrufer den Request senden soll."""
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                self._coalesced += 1
+                return future, False
+            future = Future()
+            self._inflight[key] = future
+            self._misses += 1
+            return future, True
+
+    def _settle(self, key: str, future: Future, response: dict = None, error: BaseException = None) -> None:
+        with self._lock:
+            self._inflight.pop(key, None)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(response)
+
+    def call(self, payload: dict, send: Callable[[], dict], cacheable: Cacheable = None) -> dict:
+        """Antwort aus dem Cache, von einem laufenden identischen Aufruf oder von `send()`."""
+        key = cache_key(payload)
+        response = self._lookup(key)
+        if response is not None:
+            return response
+
+        future, leader = self._claim(key)
+        if not leader:
+            return future.result()
+
+        started = time.monotonic()
+        try:
+            response = send()
+        except BaseException as e:
+            self._settle(key, future, error=e)
+            raise
+        if cacheable is None or cacheable(response):
+            self.put(key, response, time.monotonic() - started)
+        self._settle(key, future, response)
+        return response
+
+    async def acall(
+        self, payload: dict, send: Callable[[], Awaitable[dict]], cacheable: Cacheable = None
+    ) -> dict:
+        """Asynchrone Variante von call (teilt Single-Flight mit den Threads)."""
+        key = cache_key(payload)
+        response = self._lookup(key)
+        if response is not None:
+            return response
+
+        future, leader = self._claim(key)
+        if not leader:
+            return await asyncio.wrap_future(future)
+
+        started = time.monotonic()
+        try:
+            response = await send()
+        except BaseException as e:
+            self._settle(key, future, error=e)
+            raise
+        if cacheable is None or cacheable(response):
+            self.put(key, response, time.monotonic() - started)
+        self._settle(key, future, response)
+        return response
+
+    def snapshot(self) -> Dict:
+        try:
+            with self._connect() as conn:
+                entries, size = conn.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+                ).fetchone()
+        except sqlite3.Error:
+            entries, size = None, None
+        with self._lock:
+            lookups = self._hits + self._misses + self._coalesced
+            return {
+                "path": self.path,
+                "entries": entries,
+                "bytes": size,
+                "max_bytes": self.max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "coalesced": self._coalesced,
+                "hit_rate": round((self._hits + self._coalesced) / lookups, 4) if lookups else 0.0,
+                "latency_saved_s": round(self._latency_saved, 3),
+                "evictions": self._evictions,
+                "errors": self._errors,
+                "inflight": len(self._inflight),
+            }
@@ -13,6 +13,7 @@ def main():
     # Konfiguration
     CONFIG_PATH = "../config.json"
     ROUND_SPLITTER_PROMPT = "systemprompt_split_rounds.txt"
+    ROUND_BOUNDARY_PROMPT = "systemprompt_round_boundary.txt"
     GAME_REPORT_PROMPT = "systemprompt_json.txt"
     TRANSCRIPT_PATH = "data/transcript.txt"
     OUTPUT_DIR = "data/reports"
@@ -44,10 +45,13 @@ def main():
     # ========================================================================
     print("\nSchritt 1: Runden-Zeitstempel ermitteln...")
     
-    rounds_json = analyzer.split_rounds(
-        round_splitter_prompt_path=ROUND_SPLITTER_PROMPT,
-        transcript_path=TRANSCRIPT_PATH,
-        model=SELECTED_MODEL
+    # Lokal anhand der Spiel-Marker; das LLM sieht nur unsichere Ausschnitte
+    transcript_text = Path(TRANSCRIPT_PATH).read_text(encoding="utf-8")
+    rounds_json = analyzer.detect_rounds_from_text(
+        transcript_text=transcript_text,
+        boundary_prompt=Path(ROUND_BOUNDARY_PROMPT).read_text(encoding="utf-8"),
+        model=SELECTED_MODEL,
+        fallback_prompt=Path(ROUND_SPLITTER_PROMPT).read_text(encoding="utf-8")
     )
     
     if not rounds_json:
@@ -109,6 +113,20 @@ def main():
     print(f"  - {len(round_files)} Game Reports (round1_report.json, round2_report.json, ...)")
     print(f"  - 1 Runden-Übersicht (rounds_overview.json)")
 
+    usage = analyzer.usage.snapshot()
+    print(f"\nTokens: {usage['prompt_tokens']} Prompt (davon {usage['cached_tokens']} aus dem "
+          f"Provider-Cache), {usage['completion_tokens']} Antwort")
+    for stage, stats in analyzer.budget.snapshot().items():
+        print(f"  {stage}: {stats['requests']} Requests, Prompt geschätzt {stats['estimated_prompt_tokens']} / "
+              f"tatsächlich {stats['prompt_tokens']}, max_tokens gesamt {stats['max_tokens']}"
+              + (f", {stats['truncated']} abgeschnitten" if stats["truncated"] else ""))
+    if analyzer.cache is not None:
+        stats = analyzer.cache.snapshot()
+        print(f"\nLLM-Cache: {stats['hits']} Treffer, {stats['misses']} neue Anfragen, "
+              f"{stats['latency_saved_s']:.0f}s Wartezeit gespart ({stats['path']})")
+
+    analyzer.close()
+
 
 if __name__ == "__main__":
     main()
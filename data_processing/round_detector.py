@@ -0,0 +1,180 @@
+"""
+Lokale Erkennung der Runden-Grenzen in Matrix-Wargame-Transkripten.
+
+Statt das komplette Transkript an das LLM zu schicken, um ein paar
+Start-Zeitstempel zurückzubekommen, werden die Zeilen auf die
+Struktur-Marker der Spielregeln geprüft:
+
+- Aufklärungsphase (jede Runde beginnt damit): Blau würfelt 3W6 auf 12,
+  Rot würfelt X- und Y-Achse.
+- Überleitung: "Runde 2", "zweite/nächste Runde", "nächster Angriff",
+  "zurück in die Phase 1", "wiederholen".
+
+Aufeinanderfolgende Aufklärungs-Marker bilden eine Aufklärungsphase. Jede
+Phase außer der ersten beginnt eine neue Runde; die Grenze liegt bei der
+ersten Überleitung kurz davor (sonst beim ersten Wurf). Überleitungen
+ohne folgende Aufklärung (z.B. "in die zweite Runde, äh, Phase") zählen
+nicht.
+
+Reicht die Summe der Marker-Gewichte einer Grenze nicht für
+CONFIDENT_SCORE, ist sie unsicher: dann entscheidet das LLM, aber nur
+über das kurze Zeitfenster `window` um die Kandidaten-Grenze.
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Pattern, Tuple
+
+# Art -> (Muster, Gewicht)
+MARKERS: Dict[str, Tuple[Pattern, int]] = {
+    "blue_roll": (re.compile(
+        r"\b(mindestens|eine|die)\s+12\b|\b12\b.*würfel|würfel.*\b12\b", re.IGNORECASE), 2),
+    "axis_roll": (re.compile(r"\b[xy][-\s]?achse", re.IGNORECASE), 2),
+    "round": (re.compile(
+        r"\brunde\s+(2|3|4|5|zwei|drei|vier|fünf)\b"
+        r"|\b(zweite|dritte|vierte|fünfte|nächste|neue)n?\s+runde\b", re.IGNORECASE), 3),
+    "next_attack": (re.compile(r"\bnächste[nr]?\s+angriff", re.IGNORECASE), 3),
+    "phase_1": (re.compile(r"\bzurück\s+in\s+(die\s+)?phase\s*(1|eins)\b|\bwieder\s+(in\s+)?phase\s*(1|eins)\b",
+                           re.IGNORECASE), 2),
+    "repeat": (re.compile(r"\bwiederholen\b", re.IGNORECASE), 1),
+}
+# Zeitstempel am Zeilenanfang (sonst wäre "26:09–26:12 ... gewürfelt" ein 12er-Wurf)
+_TIMESTAMP_PREFIX = re.compile(r"^[\d:\s–—-]*")
+
+RECON_KINDS = ("blue_roll", "axis_roll")
+TRANSITION_KINDS = ("round", "next_attack", "phase_1", "repeat")
+# Vor der ersten Aufklärung nur mit LLM als Grenze werten (sonst Runde 1)
+STRONG_TRANSITION_KINDS = ("round", "next_attack")
+
+LABELS = {
+    "blue_roll": "Blau würfelt 3W6 auf 12",
+    "axis_roll": "Rot würfelt X/Y-Achse",
+    "round": "Ansage neue Runde",
+    "next_attack": "nächster Angriff",
+    "phase_1": "zurück in Phase 1",
+    "repeat": "Runde wird wiederholt",
+}
+
+# Max. Abstand (s) zwischen Würfen derselben Aufklärungsphase
+RECON_GAP = 90
+# So weit (s) vor dem ersten Wurf wird nach einer Überleitung gesucht
+LOOKBACK = 120
+# Zusätzlicher Kontext (s) im Fenster für das LLM
+WINDOW_CONTEXT = 60
+# Ab dieser Summe der Gewichte (je Art einmal) wird ohne LLM geschnitten
+CONFIDENT_SCORE = 5
+
+
+@dataclass
+class Marker:
+    line: int
+    seconds: int
+    kind: str
+
+
+@dataclass
+class Boundary:
+    """Kandidat für den Beginn einer Runde."""
+
+    line: int
+    seconds: int
+    kinds: List[str]
+    score: int
+    confident: bool
+    # Zeilenbereich [start, end) für die Rückfrage beim LLM
+    window: Tuple[int, int]
+
+    def describe(self) -> str:
+        return ", ".join(LABELS[kind] for kind in self.kinds)
+
+
+@dataclass
+class RoundDetection:
+    boundaries: List[Boundary] = field(default_factory=list)
+    recon_phases: int = 0
+
+    @property
+    def ambiguous(self) -> List[Boundary]:
+        return [b for b in self.boundaries if not b.confident]
+
+
+def line_seconds(times: List[Optional[int]]) -> List[int]:
+    """Zeilen ohne Zeitstempel erben den der vorherigen Zeile."""
+    seconds, last = [], 0
+    for t in times:
+        last = t if t is not None else last
+        seconds.append(last)
+    return seconds
+
+
+def find_markers(lines: List[str], seconds: List[int]) -> List[Marker]:
+    markers = []
+    for i, line in enumerate(lines):
+        text = _TIMESTAMP_PREFIX.sub("", line, count=1)
+        for kind, (pattern, _) in MARKERS.items():
+            if pattern.search(text):
+                markers.append(Marker(i, seconds[i], kind))
+    return markers
+
+
+def _recon_phases(markers: List[Marker]) -> List[List[Marker]]:
+    phases: List[List[Marker]] = []
+    for marker in markers:
+        if marker.kind not in RECON_KINDS:
+            continue
+        if phases and marker.seconds - phases[-1][-1].seconds <= RECON_GAP:
+            phases[-1].append(marker)
+        else:
+            phases.append([marker])
+    return phases
+
+
+def _line_at(seconds: List[int], t: int, start: int = 0) -> int:
+    """Erste Zeile ab `start` mit Zeit >= t."""
+    for i in range(start, len(seconds)):
+        if seconds[i] >= t:
+            return i
+    return len(seconds)
+
+
+def detect_round_boundaries(lines: List[str], times: List[Optional[int]]) -> RoundDetection:
+    """
+    Runden-Grenzen aus Zeilen und ihren Startzeiten (Sekunden, None ohne
+    Zeitstempel). Die erste Runde beginnt immer am Anfang.
+    """
+    seconds = line_seconds(times)
+    markers = find_markers(lines, seconds)
+    phases = _recon_phases(markers)
+    detection = RoundDetection(recon_phases=len(phases))
+
+    previous_end = -1
+    for n, phase in enumerate(phases):
+        first = phase[0]
+        # Überleitungen kurz vor dem ersten Wurf, nicht vor der letzten Phase
+        transitions = [
+            m for m in markers
+            if m.kind in TRANSITION_KINDS
+            and previous_end < m.line <= first.line
+            and first.seconds - m.seconds <= LOOKBACK
+        ]
+        previous_end = phase[-1].line
+        if n == 0 and not any(m.kind in STRONG_TRANSITION_KINDS for m in transitions):
+            # Aufklärung der ersten Runde
+            continue
+
+        start = transitions[0] if transitions else first
+        kinds = list(dict.fromkeys(m.kind for m in transitions + phase))
+        score = sum(MARKERS[kind][1] for kind in kinds)
+        window = (
+            _line_at(seconds, start.seconds - WINDOW_CONTEXT),
+            _line_at(seconds, phase[-1].seconds + WINDOW_CONTEXT + 1, phase[-1].line),
+        )
+        detection.boundaries.append(Boundary(
+            line=start.line,
+            seconds=start.seconds,
+            kinds=kinds,
+            score=score,
+            confident=n > 0 and score >= CONFIDENT_SCORE and bool(transitions),
+            window=window,
+        ))
+    return detection
@@ -0,0 +1,229 @@
+"""
+Inkrementeller JSON-Validator für gestreamte LLM-Antworten.
+
+Prüft die Struktur eines JSON-Objekts, während die Tokens eintreffen, statt
+erst nach der vollständigen Antwort zu parsen:
+
+- Text vor dem ersten "{" (z.B. ```json) wird übersprungen, aber nur bis
+  `max_preamble` Zeichen.
+- Klammern, Doppelpunkte, Kommas und Literale werden Zeichen für Zeichen
+  geprüft; ein nicht mehr reparierbarer Fehler (falsche Klammer, fehlendes
+  Komma, unbekanntes Literal, Trailing Comma) wirft sofort
+  JSONStreamError – eine Unterklasse von json.JSONDecodeError, sodass die
+  bestehende Fehlerkorrektur-Logik greift.
+- Nach dem Ende des Wurzelobjekts ist der Rest egal (wie bei
+  _parse_json_robust).
+- Unescapte Zeilenumbrüche in Strings werden toleriert, weil
+  _parse_json_robust sie repariert.
+
+Abgeschlossene Werte bis zur Tiefe `section_depth` werden als Abschnitte
+gemeldet (`on_section("rounds[0].phase_1")`), z.B. für Fortschrittsanzeigen.
+"""
+
+import json
+import re
+from typing import Callable, List, Optional, Union
+
+_NUMBER = re.compile(r"-?(0|[1-9]\d*)(\.\d+)?([eE][+-]?\d+)?")
+_LITERALS = {"true", "false", "null"}
+_WHITESPACE = " \t\r\n"
+
+# Was im aktuellen Container als Nächstes erlaubt ist
+KEY_OR_END = "key_or_end"
+KEY = "key"
+COLON = "colon"
+VALUE_OR_END = "value_or_end"
+VALUE = "value"
+COMMA_OR_END = "comma_or_end"
+
+
+class JSONStreamError(json.JSONDecodeError):
+    """Die gestreamte Antwort kann kein valides JSON mehr werden."""
+
+    def __init__(self, msg: str, position: int):
+        ValueError.__init__(self, f"{msg} (Zeichen {position})")
+        self.msg = msg
+        self.doc = ""
+        self.pos = position
+        self.lineno = 1
+        self.colno = position + 1
+
+    def __reduce__(self):
+        return self.__class__, (self.msg, self.pos)
+
+
+class _Frame:
+    __slots__ = ("is_object", "expect", "key", "index")
+
+    def __init__(self, is_object: bool):
+        self.is_object = is_object
+        self.expect = KEY_OR_END if is_object else VALUE_OR_END
+        self.key: Optional[str] = None
+        self.index = 0
+
+
+class IncrementalJSONParser:
+    """Validiert ein JSON-Objekt Chunk für Chunk (ohne es aufzubauen)."""
+
+    def __init__(
+        self,
+        on_section: Optional[Callable[[str], None]] = None,
+        section_depth: int = 2,
+        max_preamble: int = 4000,
+    ):
+        self.on_section = on_section
+        self.section_depth = section_depth
+        self.max_preamble = max_preamble
+        self.position = 0
+        self.sections = 0
+        self.complete = False
+        self._stack: List[_Frame] = []
+        self._in_string = False
+        self._string_is_key = False
+        self._escape = 0  # 1 nach "\", bis zu 4 für \uXXXX
+        self._key_chars: List[str] = []
+        self._literal: Optional[List[str]] = None
+
+    @property
+    def started(self) -> bool:
+        return bool(self._stack) or self.complete
+
+    def feed(self, chunk: str) -> None:
+        """Verarbeitet den nächsten Teil der Antwort; wirft JSONStreamError."""
+        for c in chunk:
+            if not self.complete:
+                self._step(c)
+            self.position += 1
+
+    # ------------------------------------------------------------------
+    def _error(self, message: str) -> JSONStreamError:
+        return JSONStreamError(message, self.position)
+
+    def _step(self, c: str) -> None:
+        if self._in_string:
+            self._string_char(c)
+            return
+        if self._literal is not None:
+            if c.isalnum() or c in "+-.":
+                self._literal.append(c)
+                return
+            self._finish_literal()
+            if self.complete:
+                return
+
+        if c in _WHITESPACE:
+            return
+
+        if not self._stack:
+            if c == "{":
+                self._stack.append(_Frame(True))
+            elif self.position >= self.max_preamble:
+                raise self._error("Kein JSON-Objekt am Anfang der Antwort")
+            return
+
+        frame = self._stack[-1]
+        expect = frame.expect
+        if expect in (KEY, KEY_OR_END):
+            if c == '"':
+                self._start_string(is_key=True)
+            elif c == "}" and expect == KEY_OR_END:
+                self._close(frame)
+            else:
+                raise self._error(f"Schlüssel erwartet, {c!r} gefunden")
+        elif expect == COLON:
+            if c != ":":
+                raise self._error(f"':' erwartet, {c!r} gefunden")
+            frame.expect = VALUE
+        elif expect in (VALUE, VALUE_OR_END):
+            if c == "]" and expect == VALUE_OR_END:
+                self._close(frame)
+            else:
+                self._start_value(c)
+        elif expect == COMMA_OR_END:
+            if c == ",":
+                frame.expect = KEY if frame.is_object else VALUE
+            elif c == ("}" if frame.is_object else "]"):
+                self._close(frame)
+            else:
+                raise self._error(f"',' oder Container-Ende erwartet, {c!r} gefunden")
+
+    def _start_value(self, c: str) -> None:
+        if c == "{":
+            self._stack.append(_Frame(True))
+        elif c == "[":
+            self._stack.append(_Frame(False))
+        elif c == '"':
+            self._start_string(is_key=False)
+        elif c == "-" or c.isalnum():
+            self._literal = [c]
+        else:
+            raise self._error(f"Wert erwartet, {c!r} gefunden")
+
+    def _start_string(self, is_key: bool) -> None:
+        self._in_string = True
+        self._string_is_key = is_key
+        self._key_chars = []
+
+    def _string_char(self, c: str) -> None:
+        if self._escape:
+            if self._escape == 1 and c == "u":
+                self._escape = 5
+            elif self._escape == 1:
+                if c not in '"\\/bfnrt':
+                    raise self._error(f"Ungültige Escape-Sequenz \\{c}")
+                self._escape = 0
+            else:
+                if c not in "0123456789abcdefABCDEF":
+                    raise self._error("Ungültige \\u-Escape-Sequenz")
+                self._escape = 0 if self._escape == 2 else self._escape - 1
+            if self._string_is_key:
+                self._key_chars.append(c)
+            return
+        if c == "\\":
+            self._escape = 1
+            return
+        if c == '"':
+            self._in_string = False
+            if self._string_is_key:
+                frame = self._stack[-1]
+                frame.key = "".join(self._key_chars)
+                frame.expect = COLON
+            else:
+                self._value_done()
+            return
+        if self._string_is_key:
+            self._key_chars.append(c)
+
+    def _finish_literal(self) -> None:
+        text = "".join(self._literal)
+        self._literal = None
+        if text not in _LITERALS and not _NUMBER.fullmatch(text):
+            raise self._error(f"Ungültiges Literal {text!r}")
+        self._value_done()
+
+    def _close(self, frame: _Frame) -> None:
+        self._stack.pop()
+        self._value_done()
+
+    def _value_done(self) -> None:
+        if not self._stack:
+            self.complete = True
+            return
+        frame = self._stack[-1]
+        if len(self._stack) <= self.section_depth:
+            self.sections += 1
+            if self.on_section:
+                self.on_section(self._path())
+        frame.expect = COMMA_OR_END
+        if not frame.is_object:
+            frame.index += 1
+
+    def _path(self) -> str:
+        parts: List[str] = []
+        for frame in self._stack:
+            step: Union[str, int] = frame.key if frame.is_object else frame.index
+            if frame.is_object:
+                parts.append(f".{step}" if parts else str(step))
+            else:
+                parts.append(f"[{step}]")
+        return "".join(parts)
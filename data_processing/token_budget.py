@@ -0,0 +1,272 @@
+"""
+Token-Budget für LLM-Aufrufe.
+
+Vor jedem Request wird der Prompt lokal gezählt und `max_tokens` passend
+zur Stufe gesetzt, statt pauschal 150000 Antwort-Tokens anzufordern (mehr
+als jedes Modell liefern kann – Provider lehnen das ab oder planen den
+Request langsamer ein):
+
+- Tokenizer: austauschbar (`Callable[[str], int]`). Standard ist eine
+  Schätzung über Zeichen pro Token; mit LLM_TOKENIZER=tiktoken[:encoding]
+  wird tiktoken benutzt, falls installiert.
+- Antwort-Budget: erwartete Ausgabegröße je Stufe (STAGE_OUTPUT_TOKENS),
+  begrenzt durch die maximale Ausgabe des Modells (MODEL_LIMITS).
+- Kontextfenster: passen Prompt und Mindest-Antwort nicht hinein, wirft
+  `plan()` TokenBudgetError, bevor etwas gesendet wird.
+- Auswertung: `record()` vergleicht Schätzung und tatsächliche `usage`
+  des Providers; `snapshot()` liefert die Summen je Stufe.
+- Map-Reduce: Runden über `map_reduce_tokens` werden in überlappende
+  Fenster (`windows()`) geteilt und stückweise analysiert.
+
+Konfiguration (Umgebung):
+    LLM_TOKENIZER           "chars[:Zeichen pro Token]" (Standard: chars:3.5)
+                            oder "tiktoken[:encoding]"
+    LLM_CONTEXT_WINDOW      Kontextfenster in Tokens (überschreibt MODEL_LIMITS)
+    LLM_MAX_OUTPUT_TOKENS   Maximale Antwort-Tokens (überschreibt MODEL_LIMITS)
+    LLM_MAP_REDUCE_TOKENS   Ab dieser Rundenlänge in Tokens Map-Reduce (Standard: 24000)
+"""
+
+import logging
+import math
+import os
+import threading
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+try:
+    import tiktoken
+except ImportError:  # optional dependency
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+Tokenizer = Callable[[str], int]
+
+# Deutscher Text braucht mehr Tokens pro Zeichen als Englisch; lieber zu
+# hoch als zu niedrig schätzen
+DEFAULT_CHARS_PER_TOKEN = 3.5
+
+# Formatierung je Nachricht (Rolle, Trenner) und Einleitung der Antwort
+MESSAGE_OVERHEAD_TOKENS = 4
+REPLY_OVERHEAD_TOKENS = 3
+
+# Erwartete Antwortgröße je Stufe (mit Reserve)
+STAGE_OUTPUT_TOKENS = {
+    # Zeitstempel je Runde plus kurze Begründung
+    "split_rounds": 4_096,
+    # Entscheidung zu einer unsicheren Runden-Grenze
+    "round_boundary": 1_024,
+    # Game Report nach systemprompt_json.txt (bisher ca. 3-4k Tokens)
+    "round_report": 16_384,
+    # Teil-Ergebnisse eines Fensters (Map) und Report daraus (Reduce)
+    "round_map": 4_096,
+    "round_reduce": 16_384,
+}
+DEFAULT_OUTPUT_TOKENS = 8_192
+
+# Weniger Platz für die Antwort lohnt den Request nicht
+MIN_OUTPUT_TOKENS = 1_024
+
+# Anteil, um den die Schätzung zu niedrig liegen darf
+SAFETY_MARGIN = 0.1
+
+# Map-Reduce: Rundenlänge, Fenstergröße und Überlappung in Tokens
+MAP_REDUCE_TOKENS = 24_000
+MAP_WINDOW_TOKENS = 12_000
+MAP_OVERLAP_TOKENS = 1_000
+
+
+@dataclass(frozen=True)
+class ModelLimits:
+    context_window: int
+    max_output: int
+
+
+# Längstes passendes Präfix gewinnt
+MODEL_LIMITS = {
+    "anthropic/claude-3.5": ModelLimits(200_000, 8_192),
+    "anthropic/claude-3.7": ModelLimits(200_000, 64_000),
+    "anthropic/": ModelLimits(200_000, 32_000),
+    "openai/gpt-4o": ModelLimits(128_000, 16_384),
+    "openai/gpt-4.1": ModelLimits(1_047_576, 32_768),
+    "google/gemini-2.5": ModelLimits(1_048_576, 65_536),
+    "google/gemini": ModelLimits(1_048_576, 8_192),
+}
+DEFAULT_LIMITS = ModelLimits(128_000, 8_192)
+
+
+class TokenBudgetError(ValueError):
+    """Der Request passt nicht ins Kontextfenster des Modells."""
+
+    def __init__(self, model: str, prompt_tokens: int, output_tokens: int, context_window: int):
+        super().__init__(
+            f"Prompt für {model} zu lang: ca. {prompt_tokens} Tokens + mindestens {output_tokens} "
+            f"Antwort-Tokens passen nicht ins Kontextfenster von {context_window} Tokens"
+        )
+        self.model = model
+        self.prompt_tokens = prompt_tokens
+        self.output_tokens = output_tokens
+        self.context_window = context_window
+
+
+@dataclass
+class TokenPlan:
+    """Budget eines einzelnen Requests."""
+
+    stage: str
+    model: str
+    prompt_tokens: int
+    max_tokens: int
+    context_window: int
+
+
+def char_tokenizer(chars_per_token: float = DEFAULT_CHARS_PER_TOKEN) -> Tokenizer:
+    """Schätzung über die Textlänge (ohne Abhängigkeiten)."""
+    def count(text: str) -> int:
+        return math.ceil(len(text) / chars_per_token) if text else 0
+    return count
+
+
+def tiktoken_tokenizer(encoding: str = "cl100k_base") -> Tokenizer:
+    """Zählt mit tiktoken (für Nicht-OpenAI-Modelle eine Näherung)."""
+    if tiktoken is None:
+        raise ImportError("tiktoken ist nicht installiert")
+    enc = tiktoken.get_encoding(encoding)
+    return lambda text: len(enc.encode(text, disallowed_special=())) if text else 0
+
+
+def get_tokenizer(spec: Optional[str] = None) -> Tokenizer:
+    """Tokenizer nach `spec` bzw. LLM_TOKENIZER ("chars:3.5", "tiktoken:o200k_base")."""
+    spec = spec if spec is not None else os.environ.get("LLM_TOKENIZER", "")
+    name, _, arg = spec.strip().partition(":")
+    if name == "tiktoken":
+        try:
+            return tiktoken_tokenizer(arg or "cl100k_base")
+        except (ImportError, ValueError) as e:
+            logger.warning("tiktoken nicht nutzbar (%s), schätze über Zeichen", e)
+    elif name not in ("", "chars"):
+        logger.warning("Unbekannter Tokenizer %r, schätze über Zeichen", spec)
+    elif arg:
+        return char_tokenizer(float(arg))
+    return char_tokenizer()
+
+
+def _message_text(message: dict) -> str:
+    content = message.get("content")
+    if isinstance(content, list):
+        return "".join(part.get("text", "") for part in content)
+    return content or ""
+
+
+class TokenBudget:
+    """Plant `max_tokens` je Request und vergleicht Schätzung mit der tatsächlichen Usage."""
+
+    def __init__(
+        self,
+        tokenizer: Optional[Tokenizer] = None,
+        stage_output: Optional[Dict[str, int]] = None,
+        context_window: Optional[int] = None,
+        max_output: Optional[int] = None,
+        map_reduce_tokens: int = MAP_REDUCE_TOKENS,
+    ):
+        self.count = tokenizer or get_tokenizer()
+        self.stage_output = {**STAGE_OUTPUT_TOKENS, **(stage_output or {})}
+        self.context_window = context_window
+        self.max_output = max_output
+        self.map_reduce_tokens = map_reduce_tokens
+        self._lock = threading.Lock()
+        self._stages: Dict[str, Dict[str, int]] = {}
+
+    @classmethod
+    def from_env(cls) -> "TokenBudget":
+        context_window = os.environ.get("LLM_CONTEXT_WINDOW")
+        max_output = os.environ.get("LLM_MAX_OUTPUT_TOKENS")
+        return cls(
+            context_window=int(context_window) if context_window else None,
+            max_output=int(max_output) if max_output else None,
+            map_reduce_tokens=int(os.environ.get("LLM_MAP_REDUCE_TOKENS", MAP_REDUCE_TOKENS)),
+        )
+
+    def limits(self, model: str) -> ModelLimits:
+        matches = [prefix for prefix in MODEL_LIMITS if model.startswith(prefix)]
+        limits = MODEL_LIMITS[max(matches, key=len)] if matches else DEFAULT_LIMITS
+        return ModelLimits(
+            self.context_window or limits.context_window,
+            self.max_output or limits.max_output,
+        )
+
+    def count_messages(self, messages: List[dict]) -> int:
+        """Geschätzte Prompt-Tokens einer Chat-Nachrichtenliste."""
+        return REPLY_OVERHEAD_TOKENS + sum(
+            MESSAGE_OVERHEAD_TOKENS + self.count(_message_text(message)) for message in messages
+        )
+
+    def plan(self, messages: List[dict], model: str, stage: str) -> TokenPlan:
+        """
+        Budget für einen Request; wirft TokenBudgetError, wenn Prompt und
+        Mindest-Antwort nicht ins Kontextfenster passen.
+        """
+        limits = self.limits(model)
+        prompt_tokens = self.count_messages(messages)
+        wanted = min(self.stage_output.get(stage, DEFAULT_OUTPUT_TOKENS), limits.max_output)
+        room = limits.context_window - math.ceil(prompt_tokens * (1 + SAFETY_MARGIN))
+        if room < min(wanted, MIN_OUTPUT_TOKENS):
+            raise TokenBudgetError(model, prompt_tokens, min(wanted, MIN_OUTPUT_TOKENS), limits.context_window)
+        return TokenPlan(stage, model, prompt_tokens, min(wanted, room), limits.context_window)
+
+    def windows(
+        self,
+        lines: List[str],
+        window_tokens: int = MAP_WINDOW_TOKENS,
+        overlap_tokens: int = MAP_OVERLAP_TOKENS,
+    ) -> List[Tuple[int, int]]:
+        """
+        Zeilenbereiche [start, end) mit höchstens `window_tokens` Tokens;
+        jedes Fenster beginnt mit den letzten ~`overlap_tokens` Tokens des
+        vorherigen, damit nichts an einer Schnittkante verloren geht.
+        """
+        sizes = [self.count(line) + 1 for line in lines]
+        windows: List[Tuple[int, int]] = []
+        start = 0
+        while start < len(lines):
+            end, tokens = start, 0
+            # Mindestens eine Zeile, auch wenn sie allein zu lang ist
+            while end < len(lines) and (end == start or tokens + sizes[end] <= window_tokens):
+                tokens += sizes[end]
+                end += 1
+            windows.append((start, end))
+            if end >= len(lines):
+                break
+            overlap_start, overlap = end, 0
+            while overlap_start > start + 1 and overlap + sizes[overlap_start - 1] <= overlap_tokens:
+                overlap_start -= 1
+                overlap += sizes[overlap_start]
+            start = overlap_start
+        return windows
+
+    def record(self, plan: TokenPlan, result: dict) -> None:
+        """Verbucht Schätzung und tatsächliche Usage einer Antwort."""
+        usage = result.get("usage") or {}
+        finish_reason = (result.get("choices") or [{}])[0].get("finish_reason")
+        with self._lock:
+            stats = self._stages.setdefault(plan.stage, dict.fromkeys(
+                ("requests", "estimated_prompt_tokens", "prompt_tokens", "max_tokens",
+                 "completion_tokens", "truncated"), 0
+            ))
+            stats["requests"] += 1
+            stats["max_tokens"] += plan.max_tokens
+            stats["truncated"] += finish_reason == "length"
+            if usage.get("prompt_tokens"):
+                # Nur Requests mit Usage vergleichen, sonst verzerrt die Quote
+                stats["estimated_prompt_tokens"] += plan.prompt_tokens
+                stats["prompt_tokens"] += usage["prompt_tokens"]
+                stats["completion_tokens"] += usage.get("completion_tokens") or 0
+
+    def snapshot(self) -> Dict[str, Dict]:
+        with self._lock:
+            stages = {stage: dict(stats) for stage, stats in self._stages.items()}
+        for stats in stages.values():
+            estimated = stats["estimated_prompt_tokens"]
+            # > 1: Schätzung zu niedrig
+            stats["actual_to_estimate"] = round(stats["prompt_tokens"] / estimated, 3) if estimated else None
+        return stages
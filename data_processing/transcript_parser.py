@@ -0,0 +1,191 @@
+"""
+Gemeinsamer Parser für das Transkript-Zeilenformat.
+
+    00:00–00:16 Speaker 0 (Moderator): "Schönen guten Morgen..."
+    01:02:03–01:02:09 Speaker 1: "..."        (HH:MM:SS, Audio-Pipeline)
+    01:02:03 Speaker 2 (Blue): "..."          (ohne Ende)
+    75:02–75:10 Clara: ...                    (Minuten über 60 hinaus)
+
+Jede Zeile wird mit vorkompilierten Mustern genau einmal in einen
+TranscriptLine-Record zerlegt (Start/Ende in Sekunden, Sprecher-ID, Rolle,
+Text). Zeilen ohne Zeitstempel (Überschriften, Leerzeilen) liefern None
+bzw. werden übersprungen.
+
+- parse_line(): eine Zeile
+- parse_timestamp() / parse_clock(): einzelne Zeitstempel
+- iter_transcript() / read_transcript(): Generatoren für große Dateien
+- parse_transcript(): ganzer Text; gecacht, sodass derselbe Text (z.B.
+  innerhalb eines Pipeline-Jobs) nur einmal zerlegt wird
+- LineIndex: Zeilenanfänge und Startzeiten eines Texts, um ihn per
+  Bisektion an Zeitpunkten (z.B. Runden-Starts) zu schneiden
+"""
+
+import re
+from bisect import bisect_left
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+_CLOCK = r"\d+:\d{2}(?::\d{2})?"
+_CLOCK_ONLY = re.compile(_CLOCK)
+_LINE = re.compile(
+    rf"^\s*(?P<start>{_CLOCK})(?:\s*[–—-]\s*(?P<end>{_CLOCK}))?\s+(?P<speaker>[^:\n]+?):\s?(?P<text>.*)$"
+)
+_SPEAKER = re.compile(r"^Speaker\s+(?P<id>\d+)(?:\s*\((?P<role>[^)]*)\))?$")
+
+
+@dataclass(frozen=True)
+class TranscriptLine:
+    """Eine Äußerung: Zeilennummer (ab 0), Zeiten in Sekunden, Sprecher und Text."""
+
+    line: int
+    start: int
+    end: Optional[int]
+    # Zeitstempel wie im Transkript, z.B. "19:03" oder "01:02:03"
+    start_text: str
+    end_text: Optional[str]
+    # Vollständige Sprecher-Bezeichnung, z.B. "Speaker 0 (Moderator)"
+    speaker: str
+    speaker_id: Optional[int]
+    role: Optional[str]
+    text: str
+
+    @property
+    def duration(self) -> int:
+        return max(0, self.end - self.start) if self.end is not None else 0
+
+    def render(self, speaker: str = None, end: int = None) -> str:
+        """Zeile im data_processing-Format (MM:SS–MM:SS), optional mit anderem Sprecher/Ende."""
+        if end is None:
+            end = self.end if self.end is not None else self.start
+        text = self.text.replace('"', '\\"')
+        return f"{format_mmss(self.start)}–{format_mmss(end)} {speaker or self.speaker}: \"{text}\""
+
+
+def parse_timestamp(timestamp: str) -> int:
+    """'MM:SS' oder 'HH:MM:SS' in Sekunden (0 bei unbekanntem Format)."""
+    parts = timestamp.split(":")
+    try:
+        if len(parts) == 2:
+            return int(parts[0]) * 60 + int(parts[1])
+        if len(parts) == 3:
+            return int(parts[0]) * 3600 + int(parts[1]) * 60 + int(parts[2])
+    except ValueError:
+        pass
+    return 0
+
+
+def parse_clock(text: str) -> Optional[int]:
+    """Wie parse_timestamp, aber None, wenn `text` kein Zeitstempel im Transkript-Format ist."""
+    text = text.strip()
+    return parse_timestamp(text) if _CLOCK_ONLY.fullmatch(text) else None
+
+
+def format_mmss(seconds: float) -> str:
+    """Sekunden als MM:SS; Minuten zählen über 60 hinaus weiter (z.B. 75:02)."""
+    total = max(0, int(round(seconds)))
+    return f"{total // 60:02d}:{total % 60:02d}"
+
+
+def _unquote(text: str) -> str:
+    text = text.strip()
+    if len(text) >= 2 and text[0] == '"' and text[-1] == '"':
+        return text[1:-1].replace('\\"', '"')
+    return text
+
+
+def parse_line(line: str, number: int = 0) -> Optional[TranscriptLine]:
+    """Zerlegt eine Transkript-Zeile; None, wenn sie nicht mit einem Zeitstempel beginnt."""
+    match = _LINE.match(line)
+    if match is None:
+        return None
+    start_text, end_text, speaker = match.group("start", "end", "speaker")
+    speaker = speaker.strip()
+    speaker_match = _SPEAKER.match(speaker)
+    return TranscriptLine(
+        line=number,
+        start=parse_timestamp(start_text),
+        end=parse_timestamp(end_text) if end_text else None,
+        start_text=start_text,
+        end_text=end_text,
+        speaker=speaker,
+        speaker_id=int(speaker_match.group("id")) if speaker_match else None,
+        role=speaker_match.group("role") if speaker_match else None,
+        text=_unquote(match.group("text")),
+    )
+
+
+def iter_transcript(lines: Iterable[str]) -> Iterator[TranscriptLine]:
+    """Äußerungen aus beliebigen Zeilen (z.B. einem offenen File), ohne alles zu laden."""
+    for number, line in enumerate(lines):
+        record = parse_line(line.rstrip("\r\n"), number)
+        if record is not None:
+            yield record
+
+
+def read_transcript(path: str) -> Iterator[TranscriptLine]:
+    """Äußerungen einer Transkript-Datei, Zeile für Zeile gelesen."""
+    with open(path, "r", encoding="utf-8") as f:
+        yield from iter_transcript(f)
+
+
+@lru_cache(maxsize=8)
+def parse_transcript(text: str) -> Tuple[TranscriptLine, ...]:
+    """Alle Äußerungen eines Transkript-Texts (Zeilennummern wie text.split('\\n'))."""
+    return tuple(iter_transcript(text.split("\n")))
+
+
+class LineIndex:
+    """
+    Sortierter Index über die Zeilen eines Transkript-Texts.
+
+    `offsets[i]` ist der Zeichen-Offset von Zeile i (Zeilen wie
+    text.split('\\n')), `seconds[i]` ihre Startzeit. Zeilen ohne Zeitstempel
+    und Rücksprünge (überlappende Sprecher) erben die bisher größte Zeit,
+    damit die Liste sortiert bleibt: Zeile `line_at(t)` ist dann die erste
+    Zeile mit Zeitstempel >= t.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self.offsets = [0]
+        position = text.find("\n")
+        while position != -1:
+            self.offsets.append(position + 1)
+            position = text.find("\n", position + 1)
+
+        starts: List[Optional[int]] = [None] * len(self.offsets)
+        for record in parse_transcript(text):
+            starts[record.line] = record.start
+        self.seconds: List[int] = []
+        latest = 0
+        for start in starts:
+            latest = max(latest, start) if start is not None else latest
+            self.seconds.append(latest)
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def line_at(self, seconds: int) -> int:
+        """Erste Zeile mit Startzeit >= `seconds` (len(self), wenn keine)."""
+        return bisect_left(self.seconds, seconds)
+
+    def split(self, starts: Iterable[int]) -> List[Tuple[int, int]]:
+        """
+        Zeilenbereiche [first, last) ab den Startzeiten `starts`; der erste
+        Bereich beginnt immer bei Zeile 0, leere Bereiche entfallen.
+        """
+        cuts = [0] + [self.line_at(t) for t in sorted(starts)[1:]] + [len(self)]
+        return [(first, last) for first, last in zip(cuts, cuts[1:]) if last > first]
+
+    def span(self, first: int, last: int, keep_newline: bool = False) -> Tuple[int, int]:
+        """Zeichenbereich der Zeilen [first, last) im Text."""
+        end = self.offsets[last] if last < len(self) else len(self.text)
+        if last < len(self) and not keep_newline:
+            end -= 1
+        return self.offsets[first], end
+
+    def slice(self, first: int, last: int, keep_newline: bool = False) -> str:
+        """Zeilen [first, last) als ein zusammenhängender Ausschnitt des Texts."""
+        start, end = self.span(first, last, keep_newline)
+        return self.text[start:end]
@@ -1,19 +1,260 @@
+import asyncio
+import inspect
 import json
-import requests
+import os
 import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
+from typing import Callable, Optional
+
+try:
+    from .http_resilience import ResilientAsyncClient, ResilientSession
+    from .llm_cache import LLMCache
+    from .round_detector import RECON_KINDS, Boundary, RoundDetection, detect_round_boundaries
+    from .streaming_json import IncrementalJSONParser, JSONStreamError
+    from .token_budget import TokenBudget, TokenBudgetError, Tokenizer  # noqa: F401 (TokenBudgetError re-exported)
+    from .transcript_parser import LineIndex, format_mmss, parse_clock, parse_line, parse_timestamp, parse_transcript
+except ImportError:  # als Skript aus data_processing/ gestartet
+    from http_resilience import ResilientAsyncClient, ResilientSession
+    from llm_cache import LLMCache
+    from round_detector import RECON_KINDS, Boundary, RoundDetection, detect_round_boundaries
+    from streaming_json import IncrementalJSONParser, JSONStreamError
+    from token_budget import TokenBudget, TokenBudgetError, Tokenizer  # noqa: F401
+    from transcript_parser import LineIndex, format_mmss, parse_clock, parse_line, parse_timestamp, parse_transcript
+
+# Platzhalter: Cache aus der Umgebung (LLM_CACHE_*) anlegen
+_CACHE_FROM_ENV = object()
+
+OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
+
+# Modelle, bei denen der Provider Prompt-Präfixe nur mit explizitem
+# cache_control cacht (OpenAI & Co. cachen automatisch)
+PROMPT_CACHE_MODEL_PREFIXES = ("anthropic/", "google/gemini")
+
+# Korrektur-Hinweise, wenn die Antwort kein valides JSON war
+STRICT_JSON_HINT = "\n\nBitte gib NUR valides JSON zurück."
+NO_MARKDOWN_JSON_HINT = (
+    "\n\nBitte gib NUR valides JSON zurück, KEINE Markdown-Blöcke, KEINE Erklärungen. "
+    "Beginne direkt mit { und ende mit }."
+)
+
+# Map-Reduce für Runden, die für einen Request zu lang sind: parallele
+# Fenster je Runde, Anweisungen für Teil-Extraktion und Zusammenführung
+MAP_CONCURRENCY = 4
+MAP_INSTRUCTION = (
+    "Dies ist Ausschnitt {index} von {total} einer Runde ({span}); die Ausschnitte überlappen sich.\n"
+    "Erstelle noch KEINEN Report. Extrahiere nur, was in DIESEM Ausschnitt vorkommt, als JSON:\n"
+    '{{"phasen": [{{"phase": "...", "zeitraum": "MM:SS–MM:SS", "inhalt": "..."}}], '
+    '"wuerfelwuerfe": [{{"zeit": "MM:SS", "team": "Blau|Rot", "zweck": "...", "ergebnisse": [], '
+    '"summe": null, "schwelle": null, "erfolg": null}}], '
+    '"angriff": {{"ziel": "...", "vorgehen": "..."}}, '
+    '"argumente": [{{"zeit": "MM:SS", "team": "Blau|Rot|Moderator", "dimension": "...", "inhalt": "..."}}], '
+    '"bewertungen": [{{"dimension": "...", "groesse": "S|M|L|XL", "begruendung": "..."}}], '
+    '"zitate": [{{"zeit": "MM:SS", "sprecher": "...", "text": "..."}}]}}\n'
+    "Lass Felder leer, die im Ausschnitt nicht vorkommen. Gib NUR valides JSON zurück.\n\n"
+)
+REDUCE_INSTRUCTION = (
+    "Analysiere NUR diese Runde ({span}). Das Transkript war zu lang für eine Anfrage; hier sind "
+    "die Teil-Ergebnisse aus {total} überlappenden Ausschnitten in zeitlicher Reihenfolge. "
+    "Führe doppelte Einträge aus den Überlappungen zusammen und erstelle daraus den vollständigen "
+    "Report im vorgegebenen JSON-Format:\n\n"
+)
+
+
+class OpenRouterError(Exception):
+    """OpenRouter hat keine verwertbare Antwort geliefert (auch nach Retries)."""
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(f"OpenRouter-Fehler (HTTP {status_code}): {message}")
+        self.status_code = status_code
+        self.message = message
+
+
+class ResponseTruncatedError(Exception):
+    """Die Antwort wurde bei max_tokens abgeschnitten (finish_reason "length")."""
+
+
+# Fortschritt einer gestreamten Antwort: {"tokens", "chars", "sections", "section"}
+ProgressCallback = Callable[[dict], object]
+
+# Mindestabstand (Zeichen) zwischen zwei Fortschrittsmeldungen ohne neuen Abschnitt
+PROGRESS_EVERY_CHARS = 400
+
+
+class _CompletionStream:
+    """
+    Setzt eine gestreamte Chat-Completion (Server-Sent Events) wieder zu
+    einer normalen Antwort zusammen und validiert den Inhalt dabei
+    inkrementell als JSON.
+    """
+
+    def __init__(self, count_tokens: Tokenizer):
+        self.parts = []
+        # Text seit der letzten Fortschrittsmeldung (nur dieser wird gezählt)
+        self._unreported = []
+        self.chars = 0
+        self.tokens = 0
+        self.count_tokens = count_tokens
+        self.finish_reason = None
+        self.usage = None
+        self.meta = {}
+        self.error: Optional[JSONStreamError] = None
+        self.section = None
+        self._emitted_chars = 0
+        self._section_pending = False
+        self.parser = IncrementalJSONParser(on_section=self._on_section)
+
+    def _on_section(self, path: str) -> None:
+        self.section = path
+        self._section_pending = True
+
+    def feed_line(self, line: str) -> bool:
+        """Verarbeitet eine SSE-Zeile; True, sobald der Stream zu Ende ist."""
+        if not line.startswith("data:"):
+            return False  # Leerzeilen, Kommentare (": OPENROUTER PROCESSING")
+        data = line[5:].strip()
+        if data == "[DONE]":
+            return True
+        chunk = json.loads(data)
+        if chunk.get("error"):
+            error = chunk["error"]
+            message = error.get("message", str(error)) if isinstance(error, dict) else str(error)
+            code = error.get("code") if isinstance(error, dict) else None
+            raise OpenRouterError(code if isinstance(code, int) else 502, message[:500])
+        for key in ("id", "model"):
+            if key in chunk:
+                self.meta.setdefault(key, chunk[key])
+        if chunk.get("usage"):
+            self.usage = chunk["usage"]
+        for choice in chunk.get("choices") or []:
+            if choice.get("finish_reason"):
+                self.finish_reason = choice["finish_reason"]
+            text = (choice.get("delta") or {}).get("content") or ""
+            if text:
+                self.parts.append(text)
+                self._unreported.append(text)
+                self.chars += len(text)
+                # Wirft JSONStreamError bei irreparablem JSON
+                self.parser.feed(text)
+        return False
+
+    def abort(self, error: JSONStreamError) -> None:
+        self.error = error
+        self.finish_reason = "aborted"
+
+    def progress(self) -> Optional[dict]:
+        """Fortschritt, falls seit der letzten Meldung genug passiert ist."""
+        if not self._section_pending and self.chars - self._emitted_chars < PROGRESS_EVERY_CHARS:
+            return None
+        self._section_pending = False
+        # Nur den neuen Text zählen (Chunks sind zu klein für eine Schätzung)
+        self.tokens += self.count_tokens("".join(self._unreported))
+        self._unreported.clear()
+        self._emitted_chars = self.chars
+        return {
+            "tokens": self.tokens,
+            "chars": self.chars,
+            "sections": self.parser.sections,
+            "section": self.section,
+        }
+
+    def result(self) -> dict:
+        result = {
+            **self.meta,
+            "choices": [{
+                "index": 0,
+                "finish_reason": self.finish_reason,
+                "message": {"role": "assistant", "content": "".join(self.parts)},
+            }],
+        }
+        if self.usage:
+            result["usage"] = self.usage
+        if self.error is not None:
+            result["stream_error"] = {"message": self.error.msg, "position": self.error.pos}
+        return result
+
+
+def _is_event_stream(response) -> bool:
+    return response.headers.get("content-type", "").startswith("text/event-stream")
+
+
+class UsageStats:
+    """Summiert die `usage`-Angaben gesendeter Requests (inkl. gecachter Prompt-Tokens)."""
+
+    FIELDS = ("requests", "prompt_tokens", "completion_tokens", "cached_tokens", "cache_write_tokens")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals = dict.fromkeys(self.FIELDS, 0)
+        self._cost = 0.0
+
+    def record(self, usage: dict) -> None:
+        details = usage.get("prompt_tokens_details") or {}
+        with self._lock:
+            self._totals["requests"] += 1
+            self._totals["prompt_tokens"] += usage.get("prompt_tokens") or 0
+            self._totals["completion_tokens"] += usage.get("completion_tokens") or 0
+            self._totals["cached_tokens"] += details.get("cached_tokens") or 0
+            self._totals["cache_write_tokens"] += (
+                details.get("cache_write_tokens") or usage.get("cache_creation_input_tokens") or 0
+            )
+            self._cost += usage.get("cost") or 0.0
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            totals = dict(self._totals)
+            cost = self._cost
+        prompt = totals["prompt_tokens"]
+        totals["cached_ratio"] = round(totals["cached_tokens"] / prompt, 4) if prompt else 0.0
+        totals["cost"] = round(cost, 6)
+        return totals
 
 
 class WargameAnalyzer:
     """Analyzer für Matrix-Wargame Transkripte mit OpenRouter API."""
 
-    def __init__(self, config_path: str = None, api_key: str = None):
+    def __init__(
+        self,
+        config_path: str = None,
+        api_key: str = None,
+        http: ResilientSession = None,
+        ahttp: ResilientAsyncClient = None,
+        cache=_CACHE_FROM_ENV,
+        base_url: str = None,
+        prompt_caching: bool = True,
+        stream: bool = True,
+        token_budget: TokenBudget = None,
+        request_slots: asyncio.Semaphore = None
+    ):
         """
         Initialisiere Analyzer mit API Key aus Config oder direkt.
 
         Args:
             config_path: Pfad zur config.json mit openrouter_api_key
             api_key: Direkter API Key (hat Vorrang vor config_path)
+            http: Gemeinsamer HTTP-Client (Pooling, Retry, Circuit Breaker);
+                ohne Angabe legt der Analyzer einen eigenen an
+            ahttp: Asynchroner Client für die a*-Methoden; ohne Angabe wird
+                beim ersten Aufruf einer angelegt (teilt den Circuit Breaker
+                mit `http`)
+            cache: LLMCache für identische Requests; ohne Angabe aus
+                LLM_CACHE_* (siehe llm_cache.py), None schaltet ihn ab
+            base_url: OpenRouter-kompatibler Endpunkt (Standard:
+                OPENROUTER_BASE_URL aus der Umgebung bzw. openrouter.ai),
+                z.B. der lokale Stand-in aus fake_openrouter.py
+            prompt_caching: System-Prompts für Provider-seitiges
+                Prefix-Caching markieren (cache_control)
+            stream: Antworten streamen (stream: true), dabei als JSON
+                validieren und bei irreparablem JSON früh abbrechen
+            token_budget: Zählt Prompt-Tokens, setzt max_tokens je Stufe und
+                lehnt zu lange Prompts vor dem Senden ab; ohne Angabe aus
+                LLM_TOKENIZER/LLM_CONTEXT_WINDOW (siehe token_budget.py)
+            request_slots: Gemeinsames Limit für asynchrone Requests; jeder
+                HTTP-Request belegt für seine Dauer einen Platz, auch wenn
+                ein Aufruf mehrere Requests parallel stellt (Standard: kein
+                Limit)
         """
         if api_key:
             self.api_key = api_key
@@ -24,14 +265,407 @@ class WargameAnalyzer:
         else:
             raise ValueError("Either config_path or api_key required")
 
-        self.base_url = "https://openrouter.ai/api/v1/chat/completions"
+        api_base = base_url or os.environ.get("OPENROUTER_BASE_URL") or OPENROUTER_BASE_URL
+        self.base_url = f"{api_base.rstrip('/')}/chat/completions"
+        self.prompt_caching = prompt_caching
+        self.stream = stream
+        self.usage = UsageStats()
+        self.budget = token_budget or TokenBudget.from_env()
         self.headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json",
             "HTTP-Referer": "https://github.com/wargame-analyzer",
             "X-Title": "Matrix Wargame Analyzer"
         }
-    
+        self.http = http or ResilientSession("openrouter")
+        self.ahttp = ahttp
+        self._owns_ahttp = False
+        self.cache: LLMCache = LLMCache.from_env() if cache is _CACHE_FROM_ENV else cache
+        self.request_slots = request_slots
+        self._map_executor: Optional[ThreadPoolExecutor] = None
+        self._map_pool_lock = threading.Lock()
+
+    def _chat_completion(self, payload: dict, on_progress: ProgressCallback = None) -> dict:
+        """
+        Sendet einen Chat-Completion-Request über den gemeinsamen Client.
+
+        429/5xx werden dort mit Backoff wiederholt. Bleibt die Antwort danach
+        fehlerhaft oder fehlt "choices", wird OpenRouterError geworfen statt
+        eines KeyError. Identische Requests beantwortet der Cache.
+
+        Gestreamte Antworten werden zur selben Form zusammengesetzt; wurde
+        der Stream wegen irreparablem JSON abgebrochen, enthält die Antwort
+        "stream_error" (und wird nicht gecacht).
+
+        Returns:
+            Die dekodierte JSON-Antwort (mit "choices")
+        """
+        if self.cache is None:
+            return self._send_completion(payload, on_progress)
+        return self.cache.call(
+            payload, lambda: self._send_completion(payload, on_progress), cacheable=self._cacheable
+        )
+
+    async def _achat_completion(self, payload: dict, on_progress: ProgressCallback = None) -> dict:
+        """Wie _chat_completion, aber über den asynchronen Client (belegt keinen Thread)."""
+        if self.cache is None:
+            return await self._asend_completion(payload, on_progress)
+        return await self.cache.acall(
+            payload, lambda: self._asend_completion(payload, on_progress), cacheable=self._cacheable
+        )
+
+    @staticmethod
+    def _cacheable(result: dict) -> bool:
+        return "stream_error" not in result
+
+    def _send_completion(self, payload: dict, on_progress: ProgressCallback = None) -> dict:
+        stream = payload.get("stream", False)
+        response = self.http.post(self.base_url, headers=self.headers, json=payload, stream=stream)
+        try:
+            if not stream or response.status_code >= 400 or not _is_event_stream(response):
+                return self._record_usage(self._decode_completion(response))
+
+            completion = _CompletionStream(self.budget.count)
+            try:
+                for line in response.iter_lines(chunk_size=128):
+                    if completion.feed_line(line.decode("utf-8")):
+                        break
+                    info = completion.progress()
+                    if info and on_progress:
+                        on_progress(info)
+            except JSONStreamError as e:
+                # Restliche Tokens nicht mehr abwarten
+                print(f"Stream abgebrochen: {e}")
+                completion.abort(e)
+            return self._record_usage(completion.result())
+        finally:
+            response.close()
+
+    async def _asend_completion(self, payload: dict, on_progress: ProgressCallback = None) -> dict:
+        if self.request_slots is None:
+            return await self._apost_completion(payload, on_progress)
+        async with self.request_slots:
+            return await self._apost_completion(payload, on_progress)
+
+    async def _apost_completion(self, payload: dict, on_progress: ProgressCallback = None) -> dict:
+        if self.ahttp is None:
+            self.ahttp = ResilientAsyncClient("openrouter", breaker=self.http.breaker)
+            self._owns_ahttp = True
+        stream = payload.get("stream", False)
+        response = await self.ahttp.post(self.base_url, headers=self.headers, json=payload, stream=True)
+        try:
+            if not stream or response.status_code >= 400 or not _is_event_stream(response):
+                await response.aread()
+                return self._record_usage(self._decode_completion(response))
+
+            completion = _CompletionStream(self.budget.count)
+            try:
+                async for line in response.aiter_lines():
+                    if completion.feed_line(line):
+                        break
+                    info = completion.progress()
+                    if info and on_progress:
+                        pending = on_progress(info)
+                        if inspect.isawaitable(pending):
+                            await pending
+            except JSONStreamError as e:
+                print(f"Stream abgebrochen: {e}")
+                completion.abort(e)
+            return self._record_usage(completion.result())
+        finally:
+            await response.aclose()
+
+    def _record_usage(self, result: dict) -> dict:
+        if result.get("usage"):
+            self.usage.record(result["usage"])
+        return result
+
+    def _system_message(self, prompt: str, model: str) -> dict:
+        """
+        System-Nachricht; bei Providern mit explizitem Prompt-Caching wird
+        der (statische) Prompt als cachebares Präfix markiert, sodass jede
+        weitere Runde ihn aus dem Provider-Cache liest.
+        """
+        if self.prompt_caching and model.startswith(PROMPT_CACHE_MODEL_PREFIXES):
+            return {
+                "role": "system",
+                "content": [
+                    {"type": "text", "text": prompt, "cache_control": {"type": "ephemeral"}}
+                ]
+            }
+        return {"role": "system", "content": prompt}
+
+    def close(self) -> None:
+        """Beendet den Thread-Pool der Map-Schritte (falls angelegt)."""
+        with self._map_pool_lock:
+            executor, self._map_executor = self._map_executor, None
+        if executor is not None:
+            executor.shutdown()
+
+    async def aclose(self) -> None:
+        """Schließt den selbst angelegten asynchronen Client."""
+        if self._owns_ahttp and self.ahttp is not None:
+            await self.ahttp.aclose()
+            self.ahttp = None
+            self._owns_ahttp = False
+
+    @staticmethod
+    def _decode_completion(response) -> dict:
+        """Prüft eine Chat-Completion-Antwort (requests oder httpx)."""
+        try:
+            result = response.json()
+        except ValueError:
+            raise OpenRouterError(response.status_code, response.text[:500])
+
+        if response.status_code >= 400 or not result.get("choices"):
+            error = result.get("error")
+            message = error.get("message", str(error)) if isinstance(error, dict) else str(error or result)
+            raise OpenRouterError(response.status_code, message[:500])
+        return result
+
+    def _json_exchange(
+        self,
+        messages: list,
+        model: str,
+        stage: str,
+        temperature: float,
+        max_retries: int,
+        hint: str = "",
+        verbose: bool = False,
+        strict: bool = True,
+        truncation_error: bool = False
+    ):
+        """
+        Ablauf eines JSON-Requests inkl. Fehlerkorrektur-Retries, unabhängig
+        vom Transport.
+
+        Generator: liefert die Payloads, bekommt die API-Antwort per send()
+        zurück und endet mit (geparstes JSON, JSON-String). Die synchronen
+        Methoden treiben ihn mit _run_exchange, die a*-Methoden mit
+        _arun_exchange; so teilen beide Extraktion und Retry-Logik.
+
+        Vor jedem Versuch plant das Token-Budget `max_tokens` für `stage`;
+        passt der Prompt nicht ins Kontextfenster, wird TokenBudgetError
+        geworfen, ohne zu senden.
+
+        Args:
+            stage: Stufe für das Antwort-Budget ("split_rounds", "round_report")
+            hint: Angehängt an die Fehlermeldung für den Korrektur-Versuch
+            verbose: Finish Reason und Usage ausgeben
+            strict: Nach dem letzten Versuch JSONDecodeError werfen; sonst
+                (None, letzter JSON-String) zurückgeben
+            truncation_error: Abgeschnittene Antworten nicht korrigieren
+                lassen, sondern ResponseTruncatedError werfen
+        """
+        json_content = None
+        for attempt in range(max_retries):
+            plan = self.budget.plan(messages, model, stage)
+            result = yield {
+                "model": model,
+                "messages": messages,
+                "max_tokens": plan.max_tokens,
+                "temperature": temperature,
+                "stream": self.stream,
+                # Usage-Details inkl. cached_tokens und Kosten
+                "usage": {"include": True}
+            }
+
+            self.budget.record(plan, result)
+            if verbose:
+                finish_reason = result["choices"][0].get("finish_reason")
+                print(f"  Finish Reason: {finish_reason}")
+                print(f"  Usage: {result.get('usage', {})}")
+                print(f"  Budget: ca. {plan.prompt_tokens} Prompt-Tokens geschätzt, "
+                      f"max_tokens={plan.max_tokens}")
+                if finish_reason == "length":
+                    print("PROBLEM: Response wurde wegen Token-Limit abgeschnitten!")
+            if truncation_error and result["choices"][0].get("finish_reason") == "length":
+                raise ResponseTruncatedError(f"Antwort nach max_tokens={plan.max_tokens} abgeschnitten")
+
+            content = result["choices"][0]["message"]["content"]
+            json_content = self._extract_json_from_text(content)
+            try:
+                if "stream_error" in result:
+                    # Schon beim Streamen als irreparabel erkannt
+                    raise JSONStreamError(result["stream_error"]["message"], result["stream_error"]["position"])
+                return self._parse_json_robust(json_content), json_content
+            except json.JSONDecodeError as e:
+                print(f"JSON-Parse-Fehler (Versuch {attempt + 1}/{max_retries}): {e}")
+
+                if attempt < max_retries - 1:
+                    messages.append({"role": "assistant", "content": content})
+                    messages.append({
+                        "role": "user",
+                        "content": f"Das JSON war nicht valide. Fehler: {str(e)}{hint}"
+                    })
+                elif strict:
+                    print("Maximale Versuche erreicht.")
+                    raise
+
+        return None, json_content
+
+    def _run_exchange(self, exchange, on_progress: ProgressCallback = None) -> tuple:
+        """Treibt einen _json_exchange mit blockierenden Requests."""
+        result = None
+        try:
+            while True:
+                result = self._chat_completion(exchange.send(result), on_progress)
+        except StopIteration as done:
+            return done.value
+
+    async def _arun_exchange(self, exchange, on_progress: ProgressCallback = None) -> tuple:
+        """
+        Treibt einen _json_exchange mit asynchronen Requests. `on_progress`
+        darf eine Coroutine-Funktion sein.
+        """
+        result = None
+        try:
+            while True:
+                result = await self._achat_completion(exchange.send(result), on_progress)
+        except StopIteration as done:
+            return done.value
+
+    def _run_steps(self, steps, on_progress: ProgressCallback = None) -> tuple:
+        """
+        Treibt einen mehrstufigen Ablauf (z.B. _round_report_steps): jede
+        gelieferte Liste von _json_exchange läuft parallel im gemeinsamen
+        Thread-Pool (MAP_CONCURRENCY Threads je Analyzer); der Ablauf bekommt
+        je Exchange das Ergebnis oder die Exception zurück.
+        """
+        outcomes = None
+        try:
+            while True:
+                exchanges = steps.send(outcomes)
+                if len(exchanges) == 1:
+                    outcomes = [self._try_exchange(exchanges[0], on_progress)]
+                    continue
+                run = partial(self._try_exchange, on_progress=on_progress)
+                outcomes = list(self._map_pool().map(run, exchanges))
+        except StopIteration as done:
+            return done.value
+
+    def _map_pool(self) -> ThreadPoolExecutor:
+        """Threads für parallele Exchanges, einmal je Analyzer angelegt."""
+        with self._map_pool_lock:
+            if self._map_executor is None:
+                self._map_executor = ThreadPoolExecutor(
+                    max_workers=MAP_CONCURRENCY, thread_name_prefix="wargame-map"
+                )
+            return self._map_executor
+
+    def _try_exchange(self, exchange, on_progress: ProgressCallback = None):
+        try:
+            return self._run_exchange(exchange, on_progress)
+        except Exception as e:
+            return e
+
+    async def _arun_steps(self, steps, on_progress: ProgressCallback = None) -> tuple:
+        """
+        Wie _run_steps, mit höchstens MAP_CONCURRENCY gleichzeitigen Requests
+        je Ablauf; jeder Request belegt zusätzlich einen Platz in
+        `request_slots`.
+        """
+        slots = asyncio.Semaphore(MAP_CONCURRENCY)
+
+        async def run(exchange, progress):
+            async with slots:
+                try:
+                    return await self._arun_exchange(exchange, progress)
+                except Exception as e:
+                    return e
+
+        outcomes = None
+        try:
+            while True:
+                exchanges = steps.send(outcomes)
+                # Fortschritt nur für einzelne Requests, nicht je Fenster
+                progress = on_progress if len(exchanges) == 1 else None
+                outcomes = await asyncio.gather(*(run(exchange, progress) for exchange in exchanges))
+        except StopIteration as done:
+            return done.value
+
+    def _round_report_steps(
+        self,
+        round_text: str,
+        system_prompt: str,
+        model: str,
+        max_retries: int,
+        **options
+    ):
+        """
+        Ablauf eines Runden-Reports für _run_steps/_arun_steps.
+
+        Passt die Runde in einen Request, wird sie direkt analysiert. Ist
+        sie länger als budget.map_reduce_tokens, passt nicht ins
+        Kontextfenster oder wird die Antwort abgeschnitten, läuft
+        Map-Reduce: überlappende Fenster liefern parallel Teil-Ergebnisse,
+        ein letzter Request führt sie zum Report nach dem System-Prompt
+        zusammen. Endet mit (geparstes JSON, JSON-String).
+
+        Args:
+            options: Weitere Argumente für den _json_exchange des Reports
+        """
+        system_message = self._system_message(system_prompt, model)
+        if self.budget.count(round_text) <= self.budget.map_reduce_tokens:
+            messages = [system_message, {"role": "user", "content": f"Analysiere NUR diese Runde:\n\n{round_text}"}]
+            (outcome,) = yield [self._json_exchange(
+                messages, model, "round_report", 0.1, max_retries, truncation_error=True, **options
+            )]
+            if not isinstance(outcome, (ResponseTruncatedError, TokenBudgetError)):
+                if isinstance(outcome, BaseException):
+                    raise outcome
+                return outcome
+            print(f"{outcome} – analysiere die Runde per Map-Reduce")
+
+        lines = round_text.split("\n")
+        windows = self.budget.windows(lines)
+        spans = [self._time_span(lines[start:end]) for start, end in windows]
+        print(f"Map-Reduce: {len(windows)} überlappende Ausschnitte")
+        outcomes = yield [
+            self._json_exchange(
+                [system_message, {
+                    "role": "user",
+                    "content": MAP_INSTRUCTION.format(index=i, total=len(windows), span=span)
+                    + "\n".join(lines[start:end])
+                }],
+                model, "round_map", 0.0, max_retries, hint=STRICT_JSON_HINT, strict=False
+            )
+            for i, ((start, end), span) in enumerate(zip(windows, spans), start=1)
+        ]
+
+        findings = []
+        analyzed = 0
+        for span, outcome in zip(spans, outcomes):
+            if isinstance(outcome, BaseException) or outcome[0] is None:
+                reason = outcome if isinstance(outcome, BaseException) else "invalides JSON"
+                print(f"Ausschnitt {span} ohne verwertbares Ergebnis: {reason}")
+                # Lücke kenntlich machen, statt sie stillschweigend zu füllen
+                findings.append({"ausschnitt": span, "fehler": "nicht analysiert"})
+            else:
+                findings.append({"ausschnitt": span, **outcome[0]})
+                analyzed += 1
+        if not analyzed:
+            # Ohne ein einziges Teil-Ergebnis würde der Reduce-Schritt nur raten
+            errors = [outcome for outcome in outcomes if isinstance(outcome, BaseException)]
+            if errors:
+                raise errors[0]
+            raise ValueError(f"Keiner der {len(windows)} Ausschnitte lieferte valides JSON")
+
+        messages = [system_message, {
+            "role": "user",
+            "content": REDUCE_INSTRUCTION.format(span=self._time_span(lines), total=len(windows))
+            + json.dumps(findings, ensure_ascii=False, indent=1)
+        }]
+        (outcome,) = yield [self._json_exchange(messages, model, "round_reduce", 0.1, max_retries, **options)]
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+
+    def _time_span(self, lines: list) -> str:
+        """"MM:SS–MM:SS" vom ersten bis zum letzten Zeitstempel der Zeilen."""
+        stamps = [s for s in map(self._extract_timestamp_from_line, lines) if s is not None]
+        return f"{stamps[0]}–{stamps[-1]}" if stamps else "ohne Zeitstempel"
+
     def split_rounds(
         self, 
         round_splitter_prompt_path: str, 
@@ -56,62 +690,42 @@ class WargameAnalyzer:
                 "cut_reasoning": "..."
             }
         """
+        parsed, _ = self._run_exchange(
+            self._split_rounds_exchange(round_splitter_prompt_path, transcript_path, model, max_retries)
+        )
+        return parsed if parsed is not None else {}
+
+    async def asplit_rounds(
+        self,
+        round_splitter_prompt_path: str,
+        transcript_path: str,
+        model: str,
+        max_retries: int = 3
+    ) -> dict:
+        """Asynchrone Variante von split_rounds."""
+        parsed, _ = await self._arun_exchange(
+            self._split_rounds_exchange(round_splitter_prompt_path, transcript_path, model, max_retries)
+        )
+        return parsed if parsed is not None else {}
+
+    def _split_rounds_exchange(
+        self,
+        round_splitter_prompt_path: str,
+        transcript_path: str,
+        model: str,
+        max_retries: int
+    ):
         # Lade Dateien
         with open(round_splitter_prompt_path, "r", encoding="utf-8") as f:
             system_prompt = f.read().strip()
         with open(transcript_path, "r", encoding="utf-8") as f:
             transcript = f.read().strip()
-        
-        # Bereite API-Request vor
+
         messages = [
-            {"role": "system", "content": system_prompt},
+            self._system_message(system_prompt, model),
             {"role": "user", "content": transcript}
         ]
-        
-        for attempt in range(max_retries):
-            try:
-                payload = {
-                    "model": model,
-                    "messages": messages,
-                    "max_tokens": 150000,
-                    "temperature": 0.0
-                }
-                
-                # API Call
-                response = requests.post(
-                    self.base_url,
-                    headers=self.headers,
-                    json=payload,
-                    timeout=300
-                )
-                
-                result = response.json()
-                content = result["choices"][0]["message"]["content"]
-                
-                # Extrahiere und parse JSON
-                json_content = self._extract_json_from_text(content)
-                data = self._parse_json_robust(json_content)
-                
-                return data
-                
-            except json.JSONDecodeError as e:
-                print(f"JSON-Parse-Fehler (Versuch {attempt + 1}/{max_retries}): {e}")
-                
-                if attempt < max_retries - 1:
-                    print("   Versuche erneut mit Fehlerkorrektur-Hinweis...")
-                    messages.append({
-                        "role": "assistant",
-                        "content": content
-                    })
-                    messages.append({
-                        "role": "user",
-                        "content": f"Das JSON war nicht valide. Fehler: {str(e)}\n\nBitte gib NUR valides JSON zurück, KEINE Markdown-Blöcke, KEINE Erklärungen. Beginne direkt mit {{ und ende mit }}."
-                    })
-                else:
-                    print("Maximale Versuche erreicht.")
-                    raise
-        
-        return {}
+        return self._json_exchange(messages, model, "split_rounds", 0.0, max_retries, hint=NO_MARKDOWN_JSON_HINT)
     
     def split_transcript_by_rounds(
         self,
@@ -136,66 +750,24 @@ class WargameAnalyzer:
         """
         # Lade Original-Transkript
         with open(transcript_path, "r", encoding="utf-8") as f:
-            lines = f.readlines()
-        
-        # Extrahiere Zeitstempel aus rounds_json
-        round_timestamps = []
-        for key in sorted(rounds_json.keys()):
-            if key.startswith("runde_"):
-                # Extrahiere den Start-Zeitstempel (z.B. "19:03" aus "19:03–32:50 [...]")
-                time_range = rounds_json[key].split("[")[0].strip()
-                start_time = time_range.split("–")[0].strip() if "–" in time_range else time_range.split("—")[0].strip()
-                round_timestamps.append(start_time)
-        
-        print(f"\nExtrahierte Zeitstempel: {round_timestamps}")
+            index = LineIndex(f.read())
         
-        # Sortiere Zeitstempel (konvertiere zu Sekunden für korrekte Sortierung)
-        round_timestamps_sorted = sorted(round_timestamps, key=self._parse_timestamp)
+        round_starts = self._round_starts(rounds_json)
+        print(f"\nExtrahierte Zeitstempel: {[format_mmss(t) for t in round_starts]}")
         
         # Erstelle Output-Verzeichnis
         Path(output_directory).mkdir(parents=True, exist_ok=True)
         
-        # Teile Transkript auf
+        # Teile Transkript auf (Grenzen per Bisektion im Zeilen-Index)
         round_files = []
-        current_round = 0
-        current_round_lines = []
-        
-        for line in lines:
-            line_timestamp = self._extract_timestamp_from_line(line)
-            
-            if line_timestamp is not None:
-                line_seconds = self._parse_timestamp(line_timestamp)
-                
-                # Prüfe ob wir eine neue Runde erreicht haben
-                if current_round < len(round_timestamps_sorted) - 1:
-                    next_round_start = self._parse_timestamp(round_timestamps_sorted[current_round + 1])
-                    
-                    if line_seconds >= next_round_start:
-                        # Speichere aktuelle Runde
-                        if current_round_lines:
-                            round_file = self._save_round_file(
-                                current_round + 1, 
-                                current_round_lines, 
-                                output_directory
-                            )
-                            round_files.append(round_file)
-                            print(f"✓ Runde {current_round + 1} gespeichert: {len(current_round_lines)} Zeilen")
-                        
-                        # Starte neue Runde
-                        current_round += 1
-                        current_round_lines = []
-            
-            current_round_lines.append(line)
-        
-        # Speichere letzte Runde
-        if current_round_lines:
+        for round_number, (first, last) in enumerate(index.split(round_starts), start=1):
             round_file = self._save_round_file(
-                current_round + 1, 
-                current_round_lines, 
+                round_number,
+                [index.slice(first, last, keep_newline=True)],
                 output_directory
             )
             round_files.append(round_file)
-            print(f"✓ Runde {current_round + 1} gespeichert: {len(current_round_lines)} Zeilen")
+            print(f"✓ Runde {round_number} gespeichert: {last - first} Zeilen")
         
         return round_files
     
@@ -209,12 +781,7 @@ class WargameAnalyzer:
         Returns:
             Sekunden als Integer
         """
-        parts = timestamp.split(":")
-        if len(parts) == 2:
-            return int(parts[0]) * 60 + int(parts[1])
-        elif len(parts) == 3:  # HH:MM:SS
-            return int(parts[0]) * 3600 + int(parts[1]) * 60 + int(parts[2])
-        return 0
+        return parse_timestamp(timestamp)
     
     def _extract_timestamp_from_line(self, line: str) -> str:
         """
@@ -226,11 +793,20 @@ class WargameAnalyzer:
         Returns:
             Start-Zeitstempel oder None wenn nicht gefunden
         """
-        # Suche nach Muster "MM:SS–MM:SS" oder "MM:SS—MM:SS"
-        match = re.match(r'(\d{1,2}:\d{2})[–—]', line)
-        if match:
-            return match.group(1)
-        return None
+        record = parse_line(line)
+        return record.start_text if record is not None else None
+    
+    def _round_starts(self, rounds_json: dict) -> list:
+        """
+        Start-Sekunden aller Runden aus rounds_json, aufsteigend sortiert
+        (z.B. 1143 aus "runde_2": "19:03–32:50 [...]"; auch HH:MM:SS).
+        """
+        starts = []
+        for key, value in rounds_json.items():
+            if key.startswith("runde_") and isinstance(value, str):
+                time_range = value.split("[")[0].strip()
+                starts.append(parse_timestamp(re.split(r"[–—]", time_range)[0].strip()))
+        return sorted(starts)
     
     def _save_round_file(self, round_number: int, lines: list, output_directory: str) -> str:
         """
@@ -272,6 +848,31 @@ class WargameAnalyzer:
         Returns:
             Pfad zur gespeicherten JSON-Datei
         """
+        steps = self._round_report_file_steps(round_text_path, system_prompt_path, model, max_retries)
+        parsed, json_content = self._run_steps(steps)
+        return self._save_round_report(round_number, parsed, json_content, output_directory)
+
+    async def agenerate_report_for_round(
+        self,
+        round_number: int,
+        round_text_path: str,
+        system_prompt_path: str,
+        model: str,
+        output_directory: str,
+        max_retries: int = 2
+    ) -> str:
+        """Asynchrone Variante von generate_report_for_round."""
+        steps = self._round_report_file_steps(round_text_path, system_prompt_path, model, max_retries)
+        parsed, json_content = await self._arun_steps(steps)
+        return self._save_round_report(round_number, parsed, json_content, output_directory)
+
+    def _round_report_file_steps(
+        self,
+        round_text_path: str,
+        system_prompt_path: str,
+        model: str,
+        max_retries: int
+    ):
         # Lade System-Prompt
         with open(system_prompt_path, "r", encoding="utf-8") as f:
             system_prompt = f.read().strip()
@@ -279,82 +880,33 @@ class WargameAnalyzer:
         # Lade Runden-Text
         with open(round_text_path, "r", encoding="utf-8") as f:
             round_text = f.read().strip()
-        
-        # Bereite API-Request vor
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": f"Analysiere NUR diese Runde:\n\n{round_text}"}
-        ]
-        
-        json_content = None
-        
-        for attempt in range(max_retries):
-            try:
-                payload = {
-                    "model": model,
-                    "messages": messages,
-                    "max_tokens": 150000,
-                    "temperature": 0.1
-                }
-                
-                # API Call
-                response = requests.post(
-                    self.base_url,
-                    headers=self.headers,
-                    json=payload,
-                    timeout=300
-                )
-                
-                result = response.json()
-
-                finish_reason = result["choices"][0].get("finish_reason")
-                print(f"  Finish Reason: {finish_reason}")
-                print(f"  Usage: {result.get('usage', {})}")
 
-                if finish_reason == "length":
-                    print("PROBLEM: Response wurde wegen Token-Limit abgeschnitten!")
+        # Bei dauerhaft invalidem JSON trotzdem speichern (manuell korrigieren)
+        return self._round_report_steps(
+            round_text, system_prompt, model, max_retries, hint=STRICT_JSON_HINT, verbose=True, strict=False
+        )
 
-                content = result["choices"][0]["message"]["content"]
-                
-                # Extrahiere JSON
-                json_content = self._extract_json_from_text(content)
-                
-                # Validiere JSON
-                parsed = self._parse_json_robust(json_content)
-                
-                # Erfolgreich geparst
-                break
-                
-            except json.JSONDecodeError as e:
-                print(f"JSON-Parse-Fehler (Versuch {attempt + 1}/{max_retries}): {e}")
-                
-                if attempt < max_retries - 1:
-                    # Retry mit Fehlerkorrektur
-                    messages.append({
-                        "role": "assistant",
-                        "content": content
-                    })
-                    messages.append({
-                        "role": "user",
-                        "content": f"Das JSON war nicht valide. Fehler: {str(e)}\n\nBitte gib NUR valides JSON zurück."
-                    })
-                else:
-                    print("Speichere trotzdem (manuell korrigieren)")
-        
+    def _save_round_report(
+        self,
+        round_number: int,
+        parsed: dict,
+        json_content: str,
+        output_directory: str
+    ) -> str:
+        """Speichert einen Runden-Report als JSON (oder als Text, falls invalide)."""
         # Erstelle Output-Verzeichnis
         Path(output_directory).mkdir(parents=True, exist_ok=True)
         output_path = Path(output_directory) / f"round{round_number}_report.json"
         
-        # Speichere JSON
-        try:
-            parsed = json.loads(json_content)
+        if parsed is not None:
             with open(output_path, "w", encoding="utf-8") as f:
                 json.dump(parsed, f, indent=2, ensure_ascii=False)
             print(f"Runde {round_number} Report gespeichert: {output_path}")
-        except:
+        else:
             # Fallback: Speichere als Text
+            print("Speichere trotzdem (manuell korrigieren)")
             with open(output_path, "w", encoding="utf-8") as f:
-                f.write(json_content)
+                f.write(json_content or "")
             print(f"Runde {round_number} als Text gespeichert (JSON invalid): {output_path}")
         
         return str(output_path)
@@ -434,7 +986,8 @@ class WargameAnalyzer:
         transcript_text: str,
         round_splitter_prompt: str,
         model: str,
-        max_retries: int = 3
+        max_retries: int = 3,
+        on_progress: ProgressCallback = None
     ) -> dict:
         """
         Analysiert Transkript-Text und gibt JSON mit Runden-Zeitstempeln zurück.
@@ -444,52 +997,208 @@ class WargameAnalyzer:
             round_splitter_prompt: System-Prompt Inhalt (nicht Pfad)
             model: OpenRouter Model-ID
             max_retries: Maximale Anzahl an Versuchen bei JSON-Fehlern
+            on_progress: Wird beim Streamen mit {"tokens", "chars",
+                "sections", "section"} aufgerufen
 
         Returns:
             Dictionary mit Runden-Info inkl. Zeitstempeln
         """
+        parsed, _ = self._run_exchange(
+            self._split_rounds_text_exchange(transcript_text, round_splitter_prompt, model, max_retries),
+            on_progress
+        )
+        return parsed if parsed is not None else {}
+
+    async def asplit_rounds_from_text(
+        self,
+        transcript_text: str,
+        round_splitter_prompt: str,
+        model: str,
+        max_retries: int = 3,
+        on_progress: ProgressCallback = None
+    ) -> dict:
+        """Asynchrone Variante von split_rounds_from_text."""
+        parsed, _ = await self._arun_exchange(
+            self._split_rounds_text_exchange(transcript_text, round_splitter_prompt, model, max_retries),
+            on_progress
+        )
+        return parsed if parsed is not None else {}
+
+    def _split_rounds_text_exchange(
+        self,
+        transcript_text: str,
+        round_splitter_prompt: str,
+        model: str,
+        max_retries: int
+    ):
         messages = [
-            {"role": "system", "content": round_splitter_prompt},
+            self._system_message(round_splitter_prompt, model),
             {"role": "user", "content": transcript_text}
         ]
+        return self._json_exchange(messages, model, "split_rounds", 0.0, max_retries, hint=STRICT_JSON_HINT)
 
-        for attempt in range(max_retries):
-            try:
-                payload = {
-                    "model": model,
-                    "messages": messages,
-                    "max_tokens": 150000,
-                    "temperature": 0.0
-                }
+    def detect_rounds_from_text(
+        self,
+        transcript_text: str,
+        boundary_prompt: str,
+        model: str,
+        max_retries: int = 2,
+        fallback_prompt: str = None,
+        on_progress: ProgressCallback = None
+    ) -> dict:
+        """
+        Ermittelt die Runden-Grenzen lokal anhand der Spiel-Marker
+        (round_detector.py). Das LLM wird nur für unsichere Grenzen gefragt,
+        und zwar nur mit einem kurzen Fenster um die Kandidaten-Grenze.
+
+        Args:
+            transcript_text: Das vollständige Transkript als String
+            boundary_prompt: System-Prompt für die Fenster-Rückfrage
+                (systemprompt_round_boundary.txt, Inhalt nicht Pfad)
+            model: OpenRouter Model-ID
+            max_retries: Maximale Anzahl an Versuchen bei JSON-Fehlern
+            fallback_prompt: Round-Splitter-Prompt; ist gesetzt und keine
+                einzige Aufklärungsphase erkennbar, wird wie bisher das
+                ganze Transkript per split_rounds_from_text aufgeteilt
+            on_progress: Nur für den Fallback (siehe split_rounds_from_text)
 
-                response = requests.post(
-                    self.base_url,
-                    headers=self.headers,
-                    json=payload,
-                    timeout=300
+        Returns:
+            Dictionary im Format von split_rounds_from_text
+        """
+        lines, detection = self._detect_round_boundaries(transcript_text)
+        if detection.recon_phases == 0 and fallback_prompt:
+            print("Keine Aufklärungsphase erkannt, Runden-Split per LLM...")
+            return self.split_rounds_from_text(
+                transcript_text, fallback_prompt, model, on_progress=on_progress
+            )
+
+        decisions = []
+        for boundary in detection.ambiguous:
+            try:
+                outcome = self._run_exchange(
+                    self._round_boundary_exchange(lines, boundary, boundary_prompt, model, max_retries)
                 )
+            except Exception as e:
+                outcome = e
+            decisions.append(self._boundary_decision(boundary, outcome))
+        return self._rounds_from_detection(transcript_text, detection, decisions)
+
+    async def adetect_rounds_from_text(
+        self,
+        transcript_text: str,
+        boundary_prompt: str,
+        model: str,
+        max_retries: int = 2,
+        fallback_prompt: str = None,
+        on_progress: ProgressCallback = None
+    ) -> dict:
+        """
+        Asynchrone Variante von detect_rounds_from_text (Fenster parallel;
+        jede Rückfrage belegt einen eigenen Platz in `request_slots`).
+        """
+        lines, detection = self._detect_round_boundaries(transcript_text)
+        if detection.recon_phases == 0 and fallback_prompt:
+            print("Keine Aufklärungsphase erkannt, Runden-Split per LLM...")
+            return await self.asplit_rounds_from_text(
+                transcript_text, fallback_prompt, model, on_progress=on_progress
+            )
 
-                result = response.json()
-                content = result["choices"][0]["message"]["content"]
+        outcomes = await asyncio.gather(*(
+            self._arun_exchange(
+                self._round_boundary_exchange(lines, boundary, boundary_prompt, model, max_retries)
+            )
+            for boundary in detection.ambiguous
+        ), return_exceptions=True)
+        decisions = [
+            self._boundary_decision(boundary, outcome)
+            for boundary, outcome in zip(detection.ambiguous, outcomes)
+        ]
+        return self._rounds_from_detection(transcript_text, detection, decisions)
 
-                json_content = self._extract_json_from_text(content)
-                data = self._parse_json_robust(json_content)
+    def _detect_round_boundaries(self, transcript_text: str) -> tuple:
+        lines = transcript_text.split('\n')
+        times = [None] * len(lines)
+        for record in parse_transcript(transcript_text):
+            times[record.line] = record.start
+        detection = detect_round_boundaries(lines, times)
+        print(f"Runden-Grenzen lokal: {len(detection.boundaries) - len(detection.ambiguous)} sicher, "
+              f"{len(detection.ambiguous)} unsicher ({detection.recon_phases} Aufklärungsphasen)")
+        return lines, detection
 
-                return data
+    def _round_boundary_exchange(
+        self,
+        lines: list,
+        boundary: Boundary,
+        boundary_prompt: str,
+        model: str,
+        max_retries: int
+    ):
+        start, end = boundary.window
+        messages = [
+            self._system_message(boundary_prompt, model),
+            {"role": "user", "content": "\n".join(lines[start:end])}
+        ]
+        return self._json_exchange(
+            messages, model, "round_boundary", 0.0, max_retries, hint=STRICT_JSON_HINT, strict=False
+        )
 
-            except json.JSONDecodeError as e:
-                print(f"JSON-Parse-Fehler (Versuch {attempt + 1}/{max_retries}): {e}")
+    def _boundary_decision(self, boundary: Boundary, outcome) -> Optional[dict]:
+        """Antwort des LLM für eine unsichere Grenze, None wenn keine brauchbare kam."""
+        if isinstance(outcome, BaseException):
+            print(f"Rückfrage zur Runden-Grenze bei Zeile {boundary.line + 1} fehlgeschlagen: {outcome}")
+            return None
+        parsed, _ = outcome
+        return parsed if isinstance(parsed, dict) and "neue_runde" in parsed else None
 
-                if attempt < max_retries - 1:
-                    messages.append({"role": "assistant", "content": content})
-                    messages.append({
-                        "role": "user",
-                        "content": f"Das JSON war nicht valide. Fehler: {str(e)}\n\nBitte gib NUR valides JSON zurück."
-                    })
-                else:
-                    raise
+    def _rounds_from_detection(self, transcript_text: str, detection: RoundDetection, decisions: list) -> dict:
+        """Baut aus Grenzen (und LLM-Entscheidungen) das Runden-JSON."""
+        lines = transcript_text.split('\n')
+        stamps = [None] * len(lines)
+        for record in parse_transcript(transcript_text):
+            stamps[record.line] = record.start_text
+        starts = [(0, "Spielbeginn")]
+        pending = iter(decisions)
+        for boundary in detection.boundaries:
+            if boundary.confident:
+                starts.append((boundary.line, f"lokal erkannt: {boundary.describe()}"))
+                continue
+            decision = next(pending)
+            if decision is None:
+                # Ohne Antwort nur vollständige Aufklärungsphasen als Grenze werten
+                if set(RECON_KINDS) <= set(boundary.kinds):
+                    starts.append((boundary.line, f"lokal vermutet: {boundary.describe()}"))
+            elif decision.get("neue_runde"):
+                line = self._boundary_line(stamps, decision.get("start"), boundary)
+                starts.append((line, f"per LLM bestätigt: {decision.get('begruendung', boundary.describe())}"))
+        starts = sorted(dict(starts).items())
+
+        rounds_json = {}
+        for n, (line, reason) in enumerate(starts, start=1):
+            end = starts[n][0] if n < len(starts) else len(lines)
+            round_stamps = [s for s in stamps[line:end] if s is not None]
+            if not round_stamps:
+                continue
+            rounds_json[f"runde_{len(rounds_json) + 1}"] = f"{round_stamps[0]}–{round_stamps[-1]} [{reason}]"
+        rounds_json["cut_reasoning"] = "; ".join(
+            f"{key}: {value.split('[', 1)[1].rstrip(']')}"
+            for key, value in rounds_json.items() if key != "runde_1"
+        ) or "Keine Runden-Grenze erkannt"
+        rounds_json["detection"] = {
+            "local_boundaries": len(detection.boundaries) - len(detection.ambiguous),
+            "llm_windows": len(decisions),
+        }
+        return rounds_json
 
-        return {}
+    def _boundary_line(self, stamps: list, timestamp, boundary: Boundary) -> int:
+        """Zeile zum vom LLM genannten Start innerhalb des Fensters (sonst die lokale Grenze)."""
+        target = parse_clock(timestamp) if isinstance(timestamp, str) else None
+        if target is None:
+            return boundary.line
+        start, end = boundary.window
+        for i in range(start, end):
+            if stamps[i] is not None and self._parse_timestamp(stamps[i]) >= target:
+                return i
+        return boundary.line
 
     def split_transcript_by_rounds_from_text(
         self,
@@ -506,42 +1215,9 @@ class WargameAnalyzer:
         Returns:
             Liste von Strings, je einer pro Runde
         """
-        lines = transcript_text.split('\n')
-
-        # Extrahiere Zeitstempel aus rounds_json
-        round_timestamps = []
-        for key in sorted(rounds_json.keys()):
-            if key.startswith("runde_"):
-                time_range = rounds_json[key].split("[")[0].strip()
-                start_time = time_range.split("–")[0].strip() if "–" in time_range else time_range.split("—")[0].strip()
-                round_timestamps.append(start_time)
-
-        round_timestamps_sorted = sorted(round_timestamps, key=self._parse_timestamp)
-
-        # Teile Transkript auf
-        round_texts = []
-        current_round = 0
-        current_round_lines = []
-
-        for line in lines:
-            line_timestamp = self._extract_timestamp_from_line(line)
-
-            if line_timestamp is not None:
-                line_seconds = self._parse_timestamp(line_timestamp)
-
-                if current_round < len(round_timestamps_sorted) - 1:
-                    next_round_start = self._parse_timestamp(round_timestamps_sorted[current_round + 1])
-
-                    if line_seconds >= next_round_start:
-                        if current_round_lines:
-                            round_texts.append('\n'.join(current_round_lines))
-                        current_round += 1
-                        current_round_lines = []
-
-            current_round_lines.append(line)
-
-        if current_round_lines:
-            round_texts.append('\n'.join(current_round_lines))
+        # Runden-Grenzen per Bisektion im Zeilen-Index, je Runde ein Ausschnitt
+        index = LineIndex(transcript_text)
+        round_texts = [index.slice(first, last) for first, last in index.split(self._round_starts(rounds_json))]
 
         return round_texts
 
@@ -551,7 +1227,8 @@ class WargameAnalyzer:
         round_text: str,
         system_prompt: str,
         model: str,
-        max_retries: int = 2
+        max_retries: int = 2,
+        on_progress: ProgressCallback = None
     ) -> dict:
         """
         Generiert einen Game Report für eine Runde aus Text.
@@ -562,48 +1239,33 @@ class WargameAnalyzer:
             system_prompt: System-Prompt Inhalt (nicht Pfad)
             model: OpenRouter Model-ID
             max_retries: Maximale Anzahl an Versuchen bei JSON-Fehlern
+            on_progress: Wird beim Streamen mit {"tokens", "chars",
+                "sections", "section"} aufgerufen
+
+        Zu lange Runden werden per Map-Reduce analysiert (siehe
+        _round_report_steps).
 
         Returns:
             Dictionary mit dem Report
         """
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": f"Analysiere NUR diese Runde:\n\n{round_text}"}
-        ]
-
-        for attempt in range(max_retries):
-            try:
-                payload = {
-                    "model": model,
-                    "messages": messages,
-                    "max_tokens": 150000,
-                    "temperature": 0.1
-                }
-
-                response = requests.post(
-                    self.base_url,
-                    headers=self.headers,
-                    json=payload,
-                    timeout=300
-                )
-
-                result = response.json()
-                content = result["choices"][0]["message"]["content"]
-                json_content = self._extract_json_from_text(content)
-                parsed = self._parse_json_robust(json_content)
-
-                return parsed
-
-            except json.JSONDecodeError as e:
-                print(f"JSON-Parse-Fehler (Versuch {attempt + 1}/{max_retries}): {e}")
+        parsed, _ = self._run_steps(
+            self._round_report_steps(round_text, system_prompt, model, max_retries),
+            on_progress
+        )
+        return parsed if parsed is not None else {}
 
-                if attempt < max_retries - 1:
-                    messages.append({"role": "assistant", "content": content})
-                    messages.append({
-                        "role": "user",
-                        "content": f"Das JSON war nicht valide. Fehler: {str(e)}"
-                    })
-                else:
-                    raise
-
-        return {}
+    async def agenerate_report_for_round_from_text(
+        self,
+        round_number: int,
+        round_text: str,
+        system_prompt: str,
+        model: str,
+        max_retries: int = 2,
+        on_progress: ProgressCallback = None
+    ) -> dict:
+        """Asynchrone Variante von generate_report_for_round_from_text."""
+        parsed, _ = await self._arun_steps(
+            self._round_report_steps(round_text, system_prompt, model, max_retries),
+            on_progress
+        )
+        return parsed if parsed is not None else {}
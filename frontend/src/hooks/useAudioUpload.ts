@@ -8,10 +8,11 @@ interface UploadResponse {
   filename: string;
 }
 
-interface ProgressResponse {
-  status: "in_progress" | "completed" | "failed";
-  progress: number;
-  filename: string;
+// Felder, die sich seit dem letzten Event geändert haben (das erste Event enthält alle)
+interface ProgressDelta {
+  status?: "queued" | "processing" | "completed" | "partial_success" | "failed";
+  progress?: number;
+  filename?: string;
   error?: string;
 }
 
@@ -53,7 +54,7 @@ export function useAudioUpload() {
       const data: UploadResponse = await res.json();
 
       setStatus("processing");
-      await pollProgress(data.job_id);
+      await watchProgress(data.job_id);
 
     } catch (err) {
       console.error("Upload error:", err);
@@ -61,37 +62,36 @@ export function useAudioUpload() {
     }
   }
 
-  async function pollProgress(jobId: string): Promise<void> {
-    let done = false;
-
-    while (!done) {
-      try {
-        const res = await fetch(`${API_BASE}/audio/progress/${jobId}`);
+  // Server-Sent Events statt Polling: der Server schickt nur Änderungen
+  function watchProgress(jobId: string): Promise<void> {
+    return new Promise((resolve) => {
+      const source = new EventSource(`${API_BASE}/audio/progress/${jobId}/stream`);
 
-        if (!res.ok) {
-          console.error("Progress failed:", await res.text());
-          setStatus("error");
-          return;
-        }
+      const finish = (result: JobStatus) => {
+        source.close();
+        setStatus(result);
+        resolve();
+      };
 
-        const data: ProgressResponse = await res.json();
-        setProgress(data.progress ?? 0);
+      source.addEventListener("progress", (e) => {
+        const data: ProgressDelta = JSON.parse((e as MessageEvent).data);
+        if (data.progress !== undefined) setProgress(data.progress);
 
-        if (data.status === "completed") {
-          setStatus("done");
-          done = true;
+        if (data.status === "completed" || data.status === "partial_success") {
+          finish("done");
         } else if (data.status === "failed") {
-          setStatus("error");
-          done = true;
-        } else {
-          await new Promise((r) => setTimeout(r, 1000));
+          finish("error");
         }
-      } catch (err) {
-        console.error("Polling error:", err);
-        setStatus("error");
-        return;
-      }
-    }
+      });
+
+      // EventSource verbindet sich selbst neu; nur endgültig geschlossene Streams sind Fehler
+      source.onerror = (err) => {
+        if (source.readyState === EventSource.CLOSED) {
+          console.error("Progress stream error:", err);
+          finish("error");
+        }
+      };
+    });
   }
 
   return {
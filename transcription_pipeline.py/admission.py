@@ -0,0 +1,218 @@
+"""
+Admission control for uploads.
+
+Bounds how many jobs may be queued or running and how many bytes of audio
+they may hold on disk/in memory at once. Requests over either limit are
+rejected with HTTP 429 and a Retry-After hint instead of being accepted and
+eventually running the process out of memory.
+
+This module is shared by the backend (backend/app/services/admission.py) and
+the transcription service (transcription_pipeline.py/admission.py), which are
+built from separate Docker contexts. Keep both copies byte-identical.
+
+Configuration (environment), see `from_env`:
+    Transcription service
+        TRANSCRIPTION_MAX_QUEUE_DEPTH     Queued + running jobs (default: 16)
+        TRANSCRIPTION_MAX_INFLIGHT_BYTES  Audio bytes held by those jobs (default: 8 GiB)
+        TRANSCRIPTION_RETRY_AFTER         Seconds clients should wait when rejected (default: 30)
+    Backend
+        BACKEND_MAX_ACTIVE_JOBS           Jobs not yet finished (default: 8)
+        BACKEND_MAX_INFLIGHT_BYTES        Audio bytes held by those jobs (default: 2 GiB)
+        BACKEND_RETRY_AFTER               Seconds clients should wait when rejected (default: 30)
+"""
+
+import inspect
+import json
+import os
+import threading
+from typing import Awaitable, Callable, Dict, Iterable, Optional
+
+
+class Overloaded(Exception):
+    """Raised when a request would exceed an admission limit."""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Tracks admitted jobs and their bytes against configured limits."""
+
+    def __init__(self, max_queue_depth: int, max_inflight_bytes: int, retry_after: int = 30):
+        self.max_queue_depth = max_queue_depth
+        self.max_inflight_bytes = max_inflight_bytes
+        self.retry_after = retry_after
+        self._jobs: Dict[str, int] = {}
+        self._inflight_bytes = 0
+        # Released from worker threads, checked from the event loop
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(
+        cls,
+        prefix: str = "TRANSCRIPTION",
+        depth_name: str = "MAX_QUEUE_DEPTH",
+        max_queue_depth: int = 16,
+        max_inflight_bytes: int = 8 * 1024 ** 3,
+    ) -> "AdmissionController":
+        """Limits from `<prefix>_<depth_name>`, `<prefix>_MAX_INFLIGHT_BYTES` and `<prefix>_RETRY_AFTER`."""
+        return cls(
+            max_queue_depth=int(os.environ.get(f"{prefix}_{depth_name}", str(max_queue_depth))),
+            max_inflight_bytes=int(os.environ.get(f"{prefix}_MAX_INFLIGHT_BYTES", str(max_inflight_bytes))),
+            retry_after=int(os.environ.get(f"{prefix}_RETRY_AFTER", "30")),
+        )
+
+    def check(self, incoming_bytes: int = 0) -> None:
+        """Raise Overloaded if one more job of `incoming_bytes` would not fit."""
+        with self._lock:
+            self._check_locked(incoming_bytes)
+
+    def _check_locked(self, incoming_bytes: int) -> None:
+        self.check_totals(len(self._jobs), self._inflight_bytes, incoming_bytes)
+
+    def check_totals(self, jobs: int, inflight_bytes: int, incoming_bytes: int = 0) -> None:
+        """
+        Check externally tracked totals against the limits, e.g. the active
+        jobs of a shared queue that several processes feed.
+        """
+        if jobs >= self.max_queue_depth:
+            raise Overloaded(
+                f"Queue full ({jobs}/{self.max_queue_depth} jobs)",
+                self.retry_after,
+            )
+        if inflight_bytes + incoming_bytes > self.max_inflight_bytes:
+            raise Overloaded(
+                f"Too much audio in flight ({inflight_bytes + incoming_bytes} "
+                f"> {self.max_inflight_bytes} bytes)",
+                self.retry_after,
+            )
+
+    def admit(self, job_id: str, size: int) -> None:
+        """Reserve capacity for a job, or raise Overloaded."""
+        with self._lock:
+            self._check_locked(size)
+            self._jobs[job_id] = size
+            self._inflight_bytes += size
+
+    def release(self, job_id: str) -> None:
+        """Return a job's capacity (idempotent)."""
+        with self._lock:
+            size = self._jobs.pop(job_id, None)
+            if size is not None:
+                self._inflight_bytes -= size
+
+    def release_bytes(self, job_id: str) -> None:
+        """Stop counting a job's audio bytes once it no longer holds them (idempotent)."""
+        with self._lock:
+            size = self._jobs.get(job_id)
+            if size:
+                self._jobs[job_id] = 0
+                self._inflight_bytes -= size
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "jobs": len(self._jobs),
+                "max_queue_depth": self.max_queue_depth,
+                "inflight_bytes": self._inflight_bytes,
+                "max_inflight_bytes": self.max_inflight_bytes,
+            }
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware applying admission limits to upload requests before and
+    while their body is read, i.e. before FastAPI parses (and spools) the
+    multipart form.
+
+    `check(incoming_bytes)` raises Overloaded if a body of that size would
+    not fit; it may be a coroutine function, e.g. to read shared totals off
+    the event loop. It runs once with the Content-Length header and again every
+    `check_every` received bytes, so chunked uploads without a length and
+    limits filled up by concurrent uploads are caught mid-stream. The
+    rejection is answered with 429 and Retry-After instead of the 400 that
+    FastAPI would make of the aborted form parsing.
+    """
+
+    def __init__(
+        self,
+        app,
+        check: Callable[[int], Optional[Awaitable[None]]],
+        paths: Iterable[str],
+        check_every: int = 1024 * 1024,
+        detail: str = "Server overloaded",
+    ):
+        self.app = app
+        self.check = check
+        self.paths = set(paths)
+        self.check_every = check_every
+        self.detail = detail
+
+    async def _check(self, incoming_bytes: int) -> None:
+        pending = self.check(incoming_bytes)
+        if inspect.isawaitable(pending):
+            await pending
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            declared = int(dict(scope["headers"]).get(b"content-length", b"0") or 0)
+        except ValueError:
+            declared = 0
+        try:
+            await self._check(declared)
+        except Overloaded as e:
+            await _reject(send, e, self.detail)
+            return
+
+        state = {"received": 0, "next_check": self.check_every, "rejected": None, "started": False}
+
+        async def checked_receive():
+            message = await receive()
+            if message["type"] == "http.request":
+                state["received"] += len(message.get("body", b""))
+                if state["received"] >= state["next_check"]:
+                    state["next_check"] = state["received"] + self.check_every
+                    try:
+                        await self._check(max(state["received"], declared))
+                    except Overloaded as e:
+                        state["rejected"] = e
+                        raise
+            return message
+
+        async def guarded_send(message):
+            if state["rejected"] is not None:
+                # Replace whatever error response the aborted body parsing produced
+                if not state["started"]:
+                    state["started"] = True
+                    await _reject(send, state["rejected"], self.detail)
+                return
+            state["started"] = True
+            await send(message)
+
+        try:
+            await self.app(scope, checked_receive, guarded_send)
+        except Overloaded:
+            if state["rejected"] is None or state["started"]:
+                raise
+            state["started"] = True
+            await _reject(send, state["rejected"], self.detail)
+
+
+async def _reject(send, error: Overloaded, detail: str) -> None:
+    body = json.dumps({"detail": f"{detail}: {error.reason}"}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": 429,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(error.retry_after).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
@@ -4,40 +4,164 @@ FastAPI API Layer for the Transcription Pipeline Service.
 Endpoints:
 - POST /transcribe: Start a transcription job
 - GET /status/{job_id}: Get job status and progress
-- GET /result/{job_id}: Get transcription result
+- GET /result/{job_id}: Get transcription result (text, json, srt, vtt, columnar)
+- DELETE /jobs/{job_id}: Cancel a queued or running job
+- GET /health: Liveness (process is up)
+- GET /ready: Readiness (models loaded and warmed up)
+
+With TRANSCRIPTION_QUEUE_DB set, jobs go to a shared SQLite queue instead of
+the in-process scheduler and are run by separate worker processes (see
+worker.py); any API instance pointing at the same queue reports status and
+results of every job. Uploads are then spooled to TRANSCRIPTION_SPOOL_DIR,
+which the workers must be able to read.
 """
 
 import asyncio
+import hashlib
+import logging
 import os
 import tempfile
+import threading
 import uuid
+from collections import OrderedDict
 from concurrent.futures import ThreadPoolExecutor
-from typing import Dict
-
-from fastapi import FastAPI, File, HTTPException, UploadFile
-
-from transcript_diarization_v2 import (
-    align_transcript_with_speakers,
-    format_transcript,
-    infer_roles,
-    load_audio,
-    merge_tiny_speakers,
-    run_diarization,
-    run_transcription,
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+
+from fastapi import FastAPI, File, Form, HTTPException, Query, Request, UploadFile
+from fastapi.responses import JSONResponse
+
+from admission import AdmissionController, AdmissionMiddleware, Overloaded
+from compression import compressed_json, compressed_response
+from job_queue import SQLiteJobQueue
+from options import PipelineOptions
+from pipeline_runner import run_pipeline
+from resources import ResourceManager
+from scheduler import CancelToken, JobCancelled, JobScheduler, probe_duration
+from result_format import (
+    build_index,
+    parse_format,
+    parse_time,
+    render,
+    slice_result,
+    to_columnar,
 )
+from transcript_diarization_v2 import model_status, warmup
+from worker import start_workers
+
+# Whisper model to preload at startup; set TRANSCRIPTION_PRELOAD=0 to skip
+WARMUP_MODEL = os.environ.get("TRANSCRIPTION_WARMUP_MODEL", "large-v3")
+PRELOAD_MODELS = os.environ.get("TRANSCRIPTION_PRELOAD", "1") != "0"
+
+# Readiness state, updated by the background warmup
+READINESS: Dict = {"status": "starting", "error": None}
+
+
+def _warmup_sync() -> None:
+    """Load and warm up models (runs in its own thread)."""
+    READINESS["status"] = "warming_up"
+    try:
+        warmup(WARMUP_MODEL)
+        READINESS["status"] = "ready"
+    except Exception as e:
+        logging.exception("Model warmup failed")
+        READINESS["status"] = "failed"
+        READINESS["error"] = str(e)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm up in the background so /health answers immediately. A queue-mode
+    # API without embedded workers never runs a model itself. The warmup gets
+    # its own thread: on `executor` it would occupy a job slot the scheduler
+    # does not know about.
+    runs_jobs = job_queue is None or EMBEDDED_WORKERS > 0
+    if PRELOAD_MODELS and runs_jobs:
+        threading.Thread(target=_warmup_sync, name="model-warmup", daemon=True).start()
+    else:
+        READINESS["status"] = "ready"
+    if job_queue is not None and EMBEDDED_WORKERS > 0:
+        start_workers(job_queue, EMBEDDED_WORKERS, resources, _workers_stop)
+    yield
+    _workers_stop.set()
+    executor.shutdown(wait=False, cancel_futures=True)
+
 
 app = FastAPI(
     title="Transcription Pipeline Service",
     description="Speaker diarization and transcription service using Whisper and pyannote",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # In-memory job storage
 JOBS: Dict[str, Dict] = {}
 JOBS_LOCK = asyncio.Lock()
 
+# Finished transcripts keyed by (audio hash, options), most recently used last
+RESULT_CACHE: "OrderedDict[str, Dict]" = OrderedDict()
+RESULT_CACHE_SIZE = int(os.environ.get("TRANSCRIPTION_RESULT_CACHE_SIZE", "32"))
+
+# CPU budgeting across concurrent jobs (see resources.py)
+resources = ResourceManager.from_env()
+
 # Thread pool for CPU-bound transcription work
-executor = ThreadPoolExecutor(max_workers=2)
+executor = ThreadPoolExecutor(max_workers=resources.max_jobs)
+
+# Dispatches queued jobs to the pool by priority / audio length (see scheduler.py)
+scheduler = JobScheduler.from_env(max_running=resources.max_jobs)
+MIN_PRIORITY, MAX_PRIORITY = -10, 10
+
+# Queue-depth and in-flight-bytes limits for uploads (see admission.py)
+admission = AdmissionController.from_env()
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Shared queue for horizontally scaled workers (see job_queue.py, worker.py);
+# None keeps jobs in this process
+job_queue = SQLiteJobQueue.from_env()
+SPOOL_DIR = os.environ.get("TRANSCRIPTION_SPOOL_DIR") or (
+    os.path.join(os.path.dirname(os.path.abspath(job_queue.path)), "spool") if job_queue else None
+)
+if SPOOL_DIR:
+    os.makedirs(SPOOL_DIR, exist_ok=True)
+# Worker threads this process runs against the shared queue itself
+EMBEDDED_WORKERS = int(os.environ.get("TRANSCRIPTION_EMBEDDED_WORKERS", "0"))
+_workers_stop = threading.Event()
+
+
+def _overloaded(exc: Overloaded) -> HTTPException:
+    return HTTPException(
+        status_code=429,
+        detail=f"Service overloaded: {exc.reason}",
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+async def _check_admission(incoming_bytes: int) -> None:
+    """Admission check against this process, or against the shared queue."""
+    if job_queue is None:
+        admission.check(incoming_bytes)
+        return
+    totals = await asyncio.to_thread(job_queue.totals)
+    admission.check_totals(totals["jobs"], totals["inflight_bytes"], incoming_bytes)
+
+
+# Reject uploads before FastAPI parses and spools the multipart body
+app.add_middleware(
+    AdmissionMiddleware, check=_check_admission, paths=["/transcribe"], detail="Service overloaded"
+)
+
+
+async def _get_job(job_id: str) -> Dict:
+    """Job record from the shared queue or from memory; 404 if unknown."""
+    if job_queue is not None:
+        job = await asyncio.to_thread(job_queue.get, job_id)
+    else:
+        async with JOBS_LOCK:
+            job = JOBS.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
 
 
 async def _set_job(job_id: str, **fields) -> None:
@@ -47,49 +171,34 @@ async def _set_job(job_id: str, **fields) -> None:
             JOBS[job_id].update(fields)
 
 
-def _run_pipeline_sync(job_id: str, tmp_path: str) -> None:
+def _cache_result(cache_key: str, result: Dict) -> None:
+    """Store a finished result, evicting the least recently used entry."""
+    RESULT_CACHE[cache_key] = result
+    RESULT_CACHE.move_to_end(cache_key)
+    while len(RESULT_CACHE) > RESULT_CACHE_SIZE:
+        RESULT_CACHE.popitem(last=False)
+
+
+def _run_pipeline_sync(
+    job_id: str, tmp_path: str, options: PipelineOptions, token: CancelToken
+) -> None:
     """Synchronous pipeline execution (runs in thread pool)."""
     try:
-        # Step 1: Load audio - 10%
-        JOBS[job_id]["progress"] = 10
-        JOBS[job_id]["step"] = "load"
-        audio_path = load_audio(tmp_path)
-
-        # Step 2: Whisper transcription - 20-40%
-        JOBS[job_id]["progress"] = 20
-        JOBS[job_id]["step"] = "transcription"
-        transcription_segments = run_transcription(audio_path, model_name="large-v3")
-        JOBS[job_id]["progress"] = 40
-
-        # Step 3: Speaker diarization - 40-70%
-        JOBS[job_id]["progress"] = 45
-        JOBS[job_id]["step"] = "diarization"
-        diarization_segments = run_diarization(audio_path)
-        JOBS[job_id]["progress"] = 70
-
-        # Step 4: Alignment - 70-80%
-        JOBS[job_id]["progress"] = 75
-        JOBS[job_id]["step"] = "alignment"
-        utterances = align_transcript_with_speakers(diarization_segments, transcription_segments)
-        utterances = merge_tiny_speakers(utterances, min_total_duration=8.0)
-        JOBS[job_id]["progress"] = 80
-
-        # Step 5: Role inference - 80-90%
-        JOBS[job_id]["progress"] = 85
-        JOBS[job_id]["step"] = "roles"
-        speaker_roles = infer_roles(utterances)
-        JOBS[job_id]["progress"] = 90
-
-        # Step 6: Format output - 90-100%
-        JOBS[job_id]["progress"] = 95
-        JOBS[job_id]["step"] = "format"
-        transcript = format_transcript(utterances, speaker_roles)
+        token.check()
+        JOBS[job_id]["status"] = "processing"
+        result = run_pipeline(job_id, tmp_path, options, token, JOBS[job_id].update, resources)
 
         JOBS[job_id]["status"] = "completed"
         JOBS[job_id]["progress"] = 100
         JOBS[job_id]["step"] = "done"
-        JOBS[job_id]["result"] = transcript
-
+        JOBS[job_id]["result"] = result
+        JOBS[job_id]["index"] = build_index(result)
+        JOBS[job_id]["quality"] = "final"
+        _cache_result(JOBS[job_id]["cache_key"], result)
+
+    except JobCancelled:
+        JOBS[job_id]["status"] = "cancelled"
+        JOBS[job_id]["step"] = "cancelled"
     except Exception as e:
         JOBS[job_id]["status"] = "failed"
         JOBS[job_id]["error"] = str(e)
@@ -99,47 +208,179 @@ def _run_pipeline_sync(job_id: str, tmp_path: str) -> None:
             os.unlink(tmp_path)
 
 
-async def process_audio(job_id: str, tmp_path: str) -> None:
+async def process_audio(
+    job_id: str, tmp_path: str, options: PipelineOptions, token: CancelToken
+) -> None:
     """Run the transcription pipeline in a thread pool."""
     loop = asyncio.get_event_loop()
-    await loop.run_in_executor(executor, _run_pipeline_sync, job_id, tmp_path)
+    try:
+        await loop.run_in_executor(executor, _run_pipeline_sync, job_id, tmp_path, options, token)
+    finally:
+        admission.release(job_id)
 
 
 @app.post("/transcribe")
-async def start_transcription(file: UploadFile = File(...)):
+async def start_transcription(
+    file: UploadFile = File(...),
+    model: str = Form("large-v3"),
+    language: Optional[str] = Form("de"),
+    num_speakers: Optional[int] = Form(3),
+    min_speakers: Optional[int] = Form(None),
+    max_speakers: Optional[int] = Form(None),
+    exclusive: bool = Form(True),
+    decoding: str = Form("greedy"),
+    beam_size: int = Form(5),
+    diarization_window: float = Form(1800.0),
+    preview_model: Optional[str] = Form(None),
+    redecode_model: Optional[str] = Form(None),
+    redecode_logprob: float = Form(-1.0),
+    priority: int = Form(0),
+):
     """
     Start a transcription job.
 
     Upload an audio file and receive a job_id to track progress.
+
+    Optional form fields select the Whisper model, the spoken language
+    ("auto" to detect), the speaker count (num_speakers, or 0 plus
+    min_speakers/max_speakers), exclusive diarization, greedy/beam
+    decoding and the window length above which diarization runs in
+    bounded-memory windows (diarization_window, 0 = off). A job with the
+    same audio and options as a cached result completes immediately.
+
+    With `preview_model` (e.g. "base") the job first publishes a preview
+    transcript from that model, available from /result while the final
+    `model` pass still runs; /status reports the available `quality`.
+
+    With `redecode_model` (e.g. model="base", redecode_model="large-v3")
+    only segments below `redecode_logprob` (or flagged as repetitive or
+    non-speech by Whisper) are decoded again with that model and beam
+    search; /status and the json result report how much audio that was.
+
+    `priority` (-10..10, higher first) orders the queue; within a priority
+    shorter recordings go first (see scheduler.py).
+
+    Returns 429 with Retry-After when the queue depth or the in-flight
+    audio bytes would exceed their limits (see admission.py).
     """
     if not file.filename:
         raise HTTPException(status_code=400, detail="Filename is required")
 
+    try:
+        options = PipelineOptions.from_form(
+            model=model,
+            language=language,
+            num_speakers=num_speakers,
+            min_speakers=min_speakers,
+            max_speakers=max_speakers,
+            exclusive=exclusive,
+            decoding=decoding,
+            beam_size=beam_size,
+            diarization_window=diarization_window,
+            preview_model=preview_model,
+            redecode_model=redecode_model,
+            redecode_logprob=redecode_logprob,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not MIN_PRIORITY <= priority <= MAX_PRIORITY:
+        raise HTTPException(
+            status_code=400,
+            detail=f"priority must be between {MIN_PRIORITY} and {MAX_PRIORITY}",
+        )
+
+    # Capacity was already checked before and while reading the body (AdmissionMiddleware)
     job_id = str(uuid.uuid4())
 
-    # Save audio to temp file
-    content = await file.read()
-    if not content:
+    # Stream audio to a temp file in chunks, hashing on the way
+    digest = hashlib.sha256()
+    size = 0
+    with tempfile.NamedTemporaryFile(suffix=".wav", delete=False, dir=SPOOL_DIR) as tmp:
+        tmp_path = tmp.name
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            tmp.write(chunk)
+            digest.update(chunk)
+            size += len(chunk)
+    if not size:
+        os.unlink(tmp_path)
         raise HTTPException(status_code=400, detail="Empty file")
 
-    with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp:
-        tmp.write(content)
-        tmp_path = tmp.name
+    cache_key = options.cache_key(digest.hexdigest())
+    cached = RESULT_CACHE.get(cache_key)
+    if cached is None and job_queue is not None:
+        cached = await asyncio.to_thread(job_queue.find_result, cache_key)
+        if cached is not None:
+            _cache_result(cache_key, cached)
+    if cached is not None:
+        os.unlink(tmp_path)
+        RESULT_CACHE.move_to_end(cache_key)
+        if job_queue is not None:
+            await asyncio.to_thread(job_queue.add_completed, job_id, options, cache_key, cached)
+            return {"job_id": job_id, "status": "completed", "cached": True}
+        async with JOBS_LOCK:
+            JOBS[job_id] = {
+                "status": "completed",
+                "progress": 100,
+                "step": "done",
+                "options": options.to_dict(),
+                "cache_key": cache_key,
+                "cached": True,
+                "quality": "final",
+                "result": cached,
+                "index": build_index(cached),
+                "error": None,
+            }
+        return {"job_id": job_id, "status": "completed", "cached": True}
+
+    if job_queue is not None:
+        duration = await probe_duration(tmp_path)
+        try:
+            # Limits are checked and the bytes reserved in the enqueue transaction,
+            # so concurrent API instances cannot all pass the limit at once
+            await asyncio.to_thread(
+                job_queue.enqueue,
+                job_id, tmp_path, options, cache_key, size, priority, duration, admission=admission
+            )
+        except Overloaded as e:
+            os.unlink(tmp_path)
+            raise _overloaded(e)
+        # Picked up by whichever worker is free next (see worker.py)
+        return {"job_id": job_id, "status": "queued", "cached": False}
+
+    try:
+        admission.admit(job_id, size)
+    except Overloaded as e:
+        os.unlink(tmp_path)
+        raise _overloaded(e)
+
+    duration = await probe_duration(tmp_path)
 
     async with JOBS_LOCK:
         JOBS[job_id] = {
-            "status": "processing",
+            "status": "queued",
             "progress": 0,
             "step": "queued",
+            "priority": priority,
+            "duration": duration,
             "tmp_path": tmp_path,
+            "size_bytes": size,
+            "options": options.to_dict(),
+            "cache_key": cache_key,
+            "cached": False,
+            "quality": None,
             "result": None,
             "error": None,
         }
 
-    # Start background processing
-    asyncio.create_task(process_audio(job_id, tmp_path))
+    # Queue for background processing
+    scheduler.submit(
+        job_id,
+        lambda token: process_audio(job_id, tmp_path, options, token),
+        priority=priority,
+        duration=duration,
+    )
 
-    return {"job_id": job_id, "status": "processing"}
+    return {"job_id": job_id, "status": "queued", "cached": False}
 
 
 @app.get("/status/{job_id}")
@@ -147,33 +388,114 @@ async def get_status(job_id: str):
     """
     Get the status of a transcription job.
 
-    Returns status, progress percentage, and current step.
+    Returns status, progress percentage, current step, the quality tier of
+    the transcript available from /result (None, "preview" or "final") and,
+    for re-decoding jobs, how much audio was re-decoded. In queue mode also
+    the worker running the job and how often it has been attempted.
     """
-    async with JOBS_LOCK:
-        if job_id not in JOBS:
-            raise HTTPException(status_code=404, detail="Job not found")
-        job = JOBS[job_id]
+    job = await _get_job(job_id)
+    if job_queue is not None:
+        queue_position = await asyncio.to_thread(job_queue.queue_position, job_id)
+    else:
+        queue_position = scheduler.queue_position(job_id)
 
-    return {
+    body = {
         "job_id": job_id,
         "status": job["status"],
         "progress": job["progress"],
         "step": job.get("step"),
+        "threads": job.get("threads"),
+        "queue_position": queue_position,
+        "options": job.get("options"),
+        "cached": bool(job.get("cached", False)),
+        "quality": job.get("quality"),
+        "redecode": (job.get("result") or {}).get("redecode"),
         "error": job.get("error"),
     }
+    if job_queue is not None:
+        body["worker_id"] = job.get("worker_id")
+        body["attempts"] = job.get("attempts")
+    return body
 
 
-@app.get("/result/{job_id}")
-async def get_result(job_id: str):
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
     """
-    Get the transcription result.
+    Cancel a job.
 
-    Only available when job status is 'completed'.
+    A queued job is dropped immediately. A running job stops at its next
+    cancellation check (between stages, Whisper windows or pyannote steps)
+    and releases its cores and temp file.
     """
+    if job_queue is not None:
+        job = await _get_job(job_id)
+        if job["status"] in ("completed", "failed", "cancelled"):
+            raise HTTPException(
+                status_code=409,
+                detail=f"Job already finished with status '{job['status']}'",
+            )
+        # Running jobs stop at their worker's next heartbeat
+        outcome = await asyncio.to_thread(job_queue.cancel, job_id)
+        if outcome == "cancelled" and os.path.exists(job["audio_path"]):
+            os.unlink(job["audio_path"])
+        return {"job_id": job_id, "status": outcome or job["status"]}
+
     async with JOBS_LOCK:
         if job_id not in JOBS:
             raise HTTPException(status_code=404, detail="Job not found")
         job = JOBS[job_id]
+        if job["status"] in ("completed", "failed", "cancelled"):
+            raise HTTPException(
+                status_code=409,
+                detail=f"Job already finished with status '{job['status']}'",
+            )
+
+        outcome = scheduler.cancel(job_id)
+        if outcome == "cancelled":
+            job.update(status="cancelled", step="cancelled")
+            admission.release(job_id)
+            tmp_path = job.get("tmp_path")
+            if tmp_path and os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+
+    return {"job_id": job_id, "status": outcome or job["status"]}
+
+
+@app.get("/result/{job_id}")
+async def get_result(
+    request: Request,
+    job_id: str,
+    format: str = Query("text", description="text, json, srt, vtt or columnar"),
+    from_: Optional[str] = Query(None, alias="from", description="Start time (HH:MM:SS, MM:SS or seconds)"),
+    to: Optional[str] = Query(None, description="End time, exclusive (HH:MM:SS, MM:SS or seconds)"),
+    offset: int = Query(0, ge=0, description="Skip this many utterances within the range"),
+    limit: Optional[int] = Query(None, ge=1, description="Return at most this many utterances"),
+):
+    """
+    Get the transcription result.
+
+    Available when the job is 'completed', or earlier for two-pass jobs once
+    the preview is ready; the `quality` field / X-Transcript-Quality header
+    tell which one was returned.
+
+    - text (default): {"job_id", "transcript"} with the classic line format
+    - json: {"job_id", "result"} with float start/end, speaker id, role and
+      text per utterance
+    - srt / vtt: subtitle file
+    - columnar: compact binary columns (see result_format.to_columnar)
+
+    `from`/`to` select utterances by start time and `offset`/`limit` page
+    through them, e.g. ?from=00:30:00&to=00:45:00. Responses are compressed
+    with brotli or gzip when the client accepts it.
+    """
+    try:
+        fmt = parse_format(format)
+        start = parse_time(from_) if from_ else None
+        end = parse_time(to) if to else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    job = await _get_job(job_id)
 
     if job["status"] == "failed":
         raise HTTPException(
@@ -181,16 +503,59 @@ async def get_result(job_id: str):
             detail=f"Job failed: {job.get('error', 'Unknown error')}",
         )
 
-    if job["status"] != "completed":
+    preview_ready = job["status"] == "processing" and job.get("quality") == "preview"
+    if job["status"] != "completed" and not preview_ready:
         raise HTTPException(
             status_code=400,
             detail=f"Job not ready. Current status: {job['status']}, progress: {job['progress']}%",
         )
 
-    return {"job_id": job_id, "transcript": job["result"]}
+    result = job["result"]
+    quality = result.get("quality", "final")
+    paginated = start is not None or end is not None or offset or limit is not None
+    if paginated:
+        index = job["index"] if job.get("quality") == "final" and "index" in job else build_index(result)
+        result = slice_result(result, index, start, end, offset, limit)
+
+    if fmt == "json":
+        response = compressed_json(request, {"job_id": job_id, "result": result})
+    elif fmt == "columnar":
+        response = compressed_response(request, to_columnar(result), "application/octet-stream")
+    elif fmt in ("srt", "vtt"):
+        media_type = "text/vtt" if fmt == "vtt" else "application/x-subrip"
+        response = compressed_response(request, render(result, fmt).encode("utf-8"), media_type)
+    else:
+        body = {"job_id": job_id, "quality": quality, "transcript": render(result, "text")}
+        if paginated:
+            body["page"] = result["page"]
+        response = compressed_json(request, body)
+    response.headers["X-Transcript-Quality"] = quality
+    return response
 
 
 @app.get("/health")
 async def health_check():
-    """Health check endpoint."""
+    """Liveness check: the process is up and serving requests."""
     return {"status": "healthy"}
+
+
+@app.get("/ready")
+async def readiness_check():
+    """
+    Readiness check: models are loaded and warmed up.
+
+    Returns 503 until the startup warmup has finished, so orchestrators only
+    route traffic once inference will actually be fast.
+    """
+    body = {
+        "status": READINESS["status"],
+        "error": READINESS["error"],
+        "models": model_status(),
+        "resources": resources.snapshot(),
+        "scheduler": scheduler.snapshot(),
+        "admission": admission.snapshot(),
+        "queue": await asyncio.to_thread(job_queue.snapshot) if job_queue is not None else None,
+    }
+    if READINESS["status"] != "ready":
+        return JSONResponse(status_code=503, content=body)
+    return body
@@ -0,0 +1,366 @@
+"""
+Shared job queue for horizontally scaled transcription workers.
+
+Jobs, progress and results live in one SQLite database on a volume shared
+by the API process and any number of worker processes (see worker.py).
+A worker claims a job with a time-limited lease and renews it with
+heartbeats; if a worker dies, its lease expires and the job goes back to
+the queue (up to `max_attempts` times).
+
+SQLite in WAL mode on a local or shared filesystem is enough for testing
+and small deployments; the interface is deliberately small so it can be
+backed by a server database later.
+"""
+
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+from admission import AdmissionController
+from options import PipelineOptions
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id               TEXT PRIMARY KEY,
+    status           TEXT NOT NULL,
+    priority         INTEGER NOT NULL DEFAULT 0,
+    duration         REAL,
+    size_bytes       INTEGER NOT NULL DEFAULT 0,
+    audio_path       TEXT NOT NULL,
+    options          TEXT NOT NULL,
+    cache_key        TEXT,
+    cached           INTEGER NOT NULL DEFAULT 0,
+    quality          TEXT,
+    progress         INTEGER NOT NULL DEFAULT 0,
+    step             TEXT,
+    threads          INTEGER,
+    result           TEXT,
+    error            TEXT,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    worker_id        TEXT,
+    lease_expires    REAL,
+    attempts         INTEGER NOT NULL DEFAULT 0,
+    created_at       REAL NOT NULL,
+    updated_at       REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, priority, duration, created_at);
+CREATE INDEX IF NOT EXISTS jobs_cache_key ON jobs (cache_key, status);
+"""
+
+FINAL_STATUSES = ("completed", "failed", "cancelled")
+_ADDED_COLUMNS = {"quality": "TEXT"}
+_UPDATABLE_FIELDS = ("progress", "step", "threads", "result", "quality")
+
+
+class SQLiteJobQueue:
+    """Job queue with leases and heartbeats, backed by one SQLite file."""
+
+    def __init__(self, path: str, max_attempts: int = 3, policy: str = "sjf"):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.policy = policy
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            # Columns added after the table was first created
+            existing = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            for name, decl in _ADDED_COLUMNS.items():
+                if name not in existing:
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {name} {decl}")
+
+    @classmethod
+    def from_env(cls) -> Optional["SQLiteJobQueue"]:
+        """Queue from TRANSCRIPTION_QUEUE_DB, or None for in-process mode."""
+        path = os.environ.get("TRANSCRIPTION_QUEUE_DB")
+        if not path:
+            return None
+        return cls(
+            path,
+            max_attempts=int(os.environ.get("TRANSCRIPTION_MAX_ATTEMPTS", "3")),
+            policy=os.environ.get("TRANSCRIPTION_SCHEDULING", "sjf"),
+        )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """Write transaction that takes the database lock up front."""
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    # ------------------------------------------------------------------
+    # API side
+    # ------------------------------------------------------------------
+    def enqueue(
+        self,
+        job_id: str,
+        audio_path: str,
+        options: PipelineOptions,
+        cache_key: str,
+        size_bytes: int,
+        priority: int = 0,
+        duration: Optional[float] = None,
+        admission: Optional[AdmissionController] = None,
+    ) -> None:
+        """
+        Add a queued job. With `admission`, its limits are checked against
+        the active jobs of all API instances in the same write transaction
+        that inserts the job, so the job's bytes are reserved atomically;
+        raises Overloaded (nothing is inserted) if they do not fit.
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            if admission is not None:
+                totals = self._totals(conn)
+                admission.check_totals(totals["jobs"], totals["inflight_bytes"], size_bytes)
+            conn.execute(
+                "INSERT INTO jobs (id, status, priority, duration, size_bytes, audio_path,"
+                " options, cache_key, step, created_at, updated_at)"
+                " VALUES (?, 'queued', ?, ?, ?, ?, ?, ?, 'queued', ?, ?)",
+                (job_id, priority, duration, size_bytes, audio_path,
+                 json.dumps(options.to_dict()), cache_key, now, now),
+            )
+
+    def add_completed(self, job_id: str, options: PipelineOptions, cache_key: str, result: Dict) -> None:
+        """Record a job answered from the result cache, so every API instance sees it."""
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, status, audio_path, options, cache_key, cached, quality,"
+                " progress, step, result, created_at, updated_at)"
+                " VALUES (?, 'completed', '', ?, ?, 1, 'final', 100, 'done', ?, ?, ?)",
+                (job_id, json.dumps(options.to_dict()), cache_key,
+                 json.dumps(result, ensure_ascii=False), now, now),
+            )
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Job record as a dict (result decoded), or None."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["options"] = json.loads(job["options"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def find_result(self, cache_key: str) -> Optional[Dict]:
+        """Result of any completed job with the same cache key."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT result FROM jobs WHERE cache_key = ? AND status = 'completed'"
+                " ORDER BY updated_at DESC LIMIT 1",
+                (cache_key,),
+            ).fetchone()
+        return json.loads(row["result"]) if row else None
+
+    def queue_position(self, job_id: str) -> Optional[int]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT priority, duration, created_at FROM jobs WHERE id = ? AND status = 'queued'",
+                (job_id,),
+            ).fetchone()
+            if row is None:
+                return None
+            ahead = conn.execute(
+                f"SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND id != ? AND ("
+                f" priority > ? OR (priority = ? AND {self._ahead_clause()}))",
+                (job_id, row["priority"], row["priority"], *self._ahead_params(row)),
+            ).fetchone()[0]
+        return ahead + 1
+
+    def _ahead_clause(self) -> str:
+        if self.policy == "sjf":
+            return ("(IFNULL(duration, 1e18) < IFNULL(?, 1e18)"
+                    " OR (IFNULL(duration, 1e18) = IFNULL(?, 1e18) AND created_at < ?))")
+        return "created_at < ?"
+
+    def _ahead_params(self, row) -> tuple:
+        if self.policy == "sjf":
+            return (row["duration"], row["duration"], row["created_at"])
+        return (row["created_at"],)
+
+    def cancel(self, job_id: str) -> Optional[str]:
+        """
+        Cancel a job: queued jobs are cancelled at once ("cancelled"), running
+        jobs are flagged and stop at their next heartbeat ("cancelling").
+        Returns None if the job is unknown or already finished.
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None or row["status"] in FINAL_STATUSES:
+                return None
+            if row["status"] == "queued":
+                conn.execute(
+                    "UPDATE jobs SET status = 'cancelled', step = 'cancelled', updated_at = ?"
+                    " WHERE id = ?",
+                    (now, job_id),
+                )
+                return "cancelled"
+            conn.execute(
+                "UPDATE jobs SET cancel_requested = 1, updated_at = ? WHERE id = ?",
+                (now, job_id),
+            )
+            return "cancelling"
+
+    def totals(self) -> Dict:
+        """Active job count and bytes, for admission control."""
+        with self._connect() as conn:
+            return self._totals(conn)
+
+    @staticmethod
+    def _totals(conn: sqlite3.Connection) -> Dict:
+        row = conn.execute(
+            "SELECT COUNT(*) AS jobs, IFNULL(SUM(size_bytes), 0) AS bytes FROM jobs"
+            " WHERE status IN ('queued', 'processing')"
+        ).fetchone()
+        return {"jobs": row["jobs"], "inflight_bytes": row["bytes"]}
+
+    def snapshot(self) -> Dict:
+        with self._connect() as conn:
+            counts = dict(conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+            workers = conn.execute(
+                "SELECT COUNT(DISTINCT worker_id) FROM jobs WHERE status = 'processing'"
+            ).fetchone()[0]
+        return {"backend": "sqlite", "policy": self.policy, "jobs": counts, "busy_workers": workers}
+
+    # ------------------------------------------------------------------
+    # Worker side
+    # ------------------------------------------------------------------
+    def _requeue_expired(self, conn: sqlite3.Connection, now: float) -> List[str]:
+        """
+        Put jobs of dead workers back into the queue (or fail/cancel them).
+        Returns the audio paths of jobs that became final, to be deleted once
+        the transaction has committed.
+        """
+        finished = [
+            row["audio_path"] for row in conn.execute(
+                "SELECT audio_path FROM jobs WHERE status = 'processing' AND lease_expires < ?"
+                " AND (attempts >= ? OR cancel_requested)",
+                (now, self.max_attempts),
+            )
+        ]
+        conn.execute(
+            "UPDATE jobs SET status = 'failed', step = 'failed', updated_at = ?,"
+            " error = 'Worker lost ' || attempts || ' time(s); giving up'"
+            " WHERE status = 'processing' AND lease_expires < ? AND attempts >= ?",
+            (now, now, self.max_attempts),
+        )
+        conn.execute(
+            "UPDATE jobs SET status = CASE WHEN cancel_requested THEN 'cancelled' ELSE 'queued' END,"
+            " step = CASE WHEN cancel_requested THEN 'cancelled' ELSE 'queued' END,"
+            " progress = 0, worker_id = NULL, lease_expires = NULL, updated_at = ?"
+            " WHERE status = 'processing' AND lease_expires < ?",
+            (now, now),
+        )
+        return finished
+
+    def claim(self, worker_id: str, lease_seconds: float) -> Optional[Dict]:
+        """Atomically lease the next job for `worker_id`, or return None."""
+        now = time.time()
+        order = "priority DESC, "
+        if self.policy == "sjf":
+            order += "IFNULL(duration, 1e18) ASC, "
+        order += "created_at ASC"
+        with self._transaction() as conn:
+            abandoned = self._requeue_expired(conn, now)
+            row = conn.execute(
+                f"SELECT id FROM jobs WHERE status = 'queued' ORDER BY {order} LIMIT 1"
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE jobs SET status = 'processing', worker_id = ?, lease_expires = ?,"
+                    " attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                    (worker_id, now + lease_seconds, now, row["id"]),
+                )
+        # Failed or cancelled for good: no worker will need their audio again
+        for path in abandoned:
+            if path and os.path.exists(path):
+                os.unlink(path)
+        return self.get(row["id"]) if row is not None else None
+
+    def heartbeat(self, job_id: str, worker_id: str, lease_seconds: float) -> Dict:
+        """
+        Renew the lease. Returns {"lease": bool, "cancel": bool}; a lost lease
+        means another worker may have taken the job over.
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            updated = conn.execute(
+                "UPDATE jobs SET lease_expires = ?, updated_at = ?"
+                " WHERE id = ? AND worker_id = ? AND status = 'processing'",
+                (now + lease_seconds, now, job_id, worker_id),
+            ).rowcount
+            row = conn.execute(
+                "SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return {"lease": bool(updated), "cancel": bool(row and row["cancel_requested"])}
+
+    def update(self, job_id: str, worker_id: str, **fields) -> bool:
+        """
+        Update progress fields (progress, step, threads) or publish a preview
+        (result, quality) of a leased job. Returns True if cancellation has
+        been requested meanwhile.
+        """
+        allowed = {k: v for k, v in fields.items() if k in _UPDATABLE_FIELDS}
+        if "result" in allowed:
+            allowed["result"] = json.dumps(allowed["result"], ensure_ascii=False)
+        with self._transaction() as conn:
+            if allowed:
+                assignments = ", ".join(f"{name} = ?" for name in allowed)
+                conn.execute(
+                    f"UPDATE jobs SET {assignments}, updated_at = ? WHERE id = ? AND worker_id = ?",
+                    (*allowed.values(), time.time(), job_id, worker_id),
+                )
+            row = conn.execute(
+                "SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return bool(row and row["cancel_requested"])
+
+    def finish(
+        self,
+        job_id: str,
+        worker_id: str,
+        status: str,
+        result: Optional[Dict] = None,
+        error: Optional[str] = None,
+    ) -> bool:
+        """Record a final status; False if the lease was lost meanwhile."""
+        if status not in FINAL_STATUSES:
+            raise ValueError(f"Not a final status: {status}")
+        progress_sql = ", progress = 100, quality = 'final'" if status == "completed" else ""
+        with self._transaction() as conn:
+            updated = conn.execute(
+                f"UPDATE jobs SET status = ?, step = ?, result = ?, error = ?,"
+                f" lease_expires = NULL, updated_at = ?{progress_sql}"
+                f" WHERE id = ? AND worker_id = ? AND status = 'processing'",
+                (
+                    status,
+                    "done" if status == "completed" else status,
+                    json.dumps(result, ensure_ascii=False) if result is not None else None,
+                    error,
+                    time.time(),
+                    job_id,
+                    worker_id,
+                ),
+            ).rowcount
+        return bool(updated)
@@ -0,0 +1,135 @@
+"""
+Per-request pipeline options for the transcription service.
+
+The defaults match our wargame sessions: three participants (moderator,
+Team Red, Team Blue) speaking German. Fixing the speaker count and the
+language lets pyannote skip speaker-count estimation and Whisper skip
+language detection on every job.
+"""
+
+import hashlib
+import json
+import re
+from dataclasses import asdict, dataclass
+from typing import Optional
+
+WHISPER_MODELS = {
+    "tiny", "tiny.en", "base", "base.en", "small", "small.en",
+    "medium", "medium.en", "large", "large-v1", "large-v2", "large-v3",
+    "large-v3-turbo", "turbo",
+}
+DECODING_MODES = {"greedy", "beam"}
+MAX_SPEAKERS = 20
+MAX_BEAM_SIZE = 10
+MIN_DIARIZATION_WINDOW = 300.0
+MIN_REDECODE_LOGPROB = -5.0
+DIARIZATION_OVERLAP = 60.0
+
+_LANGUAGE_RE = re.compile(r"^[a-z]{2,3}$")
+
+
+@dataclass(frozen=True)
+class PipelineOptions:
+    model: str = "large-v3"
+    # ISO language code; None lets Whisper auto-detect
+    language: Optional[str] = "de"
+    num_speakers: Optional[int] = 3
+    min_speakers: Optional[int] = None
+    max_speakers: Optional[int] = None
+    exclusive: bool = True
+    decoding: str = "greedy"
+    beam_size: int = 5
+    # Recordings longer than this are diarized in overlapping windows (0 = never)
+    diarization_window: float = 1800.0
+    # Small Whisper model for a quick preview transcript before `model` runs (None = single pass)
+    preview_model: Optional[str] = None
+    # Re-decode low-confidence segments with this model and beam search (None = off)
+    redecode_model: Optional[str] = None
+    # Segments with a lower average log-probability count as low-confidence
+    redecode_logprob: float = -1.0
+
+    def validate(self) -> "PipelineOptions":
+        """Raise ValueError with a readable message if the options are invalid."""
+        if self.model not in WHISPER_MODELS:
+            raise ValueError(f"Unknown model '{self.model}'. Allowed: {sorted(WHISPER_MODELS)}")
+        if self.language is not None and not _LANGUAGE_RE.match(self.language):
+            raise ValueError(f"Invalid language '{self.language}', expected an ISO code like 'de' or 'auto'")
+        for name in ("num_speakers", "min_speakers", "max_speakers"):
+            value = getattr(self, name)
+            if value is not None and not 1 <= value <= MAX_SPEAKERS:
+                raise ValueError(f"{name} must be between 1 and {MAX_SPEAKERS}")
+        if self.num_speakers is not None and (self.min_speakers or self.max_speakers):
+            raise ValueError("num_speakers cannot be combined with min_speakers/max_speakers")
+        if self.min_speakers and self.max_speakers and self.min_speakers > self.max_speakers:
+            raise ValueError("min_speakers must not exceed max_speakers")
+        if self.decoding not in DECODING_MODES:
+            raise ValueError(f"decoding must be one of {sorted(DECODING_MODES)}")
+        if not 1 <= self.beam_size <= MAX_BEAM_SIZE:
+            raise ValueError(f"beam_size must be between 1 and {MAX_BEAM_SIZE}")
+        if self.diarization_window and self.diarization_window < MIN_DIARIZATION_WINDOW:
+            raise ValueError(f"diarization_window must be 0 (off) or at least {MIN_DIARIZATION_WINDOW:.0f}s")
+        if self.preview_model is not None:
+            if self.preview_model not in WHISPER_MODELS:
+                raise ValueError(f"Unknown preview_model '{self.preview_model}'. Allowed: {sorted(WHISPER_MODELS)}")
+            if self.preview_model == self.model:
+                raise ValueError("preview_model must differ from model")
+        if self.redecode_model is not None and self.redecode_model not in WHISPER_MODELS:
+            raise ValueError(f"Unknown redecode_model '{self.redecode_model}'. Allowed: {sorted(WHISPER_MODELS)}")
+        if not MIN_REDECODE_LOGPROB <= self.redecode_logprob <= 0.0:
+            raise ValueError(f"redecode_logprob must be between {MIN_REDECODE_LOGPROB:.0f} and 0")
+        return self
+
+    @classmethod
+    def from_form(
+        cls,
+        model: str = "large-v3",
+        language: Optional[str] = "de",
+        num_speakers: Optional[int] = 3,
+        min_speakers: Optional[int] = None,
+        max_speakers: Optional[int] = None,
+        exclusive: bool = True,
+        decoding: str = "greedy",
+        beam_size: int = 5,
+        diarization_window: float = 1800.0,
+        preview_model: Optional[str] = None,
+        redecode_model: Optional[str] = None,
+        redecode_logprob: float = -1.0,
+    ) -> "PipelineOptions":
+        """Build validated options from form values ('auto' / 0 disable a setting)."""
+        language = (language or "").strip().lower()
+        preview_model = (preview_model or "").strip()
+        redecode_model = (redecode_model or "").strip()
+        return cls(
+            model=model.strip(),
+            language=None if language in ("", "auto") else language,
+            num_speakers=num_speakers or None,
+            min_speakers=min_speakers or None,
+            max_speakers=max_speakers or None,
+            exclusive=exclusive,
+            decoding=decoding.strip().lower(),
+            beam_size=beam_size,
+            diarization_window=diarization_window,
+            preview_model=preview_model or None,
+            redecode_model=redecode_model or None,
+            redecode_logprob=redecode_logprob,
+        ).validate()
+
+    @property
+    def whisper_beam_size(self) -> Optional[int]:
+        """Beam size to pass to Whisper (None = greedy decoding)."""
+        return self.beam_size if self.decoding == "beam" else None
+
+    @property
+    def two_pass(self) -> bool:
+        """Whether a preview transcript is published before the final one."""
+        return self.preview_model is not None
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    def cache_key(self, audio_digest: str) -> str:
+        """Result-cache key: same audio + same options = same transcript."""
+        # The preview model only affects the interim transcript
+        final_options = {k: v for k, v in self.to_dict().items() if k != "preview_model"}
+        options = json.dumps(final_options, sort_keys=True)
+        return hashlib.sha256(f"{audio_digest}:{options}".encode("utf-8")).hexdigest()
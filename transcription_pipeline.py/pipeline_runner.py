@@ -0,0 +1,243 @@
+"""
+Transcription pipeline for one job, independent of where job state lives.
+
+Used by the API process (in-memory jobs) and by queue workers (shared
+SQLite queue, see worker.py). Progress is reported through a callback, and
+cancellation through a CancelToken.
+
+Two-pass jobs (options.preview_model set) first transcribe with the small
+preview model, diarize, and publish a preview result through
+`report(result=..., quality="preview")`; then `options.model` transcribes
+again and its result, aligned with the same diarization, is returned as the
+final one.
+
+With options.redecode_model set, segments Whisper was unsure about are
+re-decoded with that model and beam search after the (fast) main pass;
+the result's "redecode" entry states how much audio that covered.
+"""
+
+from typing import Callable, Dict, List, Optional, Tuple
+
+from options import DIARIZATION_OVERLAP, PipelineOptions
+from resources import ResourceManager
+from result_format import build_result
+from scheduler import CancelToken
+from transcript_diarization_v2 import (
+    SpeakerSegment,
+    TranscriptSegment,
+    align_transcript_with_speakers,
+    infer_roles,
+    load_audio,
+    merge_redecoded,
+    merge_tiny_speakers,
+    redecode_spans,
+    run_diarization,
+    run_transcription,
+    select_redecode_spans,
+)
+
+# report(progress=..., step=..., threads=..., result=..., quality=...) -> None
+ProgressReporter = Callable[..., None]
+
+
+def _transcribe(
+    job_id: str,
+    audio_path: str,
+    model_name: str,
+    options: PipelineOptions,
+    token: CancelToken,
+    report: ProgressReporter,
+    resources: ResourceManager,
+) -> List[TranscriptSegment]:
+    with resources.stage(job_id, "transcription") as threads:
+        report(threads=threads)
+        return run_transcription(
+            audio_path,
+            model_name=model_name,
+            language=options.language,
+            beam_size=options.whisper_beam_size,
+            cancel_check=token.check,
+        )
+
+
+def _redecode(
+    job_id: str,
+    audio_path: str,
+    segments: List[TranscriptSegment],
+    options: PipelineOptions,
+    token: CancelToken,
+    resources: ResourceManager,
+) -> Tuple[List[TranscriptSegment], Dict]:
+    """Re-decode low-confidence segments; returns merged segments and stats."""
+    spans = select_redecode_spans(segments, logprob_threshold=options.redecode_logprob)
+    redecoded: List[TranscriptSegment] = []
+    if spans:
+        with resources.stage(job_id, "transcription"):
+            redecoded = redecode_spans(
+                audio_path,
+                spans,
+                context=segments,
+                model_name=options.redecode_model,
+                language=options.language,
+                beam_size=options.beam_size,
+                cancel_check=token.check,
+            )
+    redecoded_seconds = sum(end - start for start, end in spans)
+    audio_seconds = max((seg.end for seg in segments), default=0.0)
+    stats = {
+        "model": options.redecode_model,
+        "logprob_threshold": options.redecode_logprob,
+        "spans": len(spans),
+        "segments": len(segments),
+        "redecoded_seconds": round(redecoded_seconds, 3),
+        "audio_seconds": round(audio_seconds, 3),
+        "redecoded_fraction": round(redecoded_seconds / audio_seconds, 4) if audio_seconds else 0.0,
+    }
+    return merge_redecoded(segments, spans, redecoded), stats
+
+
+def _diarize(
+    job_id: str,
+    audio_path: str,
+    options: PipelineOptions,
+    token: CancelToken,
+    report: ProgressReporter,
+    resources: ResourceManager,
+) -> List[SpeakerSegment]:
+    with resources.stage(job_id, "diarization") as threads:
+        report(threads=threads)
+        return run_diarization(
+            audio_path,
+            num_speakers=options.num_speakers,
+            min_speakers=options.min_speakers,
+            max_speakers=options.max_speakers,
+            use_exclusive=options.exclusive,
+            window_seconds=options.diarization_window or None,
+            overlap_seconds=DIARIZATION_OVERLAP,
+            cancel_check=token.check,
+        )
+
+
+def _assemble(
+    job_id: str,
+    diarization_segments: List[SpeakerSegment],
+    transcription_segments: List[TranscriptSegment],
+    token: CancelToken,
+    report: ProgressReporter,
+    resources: ResourceManager,
+    quality: str = "final",
+    redecode_stats: Optional[Dict] = None,
+) -> Dict:
+    """Alignment, role inference and result document."""
+    token.check()
+    report(step="alignment")
+    with resources.stage(job_id, "alignment"):
+        utterances = align_transcript_with_speakers(diarization_segments, transcription_segments)
+        utterances = merge_tiny_speakers(utterances, min_total_duration=8.0)
+    token.check()
+    report(step="roles")
+    speaker_roles = infer_roles(utterances)
+    report(step="format")
+    result = build_result(utterances, speaker_roles, quality=quality)
+    if redecode_stats is not None:
+        result["redecode"] = redecode_stats
+    return result
+
+
+def run_pipeline(
+    job_id: str,
+    audio_file: str,
+    options: PipelineOptions,
+    token: CancelToken,
+    report: ProgressReporter,
+    resources: ResourceManager,
+) -> Dict:
+    """
+    Run load → Whisper → diarization → alignment → roles → result.
+
+    Returns the structured result (see result_format.build_result).
+    Raises JobCancelled if `token` is cancelled along the way.
+    """
+    if options.two_pass:
+        return _run_two_pass(job_id, audio_file, options, token, report, resources)
+
+    with resources.job(job_id):
+        # Step 1: Load audio - 10%
+        report(progress=10, step="load")
+        audio_path = load_audio(audio_file)
+
+        # Step 2: Whisper transcription - 20-40%
+        report(progress=20, step="transcription")
+        transcription_segments = _transcribe(
+            job_id, audio_path, options.model, options, token, report, resources
+        )
+        redecode_stats = None
+        if options.redecode_model:
+            report(progress=35, step="redecode")
+            transcription_segments, redecode_stats = _redecode(
+                job_id, audio_path, transcription_segments, options, token, resources
+            )
+        report(progress=40)
+
+        # Step 3: Speaker diarization - 40-70%
+        report(progress=45, step="diarization")
+        diarization_segments = _diarize(job_id, audio_path, options, token, report, resources)
+        report(progress=70)
+
+        # Step 4-6: Alignment, roles, format - 75-100%
+        report(progress=75)
+        return _assemble(
+            job_id, diarization_segments, transcription_segments, token, report, resources,
+            redecode_stats=redecode_stats,
+        )
+
+
+def _run_two_pass(
+    job_id: str,
+    audio_file: str,
+    options: PipelineOptions,
+    token: CancelToken,
+    report: ProgressReporter,
+    resources: ResourceManager,
+) -> Dict:
+    """Preview with `options.preview_model`, then the final pass with `options.model`."""
+    with resources.job(job_id):
+        # Step 1: Load audio - 5%
+        report(progress=5, step="load")
+        audio_path = load_audio(audio_file)
+
+        # Step 2: Preview transcription with the small model - 10-20%
+        report(progress=10, step="preview_transcription")
+        preview_segments = _transcribe(
+            job_id, audio_path, options.preview_model, options, token, report, resources
+        )
+
+        # Step 3: Speaker diarization, shared by both passes - 20-45%
+        report(progress=20, step="diarization")
+        diarization_segments = _diarize(job_id, audio_path, options, token, report, resources)
+
+        # Step 4: Publish the preview - 50%
+        report(progress=45)
+        preview = _assemble(
+            job_id, diarization_segments, preview_segments, token, report, resources, quality="preview"
+        )
+        report(progress=50, step="preview_ready", result=preview, quality="preview")
+
+        # Step 5: Final transcription with the large model - 55-90%
+        report(progress=55, step="transcription")
+        transcription_segments = _transcribe(
+            job_id, audio_path, options.model, options, token, report, resources
+        )
+        redecode_stats = None
+        if options.redecode_model:
+            report(progress=80, step="redecode")
+            transcription_segments, redecode_stats = _redecode(
+                job_id, audio_path, transcription_segments, options, token, resources
+            )
+
+        # Step 6: Alignment, roles, format - 90-100%
+        report(progress=90)
+        return _assemble(
+            job_id, diarization_segments, transcription_segments, token, report, resources,
+            redecode_stats=redecode_stats,
+        )
@@ -0,0 +1,198 @@
+"""
+CPU resource manager for concurrent transcription jobs.
+
+Whisper and pyannote both use Torch's intra-op thread pool, which by default
+spans every core. With several jobs in the thread pool they oversubscribe the
+CPU and all of them slow down. The manager sizes Torch's thread pool for the
+configured concurrency so that concurrent heavy stages never ask for more
+threads than there are cores, and, optionally, pins each job to its own cores.
+
+Torch's intra-op thread count is process-wide (MKL and OpenMP alike), so it is
+set once, before the first heavy stage, and never changed per job: changing it
+for one job would resize the pool under jobs that are already running.
+
+Modes:
+    throughput  Cores are split into `max_jobs` fixed slots and Torch uses one
+                slot's worth of threads. Concurrent jobs never compete for
+                cores (with pinning, each job stays on its slot). Best
+                aggregate throughput.
+    latency     Torch uses every core and heavy stages (transcription,
+                diarization) run one at a time, so each gets the whole
+                machine; light stages of other jobs run alongside. Best
+                single-job latency; with several jobs, their heavy stages
+                queue behind each other.
+
+Pinning is best-effort: it applies to the worker thread and the threads it
+spawns afterwards. OpenMP/MKL threads that Torch created earlier keep their
+mask, so the thread count above is what prevents oversubscription.
+
+Configuration (environment):
+    TRANSCRIPTION_MAX_WORKERS   Concurrent jobs (default: 2)
+    TRANSCRIPTION_CPU_MODE      "throughput" or "latency" (default: throughput)
+    TRANSCRIPTION_PIN_CORES     "1" to pin worker threads to their core set
+"""
+
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+MODES = ("throughput", "latency")
+
+# Stages that run Torch kernels; everything else is plain Python and gets 1 thread
+HEAVY_STAGES = {"transcription", "diarization"}
+
+
+def available_cores() -> List[int]:
+    """Cores this process may run on (respects cgroup/taskset restrictions)."""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+_TORCH_THREADS_LOCK = threading.Lock()
+_torch_threads: Optional[int] = None
+
+
+def _set_torch_threads(num_threads: int) -> int:
+    """
+    Set Torch's intra-op thread count once for the whole process.
+
+    The setting is process-wide, so only the first call takes effect; later
+    calls return the count already in use.
+    """
+    global _torch_threads
+    with _TORCH_THREADS_LOCK:
+        if _torch_threads is None:
+            try:
+                import torch
+            except ImportError:  # pragma: no cover
+                return num_threads
+            torch.set_num_threads(num_threads)
+            _torch_threads = num_threads
+            logging.info("Torch intra-op threads set to %d for this process", num_threads)
+        return _torch_threads
+
+
+def _set_affinity(cores: List[int]) -> Optional[set]:
+    """Pin the calling thread to `cores`; returns the previous affinity."""
+    if not hasattr(os, "sched_setaffinity"):
+        return None
+    previous = os.sched_getaffinity(0)
+    # pid 0 = calling thread on Linux; threads spawned later inherit the mask,
+    # threads that already exist (e.g. an OpenMP team) do not
+    os.sched_setaffinity(0, cores)
+    return previous
+
+
+class ResourceManager:
+    """Splits the available CPU cores between active jobs and their stages."""
+
+    def __init__(
+        self,
+        max_jobs: int = 2,
+        mode: str = "throughput",
+        pin_cores: bool = False,
+        cores: Optional[List[int]] = None,
+    ):
+        if mode not in MODES:
+            raise ValueError(f"Unknown CPU mode '{mode}', expected one of {MODES}")
+        self.max_jobs = max(1, max_jobs)
+        self.mode = mode
+        self.pin_cores = pin_cores
+        self.cores = cores or available_cores()
+
+        # Fixed, disjoint core slots for throughput mode
+        per_slot = max(1, len(self.cores) // self.max_jobs)
+        self._slots: List[List[int]] = [
+            self.cores[i * per_slot:(i + 1) * per_slot] or self.cores[-per_slot:]
+            for i in range(self.max_jobs)
+        ]
+        self._free_slots = list(range(self.max_jobs))
+        self._active: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        # Latency mode: heavy stages take turns, each with every core
+        self._heavy_turn = threading.Lock()
+
+        # Process-wide Torch pool size (see _set_torch_threads)
+        self.torch_threads = per_slot if mode == "throughput" else len(self.cores)
+
+        # Threads that OpenMP/MKL spawn before our first stage runs should not
+        # assume the whole machine either (torch is imported lazily after this).
+        os.environ.setdefault("OMP_NUM_THREADS", str(self.torch_threads))
+        os.environ.setdefault("MKL_NUM_THREADS", str(self.torch_threads))
+
+    @classmethod
+    def from_env(cls) -> "ResourceManager":
+        return cls(
+            max_jobs=int(os.environ.get("TRANSCRIPTION_MAX_WORKERS", "2")),
+            mode=os.environ.get("TRANSCRIPTION_CPU_MODE", "throughput"),
+            pin_cores=os.environ.get("TRANSCRIPTION_PIN_CORES", "0") == "1",
+        )
+
+    def _job_cores(self, job_id: str) -> List[int]:
+        """Core set a job may use right now."""
+        with self._lock:
+            if self.mode == "throughput":
+                return self._slots[self._active[job_id]]
+            # latency: heavy stages run one at a time on every core
+            return self.cores
+
+    @contextmanager
+    def job(self, job_id: str) -> Iterator[None]:
+        """Register a job as active for the duration of the block."""
+        with self._lock:
+            slot = self._free_slots.pop(0) if self._free_slots else len(self._active) % self.max_jobs
+            self._active[job_id] = slot
+        try:
+            yield
+        finally:
+            with self._lock:
+                slot = self._active.pop(job_id, None)
+                if slot is not None and slot not in self._free_slots and slot not in self._active.values():
+                    self._free_slots.append(slot)
+                    self._free_slots.sort()
+
+    @contextmanager
+    def stage(self, job_id: str, stage: str) -> Iterator[int]:
+        """
+        Pin the calling thread to the job's cores (if enabled) for one
+        pipeline stage. Yields the number of Torch threads the stage runs with.
+
+        In latency mode a heavy stage first waits for its turn, since its
+        Torch pool spans every core.
+        """
+        heavy = stage in HEAVY_STAGES
+        serialize = heavy and self.mode == "latency" and self.max_jobs > 1
+        if serialize:
+            self._heavy_turn.acquire()
+        try:
+            cores = self._job_cores(job_id)
+            # Set once on the first heavy stage (torch is imported lazily)
+            num_threads = _set_torch_threads(self.torch_threads) if heavy else 1
+            previous_affinity = _set_affinity(cores) if self.pin_cores else None
+            logging.info(
+                "Job %s stage '%s': %d thread(s)%s",
+                job_id, stage, num_threads, f" pinned to {cores}" if self.pin_cores else "",
+            )
+            try:
+                yield num_threads
+            finally:
+                if previous_affinity is not None:
+                    os.sched_setaffinity(0, previous_affinity)
+        finally:
+            if serialize:
+                self._heavy_turn.release()
+
+    def snapshot(self) -> Dict:
+        """Current allocation, for status endpoints."""
+        with self._lock:
+            return {
+                "mode": self.mode,
+                "cores": len(self.cores),
+                "max_jobs": self.max_jobs,
+                "pin_cores": self.pin_cores,
+                "torch_threads": _torch_threads,
+                "active_jobs": len(self._active),
+            }
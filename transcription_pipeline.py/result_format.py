@@ -0,0 +1,306 @@
+"""
+Structured transcription results and their renderings.
+
+A job's result is kept as one structured document with float timestamps
+and one record per utterance:
+
+    {
+        "version": 1,
+        "quality": "final",          # or "preview" (two-pass jobs, small model)
+        "duration": 1234.56,
+        "speakers": {"0": "Moderator", "1": "Team Red", ...},
+        "utterances": [
+            {"start": 0.0, "end": 16.24, "speaker_id": 0,
+             "role": "Moderator", "text": "..."},
+            ...
+        ]
+    }
+
+Text, SRT and VTT are rendered on request from that document. The columnar
+binary form packs the same data into contiguous little-endian arrays so
+consumers can map the columns without parsing (see `to_columnar`).
+"""
+
+import json
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+from typing import Dict, List, Optional
+
+from transcript_diarization_v2 import Utterance, format_time
+
+RESULT_VERSION = 1
+
+TEXT_FORMATS = {"text", "srt", "vtt"}
+RESULT_FORMATS = TEXT_FORMATS | {"json", "columnar"}
+
+# Columnar layout: magic, version, row count, roles-JSON length, text-blob length
+COLUMNAR_MAGIC = b"WGTR"
+_COLUMNAR_HEADER = struct.Struct("<4sHxxIII")
+
+
+def build_result(
+    utterances: List[Utterance], speaker_roles: Dict[int, str], quality: str = "final"
+) -> Dict:
+    """Build the structured result document from aligned utterances."""
+    utterances_sorted = sorted(utterances, key=lambda u: u.start)
+    duration = max(
+        ((u.end if u.end is not None else u.start) for u in utterances_sorted),
+        default=0.0,
+    )
+    return {
+        "version": RESULT_VERSION,
+        "quality": quality,
+        "duration": round(duration, 3),
+        "speakers": {str(sid): role for sid, role in sorted(speaker_roles.items())},
+        "utterances": [
+            {
+                "start": round(u.start, 3),
+                "end": round(u.end, 3) if u.end is not None else None,
+                "speaker_id": u.speaker_id,
+                "role": speaker_roles.get(u.speaker_id, "Unknown"),
+                "text": u.text,
+            }
+            for u in utterances_sorted
+        ],
+    }
+
+
+# -------------------------------------------------------------------------
+# Pagination over utterance start times
+# -------------------------------------------------------------------------
+def parse_time(value: str) -> float:
+    """Parse 'HH:MM:SS', 'MM:SS' or plain seconds into seconds."""
+    parts = value.strip().split(":")
+    if len(parts) > 3:
+        raise ValueError(f"Invalid time '{value}'")
+    try:
+        seconds = 0.0
+        for part in parts:
+            seconds = seconds * 60 + float(part)
+    except ValueError:
+        raise ValueError(f"Invalid time '{value}', expected HH:MM:SS, MM:SS or seconds")
+    if seconds < 0:
+        raise ValueError(f"Invalid time '{value}'")
+    return seconds
+
+
+def build_index(result: Dict) -> List[float]:
+    """Sorted utterance start times (utterances are stored in start order)."""
+    return [u["start"] for u in result["utterances"]]
+
+
+def slice_result(
+    result: Dict,
+    index: List[float],
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+    offset: int = 0,
+    limit: Optional[int] = None,
+) -> Dict:
+    """
+    Return a copy of `result` restricted to utterances starting in
+    [start, end), then to `limit` utterances from `offset` within that range.
+    Range boundaries are found by bisection over `index`.
+    """
+    lo = bisect_left(index, start) if start is not None else 0
+    hi = bisect_left(index, end) if end is not None else len(index)
+    hi = max(lo, hi)
+    first = min(lo + offset, hi)
+    last = hi if limit is None else min(first + limit, hi)
+    sliced = dict(result)
+    sliced["utterances"] = result["utterances"][first:last]
+    sliced["page"] = {
+        "from": start,
+        "to": end,
+        "offset": offset,
+        "limit": limit,
+        "returned": last - first,
+        "matching": hi - lo,
+        "total": len(index),
+        "first_line": first,
+    }
+    return sliced
+
+
+# -------------------------------------------------------------------------
+# Text renderings
+# -------------------------------------------------------------------------
+def _speaker_label(utterance: Dict) -> str:
+    label = f"Speaker {utterance['speaker_id']}"
+    role = utterance.get("role")
+    if role and role != "Unknown":
+        return f"{label} ({role})"
+    return label
+
+
+def to_text(result: Dict) -> str:
+    """Render the classic one-line-per-utterance transcript (same as format_transcript)."""
+    utterances = result["utterances"]
+    if not utterances:
+        return ""
+    use_hours = result["duration"] >= 3600.0
+
+    lines: List[str] = []
+    for u in utterances:
+        start_str = format_time(u["start"], force_hours=use_hours)
+        if u["end"] is not None and u["end"] > u["start"] + 0.01:
+            end_str = format_time(u["end"], force_hours=use_hours)
+            time_part = f"{start_str}–{end_str} "
+        else:
+            time_part = f"{start_str} "
+        text_escaped = u["text"].replace('"', '\\"')
+        lines.append(f"{time_part}{_speaker_label(u)}: \"{text_escaped}\"")
+    return "\n".join(lines)
+
+
+def _subtitle_time(seconds: float, separator: str) -> str:
+    millis = max(0, int(round(seconds * 1000)))
+    hours, millis = divmod(millis, 3_600_000)
+    minutes, millis = divmod(millis, 60_000)
+    secs, millis = divmod(millis, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}{separator}{millis:03d}"
+
+
+def _cue_end(utterance: Dict) -> float:
+    end = utterance["end"]
+    return end if end is not None and end > utterance["start"] else utterance["start"] + 1.0
+
+
+def to_srt(result: Dict) -> str:
+    """Render SubRip subtitles."""
+    blocks = []
+    for index, u in enumerate(result["utterances"], start=1):
+        start = _subtitle_time(u["start"], ",")
+        end = _subtitle_time(_cue_end(u), ",")
+        blocks.append(f"{index}\n{start} --> {end}\n{_speaker_label(u)}: {u['text']}\n")
+    return "\n".join(blocks)
+
+
+def to_vtt(result: Dict) -> str:
+    """Render WebVTT subtitles (speaker as voice span)."""
+    blocks = ["WEBVTT\n"]
+    for u in result["utterances"]:
+        start = _subtitle_time(u["start"], ".")
+        end = _subtitle_time(_cue_end(u), ".")
+        blocks.append(f"{start} --> {end}\n<v {_speaker_label(u)}>{u['text']}\n")
+    return "\n".join(blocks)
+
+
+def render(result: Dict, fmt: str) -> str:
+    """Render a structured result as text, srt or vtt."""
+    if fmt == "text":
+        return to_text(result)
+    if fmt == "srt":
+        return to_srt(result)
+    if fmt == "vtt":
+        return to_vtt(result)
+    raise ValueError(f"Unknown text format '{fmt}', expected one of {sorted(TEXT_FORMATS)}")
+
+
+# -------------------------------------------------------------------------
+# Columnar binary form
+# -------------------------------------------------------------------------
+def _little_endian(column: array) -> bytes:
+    if sys.byteorder != "little":
+        column = array(column.typecode, column)
+        column.byteswap()
+    return column.tobytes()
+
+
+def to_columnar(result: Dict) -> bytes:
+    """
+    Pack a result into a compact columnar buffer.
+
+    Layout (little-endian):
+        header      magic "WGTR", version u16, rows u32, roles_len u32, text_len u32
+        start       float64[rows]
+        end         float64[rows]   (NaN where the end is unknown)
+        speaker_id  int32[rows]
+        text_off    uint32[rows + 1] byte offsets into the text blob
+        roles       UTF-8 JSON object {speaker_id: role}
+        text        UTF-8 blob of all utterance texts
+    """
+    utterances = result["utterances"]
+    starts = array("d", (u["start"] for u in utterances))
+    ends = array("d", (u["end"] if u["end"] is not None else float("nan") for u in utterances))
+    speaker_ids = array("i", (u["speaker_id"] for u in utterances))
+
+    encoded = [u["text"].encode("utf-8") for u in utterances]
+    offsets = array("I", [0])
+    for chunk in encoded:
+        offsets.append(offsets[-1] + len(chunk))
+    text_blob = b"".join(encoded)
+    roles = json.dumps(result["speakers"], ensure_ascii=False).encode("utf-8")
+
+    header = _COLUMNAR_HEADER.pack(
+        COLUMNAR_MAGIC, RESULT_VERSION, len(utterances), len(roles), len(text_blob)
+    )
+    return b"".join([
+        header,
+        _little_endian(starts),
+        _little_endian(ends),
+        _little_endian(speaker_ids),
+        _little_endian(offsets),
+        roles,
+        text_blob,
+    ])
+
+
+def from_columnar(buffer: bytes) -> Dict:
+    """
+    Open a columnar buffer without copying the numeric columns.
+
+    Returns memoryviews for `start`, `end`, `speaker_id` and `text_offsets`
+    (on little-endian hosts), the role map, and the raw text blob.
+    """
+    view = memoryview(buffer)
+    magic, version, rows, roles_len, text_len = _COLUMNAR_HEADER.unpack_from(view)
+    if magic != COLUMNAR_MAGIC:
+        raise ValueError("Not a columnar transcript buffer")
+
+    def column(offset: int, typecode: str, count: int, itemsize: int):
+        chunk = view[offset:offset + count * itemsize]
+        if sys.byteorder != "little":
+            swapped = array(typecode, chunk.tobytes())
+            swapped.byteswap()
+            return memoryview(swapped)
+        return chunk.cast(typecode)
+
+    offset = _COLUMNAR_HEADER.size
+    starts = column(offset, "d", rows, 8)
+    offset += rows * 8
+    ends = column(offset, "d", rows, 8)
+    offset += rows * 8
+    speaker_ids = column(offset, "i", rows, 4)
+    offset += rows * 4
+    text_offsets = column(offset, "I", rows + 1, 4)
+    offset += (rows + 1) * 4
+    roles = json.loads(bytes(view[offset:offset + roles_len]).decode("utf-8"))
+    offset += roles_len
+
+    return {
+        "version": version,
+        "rows": rows,
+        "start": starts,
+        "end": ends,
+        "speaker_id": speaker_ids,
+        "text_offsets": text_offsets,
+        "speakers": roles,
+        "text": view[offset:offset + text_len],
+    }
+
+
+def columnar_text(columns: Dict, row: int) -> str:
+    """Decode the text of one row from an opened columnar buffer."""
+    offsets = columns["text_offsets"]
+    return bytes(columns["text"][offsets[row]:offsets[row + 1]]).decode("utf-8")
+
+
+def parse_format(fmt: Optional[str]) -> str:
+    """Normalize and validate a requested result format."""
+    fmt = (fmt or "text").lower()
+    if fmt not in RESULT_FORMATS:
+        raise ValueError(f"Unknown format '{fmt}', expected one of {sorted(RESULT_FORMATS)}")
+    return fmt
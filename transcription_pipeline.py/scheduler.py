@@ -0,0 +1,196 @@
+"""
+Job scheduler for the transcription service.
+
+Jobs wait in a priority queue and are dispatched to the thread pool only when
+a worker slot is free, so a short interactive clip does not queue behind a
+multi-hour session inside the executor.
+
+Ordering (first dispatched first):
+    1. higher `priority`
+    2. with policy "sjf": shorter probed audio duration
+    3. submission order
+
+Under "sjf" a job that has waited longer than `starvation_seconds` is
+dispatched next regardless of its length, so long sessions cannot starve.
+
+Cancellation is cooperative: every job gets a `CancelToken`; the pipeline
+checks it between stages, between Whisper decoding windows and inside the
+pyannote progress hook, and raises `JobCancelled` to unwind (releasing its
+core slot and temp file on the way out). Queued jobs are simply dropped.
+
+Configuration (environment):
+    TRANSCRIPTION_SCHEDULING        "priority" or "sjf" (default: sjf)
+    TRANSCRIPTION_STARVATION_SECONDS  Max wait before a job jumps the queue (default: 1800)
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import shutil
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+POLICIES = ("priority", "sjf")
+
+
+class JobCancelled(Exception):
+    """Raised inside a running job once it has been cancelled."""
+
+
+class CancelToken:
+    """Thread-safe cancellation flag shared between the API and a worker thread."""
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self) -> None:
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def check(self) -> None:
+        """Raise JobCancelled if the job has been cancelled."""
+        if self._event.is_set():
+            raise JobCancelled()
+
+
+@dataclass(order=True)
+class _Entry:
+    sort_key: Tuple
+    job_id: str = field(compare=False)
+    submitted_at: float = field(compare=False)
+    run: Callable[[CancelToken], Awaitable[None]] = field(compare=False)
+    token: CancelToken = field(compare=False)
+    removed: bool = field(default=False, compare=False)
+
+
+async def probe_duration(path: str) -> Optional[float]:
+    """Audio duration in seconds via ffprobe, or None if it cannot be determined."""
+    if shutil.which("ffprobe") is None:
+        return None
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            "ffprobe", "-v", "error", "-show_entries", "format=duration",
+            "-of", "default=noprint_wrappers=1:nokey=1", path,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+        )
+        stdout, _ = await asyncio.wait_for(proc.communicate(), timeout=30)
+        return float(stdout.decode().strip())
+    except (asyncio.TimeoutError, ValueError, OSError):
+        return None
+
+
+class JobScheduler:
+    """Priority / shortest-audio-first dispatcher with cancellation."""
+
+    def __init__(self, max_running: int, policy: str = "sjf", starvation_seconds: float = 1800.0):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown scheduling policy '{policy}', expected one of {POLICIES}")
+        self.max_running = max(1, max_running)
+        self.policy = policy
+        self.starvation_seconds = starvation_seconds
+        self._heap: List[_Entry] = []
+        self._queued: Dict[str, _Entry] = {}
+        self._running: Dict[str, CancelToken] = {}
+        self._seq = itertools.count()
+
+    @classmethod
+    def from_env(cls, max_running: int) -> "JobScheduler":
+        return cls(
+            max_running=max_running,
+            policy=os.environ.get("TRANSCRIPTION_SCHEDULING", "sjf"),
+            starvation_seconds=float(os.environ.get("TRANSCRIPTION_STARVATION_SECONDS", "1800")),
+        )
+
+    def submit(
+        self,
+        job_id: str,
+        run: Callable[[CancelToken], Awaitable[None]],
+        priority: int = 0,
+        duration: Optional[float] = None,
+    ) -> None:
+        """Queue a job; `run(token)` is awaited once a slot is free."""
+        length = duration if duration is not None else float("inf")
+        sort_key = (-priority, length if self.policy == "sjf" else 0.0, next(self._seq))
+        entry = _Entry(sort_key, job_id, time.monotonic(), run, CancelToken())
+        heapq.heappush(self._heap, entry)
+        self._queued[job_id] = entry
+        self._dispatch()
+
+    def cancel(self, job_id: str) -> Optional[str]:
+        """
+        Cancel a job. Returns "cancelled" for a queued job (dropped at once),
+        "cancelling" for a running job (stops at its next check), or None if
+        the scheduler does not know the job.
+        """
+        entry = self._queued.pop(job_id, None)
+        if entry is not None:
+            entry.removed = True
+            return "cancelled"
+        token = self._running.get(job_id)
+        if token is not None:
+            token.cancel()
+            return "cancelling"
+        return None
+
+    def queue_position(self, job_id: str) -> Optional[int]:
+        """1-based position in dispatch order, or None if not queued."""
+        entry = self._queued.get(job_id)
+        if entry is None:
+            return None
+        ahead = sum(1 for other in self._queued.values() if other.sort_key < entry.sort_key)
+        return ahead + 1
+
+    def snapshot(self) -> Dict:
+        return {
+            "policy": self.policy,
+            "running": len(self._running),
+            "queued": len(self._queued),
+            "max_running": self.max_running,
+        }
+
+    def _pop_next(self) -> Optional[_Entry]:
+        while self._heap and self._heap[0].removed:
+            heapq.heappop(self._heap)
+        if not self._heap:
+            return None
+
+        if self.policy == "sjf":
+            now = time.monotonic()
+            starving = [
+                e for e in self._queued.values()
+                if now - e.submitted_at > self.starvation_seconds
+            ]
+            if starving:
+                entry = min(starving, key=lambda e: e.submitted_at)
+                entry.removed = True
+                del self._queued[entry.job_id]
+                return entry
+
+        entry = heapq.heappop(self._heap)
+        del self._queued[entry.job_id]
+        return entry
+
+    def _dispatch(self) -> None:
+        while len(self._running) < self.max_running:
+            entry = self._pop_next()
+            if entry is None:
+                return
+            self._running[entry.job_id] = entry.token
+            asyncio.create_task(self._run(entry))
+
+    async def _run(self, entry: _Entry) -> None:
+        try:
+            await entry.run(entry.token)
+        except Exception:
+            logging.exception("Job %s crashed in the scheduler", entry.job_id)
+        finally:
+            self._running.pop(entry.job_id, None)
+            self._dispatch()
@@ -30,47 +30,60 @@ import argparse
 import logging
 import math
 import os
+import subprocess
 import sys
+import threading
 from dataclasses import dataclass
-from typing import Dict, List, Optional
-
-import numpy as np  # pyannote.audio 4.x expects NumPy >= 1.23; NumPy 2.x is fine.
-
-# ASR (Whisper)
-try:
-    import whisper
-except ImportError as exc:  # pragma: no cover
-    print(
-        "Error: The 'openai-whisper' package is not installed.\n"
-        "Install it with:\n"
-        "    pip install openai-whisper\n",
-        file=sys.stderr,
-    )
-    raise
-
-# Diarization (pyannote.audio 4.x + community-1)
-try:
-    from pyannote.audio import Pipeline
-except ImportError as exc:  # pragma: no cover
-    print(
-        "Error: The 'pyannote.audio' package is not installed.\n"
-        "Install it with:\n"
-        "    pip install pyannote.audio\n",
-        file=sys.stderr,
-    )
-    raise
-
-# Audio-Loading für community-1
-try:
-    import torchaudio
-except ImportError:
-    print(
-        "Error: 'torchaudio' ist nicht installiert.\n"
-        "Installiere es im aktuellen Environment z.B. mit:\n"
-        "    pip install torchaudio\n",
-        file=sys.stderr,
-    )
-    raise
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Heavy dependencies (whisper, pyannote.audio, torchaudio, torch) are imported
+# lazily on first use so that importing this module stays cheap. The service
+# imports it at startup and loads models in the background (see `warmup`).
+
+
+def _import_whisper():
+    """Import Whisper (ASR) on first use."""
+    try:
+        import whisper
+    except ImportError:  # pragma: no cover
+        print(
+            "Error: The 'openai-whisper' package is not installed.\n"
+            "Install it with:\n"
+            "    pip install openai-whisper\n",
+            file=sys.stderr,
+        )
+        raise
+    return whisper
+
+
+def _import_pyannote_pipeline():
+    """Import the pyannote.audio Pipeline class (diarization) on first use."""
+    try:
+        from pyannote.audio import Pipeline
+    except ImportError:  # pragma: no cover
+        print(
+            "Error: The 'pyannote.audio' package is not installed.\n"
+            "Install it with:\n"
+            "    pip install pyannote.audio\n",
+            file=sys.stderr,
+        )
+        raise
+    return Pipeline
+
+
+def _import_torchaudio():
+    """Import torchaudio (audio loading for community-1) on first use."""
+    try:
+        import torchaudio
+    except ImportError:  # pragma: no cover
+        print(
+            "Error: 'torchaudio' ist nicht installiert.\n"
+            "Installiere es im aktuellen Environment z.B. mit:\n"
+            "    pip install torchaudio\n",
+            file=sys.stderr,
+        )
+        raise
+    return torchaudio
 
 
 # -------------------------------------------------------------------------
@@ -88,6 +101,10 @@ class TranscriptSegment:
     start: float
     end: float
     text: str
+    # Whisper's per-segment confidence signals (None if unknown)
+    avg_logprob: Optional[float] = None
+    no_speech_prob: Optional[float] = None
+    compression_ratio: Optional[float] = None
 
 
 @dataclass
@@ -119,6 +136,35 @@ def compute_overlap(a_start: float, a_end: float, b_start: float, b_end: float)
     return max(0.0, end - start)
 
 
+def _progress_hook(cancel_check: Optional[Callable[[], None]]):
+    """pyannote progress hook that lets `cancel_check` abort a running pipeline."""
+    if cancel_check is None:
+        return None
+
+    def hook(*args, **kwargs):
+        cancel_check()
+
+    return hook
+
+
+class _CancellableWhisperModel:
+    """
+    Proxy around a Whisper model that calls `cancel_check` before decoding
+    each 30-second window, so a cancelled job stops mid-transcription.
+    """
+
+    def __init__(self, model, cancel_check: Callable[[], None]):
+        self._model = model
+        self._cancel_check = cancel_check
+
+    def decode(self, *args, **kwargs):
+        self._cancel_check()
+        return self._model.decode(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._model, name)
+
+
 # -------------------------------------------------------------------------
 # 1. load_audio
 # -------------------------------------------------------------------------
@@ -159,12 +205,93 @@ def _get_hf_token() -> str:
     return token
 
 
+# -------------------------------------------------------------------------
+# 2a. Model cache — load once per process, reuse across jobs
+# -------------------------------------------------------------------------
+DIARIZATION_MODEL = "pyannote/speaker-diarization-community-1"
+
+_MODEL_LOCK = threading.Lock()
+_WHISPER_MODELS: Dict[str, object] = {}
+_DIARIZATION_PIPELINE = None
+_WARM_MODELS: set = set()
+
+# Cached models are not safe to run from several threads at once: Whisper's
+# decoder installs kv-cache hooks on the shared modules for each decode, and
+# pyannote keeps per-call state on the pipeline. Each model therefore has its
+# own inference lock; jobs on the same model take turns, different models
+# (e.g. preview and final Whisper, or Whisper and diarization) still overlap.
+_INFERENCE_LOCKS: Dict[str, threading.Lock] = {}
+
+
+def inference_lock(key: str) -> threading.Lock:
+    """Lock serializing inference on one cached model ("whisper:<name>" or "diarization")."""
+    with _MODEL_LOCK:
+        return _INFERENCE_LOCKS.setdefault(key, threading.Lock())
+
+
+def get_whisper_model(model_name: str):
+    """Return a cached Whisper model, loading it on first use."""
+    with _MODEL_LOCK:
+        model = _WHISPER_MODELS.get(model_name)
+        if model is None:
+            logging.info("Loading Whisper model '%s'...", model_name)
+            model = _import_whisper().load_model(model_name)
+            _WHISPER_MODELS[model_name] = model
+        return model
+
+
+def get_diarization_pipeline():
+    """Return the cached community-1 diarization pipeline, loading it on first use."""
+    global _DIARIZATION_PIPELINE
+    with _MODEL_LOCK:
+        if _DIARIZATION_PIPELINE is None:
+            logging.info("Loading diarization pipeline '%s'...", DIARIZATION_MODEL)
+            Pipeline = _import_pyannote_pipeline()
+            _DIARIZATION_PIPELINE = Pipeline.from_pretrained(
+                DIARIZATION_MODEL, token=_get_hf_token()
+            )
+        return _DIARIZATION_PIPELINE
+
+
+def warmup(model_name: str = "large-v3") -> None:
+    """
+    Load the Whisper model and the diarization pipeline and run one tiny
+    inference through each, so the first real job does not pay for model
+    loading, CUDA context creation or kernel compilation.
+    """
+    import numpy as np
+    import torch
+
+    model = get_whisper_model(model_name)
+    with inference_lock(f"whisper:{model_name}"):
+        model.transcribe(np.zeros(16000, dtype=np.float32), verbose=None, fp16=False)
+    _WARM_MODELS.add(f"whisper:{model_name}")
+
+    pipeline = get_diarization_pipeline()
+    with inference_lock("diarization"):
+        pipeline({"waveform": torch.zeros(1, 2 * 16000), "sample_rate": 16000})
+    _WARM_MODELS.add(f"diarization:{DIARIZATION_MODEL}")
+    logging.info("Warmup finished: %s", sorted(_WARM_MODELS))
+
+
+def model_status() -> Dict[str, object]:
+    """Report which models are loaded and which have been warmed up."""
+    return {
+        "whisper_loaded": sorted(_WHISPER_MODELS),
+        "diarization_loaded": _DIARIZATION_PIPELINE is not None,
+        "warm": sorted(_WARM_MODELS),
+    }
+
+
 def run_diarization(
     audio_path: str,
     num_speakers: Optional[int] = None,
     min_speakers: Optional[int] = None,
     max_speakers: Optional[int] = None,
     use_exclusive: bool = True,
+    window_seconds: Optional[float] = None,
+    overlap_seconds: float = 60.0,
+    cancel_check: Optional[Callable[[], None]] = None,
 ) -> List[SpeakerSegment]:
     """
     Run speaker diarization using pyannote `community-1`.
@@ -178,17 +305,36 @@ def run_diarization(
         If set, constrain the number of speakers.
     use_exclusive : bool
         If True, use `output.exclusive_speaker_diarization` when available.
+    window_seconds : Optional[float]
+        If set and the recording is longer, diarize in overlapping windows of
+        this length (see `run_diarization_windowed`) to cap peak memory.
+    overlap_seconds : float
+        Overlap between consecutive windows in windowed mode.
+    cancel_check : Optional[Callable[[], None]]
+        Called from pyannote's progress hook; raise from it to abort.
 
     Returns
     -------
     List[SpeakerSegment]
     """
+    if window_seconds:
+        info = _import_torchaudio().info(audio_path)
+        duration = info.num_frames / float(info.sample_rate)
+        if duration > window_seconds:
+            return run_diarization_windowed(
+                audio_path,
+                window_seconds=window_seconds,
+                overlap_seconds=overlap_seconds,
+                num_speakers=num_speakers,
+                min_speakers=min_speakers,
+                max_speakers=max_speakers,
+                use_exclusive=use_exclusive,
+                cancel_check=cancel_check,
+            )
+
     logging.info("Running Community-1 speaker diarization on '%s'...", audio_path)
 
-    token = _get_hf_token()
-    pipeline = Pipeline.from_pretrained(
-        "pyannote/speaker-diarization-community-1", token=token
-    )
+    pipeline = get_diarization_pipeline()
 
     kwargs = {}
     if num_speakers is not None:
@@ -199,11 +345,12 @@ def run_diarization(
         kwargs["max_speakers"] = max_speakers
 
     # Audio einmal komplett laden (Community-1 Model-Card zeigt dieses Muster)
-    waveform, sample_rate = torchaudio.load(audio_path)
+    waveform, sample_rate = _import_torchaudio().load(audio_path)
 
     # An Pipeline übergeben
     file_dict = {"waveform": waveform, "sample_rate": sample_rate}
-    output = pipeline(file_dict, **kwargs)
+    with inference_lock("diarization"):
+        output = pipeline(file_dict, hook=_progress_hook(cancel_check), **kwargs)
 
     # Exclusive diarization bevorzugen
     if use_exclusive and hasattr(output, "exclusive_speaker_diarization"):
@@ -232,12 +379,220 @@ def run_diarization(
     return segments
 
 
+# -------------------------------------------------------------------------
+# 2b. run_diarization_windowed — bounded memory for multi-hour recordings
+# -------------------------------------------------------------------------
+def _select_annotation(output, use_exclusive: bool):
+    if use_exclusive and hasattr(output, "exclusive_speaker_diarization"):
+        return output.exclusive_speaker_diarization
+    return output.speaker_diarization
+
+
+def _cosine_similarity(a, b):
+    import numpy as np
+
+    a = a / np.maximum(np.linalg.norm(a, axis=1, keepdims=True), 1e-9)
+    b = b / np.maximum(np.linalg.norm(b, axis=1, keepdims=True), 1e-9)
+    return a @ b.T
+
+
+def run_diarization_windowed(
+    audio_path: str,
+    window_seconds: float = 1800.0,
+    overlap_seconds: float = 60.0,
+    num_speakers: Optional[int] = None,
+    min_speakers: Optional[int] = None,
+    max_speakers: Optional[int] = None,
+    use_exclusive: bool = True,
+    link_threshold: float = 0.5,
+    cancel_check: Optional[Callable[[], None]] = None,
+) -> List[SpeakerSegment]:
+    """
+    Diarize a long recording in overlapping windows of bounded size.
+
+    Only one window of audio is in memory at a time, and pyannote clusters
+    each window separately, so peak memory and clustering cost depend on
+    `window_seconds`, not on the recording length.
+
+    Speakers are linked across windows by cosine similarity between each
+    window's speaker embeddings and running global speaker centroids
+    (weighted by speaking time). A local speaker whose best match is below
+    `link_threshold` becomes a new global speaker, unless `num_speakers`
+    global speakers already exist. If the pipeline exposes no embeddings,
+    speakers are linked one-to-one by their agreement inside the overlap
+    region (largest overlap first).
+
+    `num_speakers` only bounds each window from above, since not every
+    speaker talks in every window. For the same reason `min_speakers` is not
+    passed to the windows (it would force a window with fewer active
+    speakers to split real ones); it is checked against the linked result.
+
+    Each window owns the time span up to the middle of its overlaps with the
+    neighbouring windows; segments are clipped to that span so overlapping
+    regions are not emitted twice.
+
+    Returns
+    -------
+    List[SpeakerSegment]
+        One globally consistent segment list, sorted by start time.
+    """
+    import numpy as np
+
+    if overlap_seconds * 2 >= window_seconds:
+        raise ValueError("overlap_seconds must be less than half of window_seconds")
+
+    torchaudio = _import_torchaudio()
+    info = torchaudio.info(audio_path)
+    sample_rate = info.sample_rate
+    duration = info.num_frames / float(sample_rate)
+    step = window_seconds - overlap_seconds
+
+    logging.info(
+        "Running windowed diarization on '%s' (%.0fs, windows of %.0fs, overlap %.0fs)...",
+        audio_path, duration, window_seconds, overlap_seconds,
+    )
+
+    pipeline = get_diarization_pipeline()
+    # Not every speaker talks in every window: treat a global count as an upper bound
+    kwargs = {}
+    speaker_cap = num_speakers or max_speakers
+    if speaker_cap is not None:
+        kwargs["max_speakers"] = speaker_cap
+
+    centroids: List = []          # global speaker id -> embedding sum
+    segments: List[SpeakerSegment] = []
+    window_start = 0.0
+
+    while window_start < duration:
+        if cancel_check is not None:
+            cancel_check()
+        window_end = min(window_start + window_seconds, duration)
+        waveform, _ = torchaudio.load(
+            audio_path,
+            frame_offset=int(window_start * sample_rate),
+            num_frames=int((window_end - window_start) * sample_rate),
+        )
+        with inference_lock("diarization"):
+            output = pipeline(
+                {"waveform": waveform, "sample_rate": sample_rate},
+                hook=_progress_hook(cancel_check),
+                **kwargs,
+            )
+        del waveform
+
+        annotation = _select_annotation(output, use_exclusive)
+        labels = list(output.speaker_diarization.labels())
+        local = [
+            (float(seg.start) + window_start, float(seg.end) + window_start, label)
+            for seg, _, label in annotation.itertracks(yield_label=True)
+        ]
+        speaking_time: Dict[str, float] = {}
+        for start, end, label in local:
+            speaking_time[label] = speaking_time.get(label, 0.0) + (end - start)
+
+        # --- link local speakers to global ids ---
+        mapping: Dict[str, int] = {}
+        embeddings = getattr(output, "speaker_embeddings", None)
+        linkable = all(c is not None for c in centroids)
+        if embeddings is not None and len(labels) == len(embeddings) and linkable:
+            embeddings = np.asarray(embeddings, dtype=np.float64)
+            used_global = set()
+            if centroids:
+                similarity = _cosine_similarity(embeddings, np.stack(centroids))
+                pairs = sorted(
+                    ((similarity[i, j], i, j) for i in range(len(labels)) for j in range(len(centroids))),
+                    reverse=True,
+                )
+                for score, i, j in pairs:
+                    if labels[i] in mapping or j in used_global or score < link_threshold:
+                        continue
+                    mapping[labels[i]] = j
+                    used_global.add(j)
+            for i, label in enumerate(labels):
+                if label not in mapping:
+                    if speaker_cap is not None and len(centroids) >= speaker_cap:
+                        # Closest global speaker not yet taken in this window; only
+                        # if the window has more speakers than the cap do two fold
+                        similarity = _cosine_similarity(embeddings[i:i + 1], np.stack(centroids))[0]
+                        free = [j for j in range(len(centroids)) if j not in used_global]
+                        candidates = free or range(len(centroids))
+                        mapping[label] = max(candidates, key=lambda j: similarity[j])
+                    else:
+                        mapping[label] = len(centroids)
+                        centroids.append(np.zeros_like(embeddings[i]))
+                    used_global.add(mapping[label])
+                weight = speaking_time.get(label, 0.0)
+                centroids[mapping[label]] = centroids[mapping[label]] + weight * embeddings[i]
+        else:
+            # Fallback: vote by overlap with already-labelled segments in the overlap
+            # region, then assign greedily so no two local speakers share a global id
+            previous = [p for p in segments if p.end > window_start]
+            votes: Dict[Tuple[str, int], float] = {}
+            for start, end, label in local:
+                if start >= window_start + overlap_seconds:
+                    continue
+                for prev in previous:
+                    overlap = compute_overlap(start, end, prev.start, prev.end)
+                    if overlap > 0:
+                        key = (label, prev.speaker_id)
+                        votes[key] = votes.get(key, 0.0) + overlap
+            used_global = set()
+            for (label, speaker_id), _ in sorted(votes.items(), key=lambda kv: kv[1], reverse=True):
+                if label in mapping or speaker_id in used_global:
+                    continue
+                mapping[label] = speaker_id
+                used_global.add(speaker_id)
+            for label in labels:
+                if label not in mapping:
+                    mapping[label] = len(centroids)
+                    centroids.append(None)
+
+        # --- keep only the part of the window this window owns ---
+        own_start = window_start + overlap_seconds / 2 if window_start > 0 else 0.0
+        own_end = window_end - overlap_seconds / 2 if window_end < duration else duration
+        for start, end, label in local:
+            start, end = max(start, own_start), min(end, own_end)
+            if end > start:
+                segments.append(SpeakerSegment(start=start, end=end, speaker_id=mapping[label]))
+
+        logging.info(
+            "Window %.0f–%.0fs: %d local speaker(s), %d global so far.",
+            window_start, window_end, len(labels), len(centroids),
+        )
+        if window_end >= duration:
+            break
+        window_start += step
+
+    # Renumber global speakers in order of first appearance
+    segments.sort(key=lambda s: s.start)
+    renumber: Dict[int, int] = {}
+    for seg in segments:
+        if seg.speaker_id not in renumber:
+            renumber[seg.speaker_id] = len(renumber)
+        seg.speaker_id = renumber[seg.speaker_id]
+
+    logging.info(
+        "Windowed diarization produced %d segments, %d unique speakers.",
+        len(segments), len(renumber),
+    )
+    if min_speakers is not None and len(renumber) < min_speakers:
+        logging.warning(
+            "Windowed diarization linked only %d speaker(s), fewer than min_speakers=%d; "
+            "consider a lower link_threshold or a longer window.",
+            len(renumber), min_speakers,
+        )
+    return segments
+
+
 # -------------------------------------------------------------------------
 # 3. run_transcription — Whisper (default: large-v3 if available)
 # -------------------------------------------------------------------------
 def run_transcription(
     audio_path: str,
     model_name: str = "large-v3",
+    language: Optional[str] = None,
+    beam_size: Optional[int] = None,
+    cancel_check: Optional[Callable[[], None]] = None,
 ) -> List[TranscriptSegment]:
     """
     Run Whisper transcription.
@@ -247,32 +602,188 @@ def run_transcription(
     audio_path : str
     model_name : str
         Whisper model name: tiny, base, small, medium, large, large-v2, large-v3, ...
+    language : Optional[str]
+        ISO language code (e.g. "de"). If unset, Whisper detects the language.
+    beam_size : Optional[int]
+        If set, use beam search with this many beams; otherwise greedy decoding.
+    cancel_check : Optional[Callable[[], None]]
+        Called before each 30-second decoding window; raise from it to abort.
 
     Returns
     -------
     List[TranscriptSegment]
     """
-    logging.info("Loading Whisper model '%s'...", model_name)
-    model = whisper.load_model(model_name)
+    model = get_whisper_model(model_name)
 
     logging.info("Running transcription on '%s'...", audio_path)
     # fp16=False ensures CPU compatibility; set True manually for GPU with float16.
-    result = model.transcribe(audio_path, verbose=False, fp16=False)
+    decode_options = {}
+    if language is not None:
+        decode_options["language"] = language
+    if beam_size is not None:
+        decode_options["beam_size"] = beam_size
+    if cancel_check is not None:
+        model = _CancellableWhisperModel(model, cancel_check)
+    whisper = _import_whisper()
+    with inference_lock(f"whisper:{model_name}"):
+        result = whisper.transcribe(model, audio_path, verbose=False, fp16=False, **decode_options)
+
+    segments = _segments_from_whisper(result)
+    logging.info("Transcription produced %d segments.", len(segments))
+    return segments
 
+
+def _segments_from_whisper(result: Dict, offset: float = 0.0) -> List[TranscriptSegment]:
+    """Convert Whisper's segment dicts, shifting timestamps by `offset` seconds."""
     segments: List[TranscriptSegment] = []
     for seg in result.get("segments", []):
         segments.append(
             TranscriptSegment(
-                start=float(seg["start"]),
-                end=float(seg["end"]),
+                start=offset + float(seg["start"]),
+                end=offset + float(seg["end"]),
                 text=str(seg["text"]).strip(),
+                avg_logprob=seg.get("avg_logprob"),
+                no_speech_prob=seg.get("no_speech_prob"),
+                compression_ratio=seg.get("compression_ratio"),
             )
         )
+    return segments
 
-    logging.info("Transcription produced %d segments.", len(segments))
+
+# -------------------------------------------------------------------------
+# 3b. Selective re-decoding of low-confidence segments
+# -------------------------------------------------------------------------
+# Whisper's own fallback thresholds (see whisper.transcribe)
+LOGPROB_THRESHOLD = -1.0
+COMPRESSION_RATIO_THRESHOLD = 2.4
+NO_SPEECH_THRESHOLD = 0.6
+WHISPER_SAMPLE_RATE = 16000
+
+
+def is_low_confidence(
+    segment: TranscriptSegment,
+    logprob_threshold: float = LOGPROB_THRESHOLD,
+    compression_ratio_threshold: float = COMPRESSION_RATIO_THRESHOLD,
+    no_speech_threshold: float = NO_SPEECH_THRESHOLD,
+) -> bool:
+    """
+    True if Whisper was unsure about a segment: low average log-probability,
+    repetitive output (high compression ratio), or text where Whisper
+    thought there was no speech (a typical hallucination).
+    """
+    if segment.avg_logprob is not None and segment.avg_logprob < logprob_threshold:
+        return True
+    if segment.compression_ratio is not None and segment.compression_ratio > compression_ratio_threshold:
+        return True
+    if segment.no_speech_prob is not None and segment.no_speech_prob > no_speech_threshold:
+        return True
+    return False
+
+
+def select_redecode_spans(
+    segments: List[TranscriptSegment],
+    logprob_threshold: float = LOGPROB_THRESHOLD,
+    padding: float = 0.5,
+) -> List[Tuple[float, float]]:
+    """
+    Time ranges to re-decode: runs of consecutive low-confidence segments,
+    padded by `padding` seconds but never into a neighbouring segment that
+    is kept, so no confident speech is transcribed twice.
+    """
+    spans: List[Tuple[float, float]] = []
+    i = 0
+    while i < len(segments):
+        if not is_low_confidence(segments[i], logprob_threshold):
+            i += 1
+            continue
+        j = i
+        while j + 1 < len(segments) and is_low_confidence(segments[j + 1], logprob_threshold):
+            j += 1
+        lower = segments[i - 1].end if i > 0 else 0.0
+        start = max(lower, segments[i].start - padding)
+        end = segments[j].end + padding
+        if j + 1 < len(segments):
+            end = min(end, segments[j + 1].start)
+        spans.append((start, max(end, segments[j].end)))
+        i = j + 1
+    return spans
+
+
+def _load_audio_span(audio_path: str, start: float, end: float):
+    """Decode [start, end) of a file to 16 kHz mono float32 via ffmpeg."""
+    import numpy as np
+
+    cmd = [
+        "ffmpeg", "-nostdin", "-loglevel", "error",
+        "-ss", f"{start:.3f}", "-t", f"{end - start:.3f}", "-i", audio_path,
+        "-f", "s16le", "-ac", "1", "-ar", str(WHISPER_SAMPLE_RATE), "-",
+    ]
+    raw = subprocess.run(cmd, capture_output=True, check=True).stdout
+    return np.frombuffer(raw, np.int16).flatten().astype(np.float32) / 32768.0
+
+
+def redecode_spans(
+    audio_path: str,
+    spans: List[Tuple[float, float]],
+    context: List[TranscriptSegment],
+    model_name: str = "large-v3",
+    language: Optional[str] = None,
+    beam_size: Optional[int] = 5,
+    cancel_check: Optional[Callable[[], None]] = None,
+) -> List[TranscriptSegment]:
+    """
+    Transcribe only `spans` of the recording with `model_name` / beam search.
+
+    Each span is decoded on its own, prompted with the text just before it
+    (from `context`) so names and terms stay consistent. Only the span's
+    audio is decoded, so memory stays bounded for long recordings.
+    """
+    model = get_whisper_model(model_name)
+    if cancel_check is not None:
+        model = _CancellableWhisperModel(model, cancel_check)
+    whisper = _import_whisper()
+
+    decode_options = {"condition_on_previous_text": False}
+    if language is not None:
+        decode_options["language"] = language
+    if beam_size is not None:
+        decode_options["beam_size"] = beam_size
+
+    segments: List[TranscriptSegment] = []
+    for start, end in spans:
+        if cancel_check is not None:
+            cancel_check()
+        previous = " ".join(seg.text for seg in context if seg.end <= start)[-200:]
+        clip = _load_audio_span(audio_path, start, end)
+        if clip.size == 0:
+            continue
+        with inference_lock(f"whisper:{model_name}"):
+            result = whisper.transcribe(
+                model, clip, verbose=False, fp16=False, initial_prompt=previous or None, **decode_options
+            )
+        segments.extend(
+            seg for seg in _segments_from_whisper(result, offset=start) if seg.start < end
+        )
+
+    logging.info("Re-decoded %d span(s) into %d segments.", len(spans), len(segments))
     return segments
 
 
+def merge_redecoded(
+    segments: List[TranscriptSegment],
+    spans: List[Tuple[float, float]],
+    redecoded: List[TranscriptSegment],
+) -> List[TranscriptSegment]:
+    """Replace every segment whose midpoint lies in a span by the re-decoded ones."""
+
+    def in_span(seg: TranscriptSegment) -> bool:
+        mid = (seg.start + seg.end) / 2
+        return any(start <= mid < end for start, end in spans)
+
+    kept = [seg for seg in segments if not in_span(seg)]
+    return sorted(kept + redecoded, key=lambda seg: seg.start)
+
+
 # -------------------------------------------------------------------------
 # 4. align_transcript_with_speakers
 # -------------------------------------------------------------------------
@@ -580,6 +1091,24 @@ def parse_args() -> argparse.Namespace:
         default="large-v3",
         help="Whisper model name (e.g. tiny, base, small, medium, large, large-v2, large-v3).",
     )
+    parser.add_argument(
+        "--language",
+        type=str,
+        default=None,
+        help="Spoken language (ISO code, e.g. de). If unset, Whisper auto-detects.",
+    )
+    parser.add_argument(
+        "--beam-size",
+        type=int,
+        default=None,
+        help="Use beam search with this many beams instead of greedy decoding.",
+    )
+    parser.add_argument(
+        "--redecode-model",
+        type=str,
+        default=None,
+        help="Re-decode low-confidence segments with this Whisper model and beam search.",
+    )
     parser.add_argument(
         "--num-speakers",
         type=int,
@@ -598,6 +1127,12 @@ def parse_args() -> argparse.Namespace:
         default=None,
         help="Upper bound on number of speakers.",
     )
+    parser.add_argument(
+        "--diarization-window",
+        type=float,
+        default=None,
+        help="Diarize recordings longer than this many seconds in overlapping windows (bounded memory).",
+    )
     parser.add_argument(
         "--no-exclusive",
         action="store_true",
@@ -633,6 +1168,7 @@ def main() -> None:
             min_speakers=args.min_speakers,
             max_speakers=args.max_speakers,
             use_exclusive=not args.no_exclusive,
+            window_seconds=args.diarization_window,
         )
     except Exception as exc:
         logging.error("Error during diarization: %s", exc)
@@ -640,8 +1176,27 @@ def main() -> None:
 
     try:
         transcription_segments = run_transcription(
-            audio_path, model_name=args.whisper_model
+            audio_path,
+            model_name=args.whisper_model,
+            language=args.language,
+            beam_size=args.beam_size,
         )
+        if args.redecode_model:
+            spans = select_redecode_spans(transcription_segments)
+            redecoded = redecode_spans(
+                audio_path,
+                spans,
+                context=transcription_segments,
+                model_name=args.redecode_model,
+                language=args.language,
+                beam_size=args.beam_size or 5,
+            )
+            transcription_segments = merge_redecoded(transcription_segments, spans, redecoded)
+            logging.info(
+                "Re-decoded %.1fs of audio in %d span(s).",
+                sum(end - start for start, end in spans),
+                len(spans),
+            )
     except Exception as exc:
         logging.error("Error during transcription: %s", exc)
         sys.exit(1)
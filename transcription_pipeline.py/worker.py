@@ -0,0 +1,172 @@
+"""
+Transcription worker for the shared job queue.
+
+Run any number of these (on one or several machines sharing the queue
+database and the spool directory) to scale transcription horizontally:
+
+    TRANSCRIPTION_QUEUE_DB=/data/queue/jobs.db python worker.py
+
+Each worker warms up its models, then repeatedly claims the next job from
+the queue, runs the pipeline and writes progress and the result back. While
+a job runs, a heartbeat thread renews the job's lease and picks up
+cancellation requests. If a worker dies, its lease expires and the job is
+handed to another worker.
+
+Configuration (environment):
+    TRANSCRIPTION_QUEUE_DB              Path of the shared SQLite queue (required)
+    TRANSCRIPTION_WORKER_ID             Worker name (default: hostname-pid)
+    TRANSCRIPTION_WORKER_CONCURRENCY    Jobs run in parallel by this worker (default: 1)
+    TRANSCRIPTION_LEASE_SECONDS         Lease length; heartbeats every third (default: 60)
+    TRANSCRIPTION_POLL_INTERVAL         Seconds between polls of an empty queue (default: 2)
+"""
+
+import logging
+import os
+import socket
+import threading
+from typing import Optional
+
+from job_queue import SQLiteJobQueue
+from options import PipelineOptions
+from pipeline_runner import run_pipeline
+from resources import ResourceManager
+from scheduler import CancelToken, JobCancelled
+from transcript_diarization_v2 import warmup
+
+
+class Worker:
+    """Claims jobs from a SQLiteJobQueue and runs them one at a time."""
+
+    def __init__(
+        self,
+        queue: SQLiteJobQueue,
+        worker_id: str,
+        resources: ResourceManager,
+        lease_seconds: float = 60.0,
+        poll_interval: float = 2.0,
+    ):
+        self.queue = queue
+        self.worker_id = worker_id
+        self.resources = resources
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+
+    def run_forever(self, stop: threading.Event) -> None:
+        """Process jobs until `stop` is set."""
+        while not stop.is_set():
+            try:
+                if not self.run_once():
+                    stop.wait(self.poll_interval)
+            except Exception:
+                logging.exception("Worker %s failed to process a job", self.worker_id)
+                stop.wait(self.poll_interval)
+
+    def run_once(self) -> bool:
+        """Claim and run one job. Returns False if the queue was empty."""
+        job = self.queue.claim(self.worker_id, self.lease_seconds)
+        if job is None:
+            return False
+
+        job_id = job["id"]
+        token = CancelToken()
+        done = threading.Event()
+        heartbeat = threading.Thread(
+            target=self._heartbeat, args=(job_id, token, done), daemon=True
+        )
+        heartbeat.start()
+        logging.info("Worker %s started job %s (attempt %d)", self.worker_id, job_id, job["attempts"])
+
+        def report(**fields) -> None:
+            # Progress writes double as a cancellation check between heartbeats
+            if self.queue.update(job_id, self.worker_id, **fields):
+                token.cancel()
+
+        try:
+            options = PipelineOptions(**job["options"])
+            result = run_pipeline(job_id, job["audio_path"], options, token, report, self.resources)
+            finished = self.queue.finish(job_id, self.worker_id, "completed", result=result)
+        except JobCancelled:
+            finished = self.queue.finish(job_id, self.worker_id, "cancelled")
+        except Exception as e:
+            logging.exception("Job %s failed", job_id)
+            finished = self.queue.finish(job_id, self.worker_id, "failed", error=str(e))
+        finally:
+            done.set()
+            heartbeat.join()
+
+        if finished:
+            # The job is final, so no other worker will need the audio
+            if os.path.exists(job["audio_path"]):
+                os.unlink(job["audio_path"])
+        else:
+            logging.warning("Worker %s lost the lease on job %s", self.worker_id, job_id)
+        return True
+
+    def _heartbeat(self, job_id: str, token: CancelToken, done: threading.Event) -> None:
+        """Renew the lease; cancel the job if requested or if the lease is lost."""
+        while not done.wait(self.lease_seconds / 3):
+            try:
+                state = self.queue.heartbeat(job_id, self.worker_id, self.lease_seconds)
+            except Exception:
+                logging.exception("Heartbeat for job %s failed", job_id)
+                continue
+            if state["cancel"] or not state["lease"]:
+                token.cancel()
+
+
+def start_workers(
+    queue: SQLiteJobQueue,
+    count: int,
+    resources: ResourceManager,
+    stop: threading.Event,
+    worker_id: Optional[str] = None,
+    lease_seconds: float = 60.0,
+    poll_interval: float = 2.0,
+) -> list:
+    """Start `count` worker threads sharing `resources`; returns the threads."""
+    base_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    threads = []
+    for n in range(count):
+        worker = Worker(queue, f"{base_id}-{n}", resources, lease_seconds, poll_interval)
+        thread = threading.Thread(target=worker.run_forever, args=(stop,), daemon=True)
+        thread.start()
+        threads.append(thread)
+    return threads
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    queue = SQLiteJobQueue.from_env()
+    if queue is None:
+        raise SystemExit("TRANSCRIPTION_QUEUE_DB must point to the shared queue database")
+
+    concurrency = int(os.environ.get("TRANSCRIPTION_WORKER_CONCURRENCY", "1"))
+    # Core slots are split between this worker's own concurrent jobs
+    resources = ResourceManager(
+        max_jobs=concurrency,
+        mode=os.environ.get("TRANSCRIPTION_CPU_MODE", "throughput"),
+        pin_cores=os.environ.get("TRANSCRIPTION_PIN_CORES", "0") == "1",
+    )
+
+    if os.environ.get("TRANSCRIPTION_PRELOAD", "1") != "0":
+        warmup(os.environ.get("TRANSCRIPTION_WARMUP_MODEL", "large-v3"))
+
+    stop = threading.Event()
+    threads = start_workers(
+        queue,
+        concurrency,
+        resources,
+        stop,
+        worker_id=os.environ.get("TRANSCRIPTION_WORKER_ID"),
+        lease_seconds=float(os.environ.get("TRANSCRIPTION_LEASE_SECONDS", "60")),
+        poll_interval=float(os.environ.get("TRANSCRIPTION_POLL_INTERVAL", "2")),
+    )
+    try:
+        for thread in threads:
+            thread.join()
+    except KeyboardInterrupt:
+        stop.set()
+
+
+if __name__ == "__main__":
+    main()